@@ -0,0 +1,236 @@
+"""
+Contenido estático de la app: textos en dos idiomas y estilos.
+
+Se arma una vez por proceso (al importar el módulo) y no en cada rerun.
+"""
+
+# Claves de las páginas, en el orden del menú
+PAGE_KEYS = ("prediction", "whatif", "portfolio", "segments", "class", "dataq", "general", "monitor")
+
+TEXTS = {
+    "en": {
+        "app_title": "🎯 Customer Churn Prediction",
+        "app_subtitle": "Advanced prediction system with intelligent analysis",
+        "sidebar_nav": "Navigation",
+        "sidebar_lang": "Language / Idioma",
+        "page_prediction": "🔮 Prediction",
+        "page_class": "📊 Class Report",
+        "page_dataq": "✅ Data Quality Report",
+        "page_general": "📈 General Report",
+        "page_whatif": "🧪 What-if",
+        "page_portfolio": "📂 Portfolio",
+        "page_segments": "🔎 Segments",
+        "page_monitor": "🩺 Model Monitoring",
+        "credit_score": "Credit Score (300–850)",
+        "tenure": "Years as Customer",
+        "age": "Age",
+        "balance": "Account Balance",
+        "salary": "Estimated Salary",
+        "products": "Number of Products",
+        "predict_btn": "🚀 Analyze Customer",
+        "prediction_title": "Prediction Results",
+        "analysis_title": "📊 Intelligent Analysis",
+        "stay_msg": "Low Risk - Customer Likely to Stay",
+        "leave_msg": "High Risk - Customer Likely to Leave",
+        "error_msg": "Error processing prediction.",
+        "prob_label": "Churn Probability",
+        "analyzing": "Analyzing customer...",
+        "class_title": "Classification Report",
+        "dataq_title": "Data Quality Report",
+        "general_title": "General Report",
+        "monitor_title": "Model Monitoring",
+        "monitor_refresh": "🔄 Refresh",
+        "monitor_caption": "Model {model} · {rows} rows · generated {generated_at}",
+        "monitor_confusion": "Confusion matrix",
+        "monitor_calibration": "Calibration",
+        "monitor_scores": "Churn probability distribution",
+        "monitor_quality": "Data quality",
+        "monitor_column": "Column",
+        "whatif_title": "What-if Scenarios",
+        "whatif_help": "Churn probability of this customer when one or two variables change; every scenario is scored in a single batch.",
+        "whatif_customer": "Customer (defaults to the last analyzed one)",
+        "whatif_x": "Variable to sweep",
+        "whatif_y": "Second variable",
+        "whatif_none": "— none —",
+        "whatif_steps": "Grid points",
+        "whatif_pd": "Compare with the portfolio average (partial dependence)",
+        "whatif_current": "Current probability",
+        "whatif_timing": "{size:,} scenarios scored in {ms:.1f} ms",
+        "whatif_joint": "Smallest change on this grid below high risk: {change} → {probability:.1%}",
+        "whatif_no_joint": "No scenario on this grid drops the customer below high risk ({threshold:.0%}).",
+        "whatif_changes": "Smallest single-variable change below high risk",
+        "whatif_already_low": "The customer is already below high risk ({threshold:.0%}).",
+        "whatif_customer_curve": "this customer",
+        "whatif_average_curve": "portfolio average",
+        "portfolio_title": "Portfolio Scoring",
+        "portfolio_help": "Upload a CSV or Parquet file with the customer columns; it is scored in the background in blocks.",
+        "portfolio_upload": "Customer file",
+        "portfolio_start": "▶️ Score file",
+        "portfolio_cancel": "⏹️ Cancel",
+        "portfolio_progress": "{rows:,} of {total} customers · {speed:,.0f} rows/s",
+        "portfolio_done": "Scored {rows:,} customers in {seconds:.1f} s with {model}",
+        "portfolio_cancelled": "Scoring cancelled after {rows:,} customers",
+        "portfolio_error": "Could not score the file: {error}",
+        "portfolio_missing": "{missing:,} rows with missing values were not scored",
+        "portfolio_bands": "Customers by risk level",
+        "portfolio_histogram": "Churn probability distribution",
+        "portfolio_results": "Results",
+        "portfolio_page": "Page",
+        "portfolio_download": "⬇️ Download results",
+        "segments_title": "Top Customers at Risk",
+        "segments_help": "Customers scored on the Portfolio page, ranked by churn probability.",
+        "segments_empty": "The portfolio is empty. Score a file on the Portfolio page or load the bundled dataset.",
+        "segments_load": "📥 Score bundled dataset",
+        "segments_k": "Customers to show",
+        "segments_risk": "Risk level",
+        "segments_country": "Country",
+        "segments_gender": "Gender",
+        "segments_products": "Products",
+        "segments_balance": "Balance",
+        "segments_age": "Age",
+        "segments_caption": "{rows:,} of {total:,} customers · {ms:.1f} ms ({plan}, {scanned:,} rows read)",
+        "segments_counts": "Customers by country and risk level",
+        "segments_download": "⬇️ Download list",
+        "customer_profile": "👤 Customer Profile",
+        "financial_health": "💰 Financial Health",
+        "engagement_level": "📊 Engagement Level",
+    },
+    "es": {
+        "app_title": "🎯 Predicción de Deserción de Clientes",
+        "app_subtitle": "Sistema avanzado de predicción con análisis inteligente",
+        "sidebar_nav": "Navegación",
+        "sidebar_lang": "Idioma / Language",
+        "page_prediction": "🔮 Predicción",
+        "page_class": "📊 Reporte de Clases",
+        "page_dataq": "✅ Reporte de Calidad",
+        "page_general": "📈 Reporte General",
+        "page_whatif": "🧪 ¿Qué pasaría si?",
+        "page_portfolio": "📂 Cartera",
+        "page_segments": "🔎 Segmentos",
+        "page_monitor": "🩺 Monitoreo del Modelo",
+        "credit_score": "Puntaje Crediticio (300–850)",
+        "tenure": "Años como Cliente",
+        "age": "Edad",
+        "balance": "Saldo de la Cuenta",
+        "salary": "Salario Estimado",
+        "products": "Número de Productos",
+        "predict_btn": "🚀 Analizar Cliente",
+        "prediction_title": "Resultados de Predicción",
+        "analysis_title": "📊 Análisis Inteligente",
+        "stay_msg": "Riesgo Bajo - Cliente Probablemente Permanecerá",
+        "leave_msg": "Riesgo Alto - Cliente Probablemente se Irá",
+        "error_msg": "Error al procesar la predicción.",
+        "prob_label": "Probabilidad de Deserción",
+        "analyzing": "Analizando cliente...",
+        "class_title": "Reporte de Clasificación",
+        "dataq_title": "Reporte de Calidad de Datos",
+        "general_title": "Reporte General",
+        "monitor_title": "Monitoreo del Modelo",
+        "monitor_refresh": "🔄 Actualizar",
+        "monitor_caption": "Modelo {model} · {rows} filas · generado {generated_at}",
+        "monitor_confusion": "Matriz de confusión",
+        "monitor_calibration": "Calibración",
+        "monitor_scores": "Distribución de la probabilidad de deserción",
+        "monitor_quality": "Calidad de datos",
+        "monitor_column": "Columna",
+        "whatif_title": "Escenarios ¿Qué pasaría si?",
+        "whatif_help": "Probabilidad de deserción de este cliente al cambiar una o dos variables; todos los escenarios se puntúan en un solo lote.",
+        "whatif_customer": "Cliente (por defecto, el último analizado)",
+        "whatif_x": "Variable a recorrer",
+        "whatif_y": "Segunda variable",
+        "whatif_none": "— ninguna —",
+        "whatif_steps": "Puntos de la grilla",
+        "whatif_pd": "Comparar con el promedio de la cartera (dependencia parcial)",
+        "whatif_current": "Probabilidad actual",
+        "whatif_timing": "{size:,} escenarios puntuados en {ms:.1f} ms",
+        "whatif_joint": "Cambio más chico en esta grilla que baja del riesgo alto: {change} → {probability:.1%}",
+        "whatif_no_joint": "Ningún escenario de esta grilla baja al cliente del riesgo alto ({threshold:.0%}).",
+        "whatif_changes": "Cambio más chico en una sola variable que baja del riesgo alto",
+        "whatif_already_low": "El cliente ya está por debajo del riesgo alto ({threshold:.0%}).",
+        "whatif_customer_curve": "este cliente",
+        "whatif_average_curve": "promedio de la cartera",
+        "portfolio_title": "Puntuación de Cartera",
+        "portfolio_help": "Sube un CSV o Parquet con las columnas de clientes; se puntúa por bloques en segundo plano.",
+        "portfolio_upload": "Archivo de clientes",
+        "portfolio_start": "▶️ Puntuar archivo",
+        "portfolio_cancel": "⏹️ Cancelar",
+        "portfolio_progress": "{rows:,} de {total} clientes · {speed:,.0f} filas/s",
+        "portfolio_done": "{rows:,} clientes puntuados en {seconds:.1f} s con {model}",
+        "portfolio_cancelled": "Puntuación cancelada tras {rows:,} clientes",
+        "portfolio_error": "No se pudo puntuar el archivo: {error}",
+        "portfolio_missing": "{missing:,} filas con valores faltantes no se puntuaron",
+        "portfolio_bands": "Clientes por nivel de riesgo",
+        "portfolio_histogram": "Distribución de la probabilidad de deserción",
+        "portfolio_results": "Resultados",
+        "portfolio_page": "Página",
+        "portfolio_download": "⬇️ Descargar resultados",
+        "segments_title": "Clientes de Mayor Riesgo",
+        "segments_help": "Clientes puntuados en la página Cartera, ordenados por probabilidad de deserción.",
+        "segments_empty": "La cartera está vacía. Puntúa un archivo en la página Cartera o carga el conjunto incluido.",
+        "segments_load": "📥 Puntuar conjunto incluido",
+        "segments_k": "Clientes a mostrar",
+        "segments_risk": "Nivel de riesgo",
+        "segments_country": "País",
+        "segments_gender": "Género",
+        "segments_products": "Productos",
+        "segments_balance": "Saldo",
+        "segments_age": "Edad",
+        "segments_caption": "{rows:,} de {total:,} clientes · {ms:.1f} ms ({plan}, {scanned:,} filas leídas)",
+        "segments_counts": "Clientes por país y nivel de riesgo",
+        "segments_download": "⬇️ Descargar lista",
+        "customer_profile": "👤 Perfil del Cliente",
+        "financial_health": "💰 Salud Financiera",
+        "engagement_level": "📊 Nivel de Compromiso",
+    },
+}
+
+# Nombres de las variables en los gráficos de factores, en el orden de FACTOR_ORDER
+FACTOR_ORDER = ("credit_score", "tenure", "age", "balance", "estimated_salary", "products_number")
+FACTOR_LABELS = {
+    "es": ("Puntaje", "Antigüedad", "Edad", "Saldo", "Salario", "Productos"),
+    "en": ("Score", "Tenure", "Age", "Balance", "Salary", "Products"),
+}
+
+SIDEBAR_NOTE = {
+    "es": "💡 **Análisis inteligente completo**\n\nSin límites de uso",
+    "en": "💡 **Complete intelligent analysis**\n\nNo usage limits",
+}
+
+# CSS personalizado
+CSS = """
+<style>
+    .main {
+        padding: 2rem;
+    }
+    .stMetric {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        padding: 1.5rem;
+        border-radius: 10px;
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+    }
+    .stMetric label {
+        font-size: 1.1rem !important;
+        font-weight: 600 !important;
+        color: white !important;
+    }
+    .stMetric [data-testid="stMetricValue"] {
+        font-size: 2.5rem !important;
+        font-weight: 700 !important;
+        color: white !important;
+    }
+    .insight-card {
+        background: linear-gradient(135deg, rgba(102, 126, 234, 0.1) 0%, rgba(118, 75, 162, 0.1) 100%);
+        padding: 1.5rem;
+        border-radius: 10px;
+        border-left: 4px solid #667eea;
+        margin: 1rem 0;
+    }
+    h1 {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        font-size: 3rem !important;
+        font-weight: 800 !important;
+    }
+</style>
+"""
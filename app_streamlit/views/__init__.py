@@ -0,0 +1,26 @@
+"""
+Páginas de la app.
+
+Cada página vive en su propio módulo y se importa la primera vez que se
+visita; después queda en ``sys.modules`` y los reruns solo llaman a
+``render(page_key, T, lang_code)``. Así las páginas de reportes nunca cargan
+pandas, NumPy ni sklearn, y la de predicción los importa al puntuar.
+"""
+import importlib
+
+# Página -> módulo que la dibuja
+PAGE_MODULES = {
+    "prediction": "prediction",
+    "whatif": "whatif",
+    "portfolio": "portfolio",
+    "segments": "segments",
+    "class": "reports",
+    "dataq": "reports",
+    "general": "reports",
+    "monitor": "monitor",
+}
+
+
+def render(page_key, T, lang_code):
+    module = importlib.import_module("%s.%s" % (__name__, PAGE_MODULES[page_key]))
+    module.render(page_key, T, lang_code)
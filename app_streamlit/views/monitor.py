@@ -0,0 +1,56 @@
+"""Página de monitoreo: el reporte incremental de ``churn.pipeline``."""
+import pandas as pd
+import streamlit as st
+
+from churn.pipeline import load_report, run as run_pipeline
+
+
+def _metric(value):
+    # Las métricas son None mientras falten datos (p. ej. ROC AUC con una sola clase)
+    return "—" if value is None else f"{value:.3f}"
+
+
+def render(page_key, T, lang_code):
+    st.markdown(f"# {T['monitor_title']}")
+    # Reporte incremental generado por churn.pipeline (se crea si no existe)
+    report = load_report()
+    if report is None or st.button(T["monitor_refresh"]):
+        with st.spinner(T["analyzing"]):
+            report = run_pipeline()
+    st.caption(T["monitor_caption"].format(**report))
+
+    metrics = report["classification"]
+    if metrics:
+        cols = st.columns(4)
+        cols[0].metric("Accuracy", _metric(metrics.get("accuracy")))
+        cols[1].metric("Precision", _metric(metrics.get("precision")))
+        cols[2].metric("Recall", _metric(metrics.get("recall")))
+        cols[3].metric("ROC AUC", _metric(metrics.get("roc_auc")))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(f"#### {T['monitor_confusion']}")
+            c = metrics["confusion"]
+            st.dataframe(pd.DataFrame([[c["tn"], c["fp"]], [c["fn"], c["tp"]]],
+                                      index=["0", "1"], columns=["pred. 0", "pred. 1"]))
+        with col2:
+            st.markdown(f"#### {T['monitor_calibration']}")
+            calibration = pd.DataFrame(metrics["calibration"])
+            if len(calibration):
+                st.line_chart(calibration.set_index("predicted")[["observed"]])
+
+    st.markdown(f"#### {T['monitor_scores']}")
+    scores = pd.DataFrame(report["scores"]["histogram"])
+    st.bar_chart(scores.set_index("label"))
+
+    st.markdown(f"#### {T['monitor_quality']}")
+    quality = report["data_quality"]
+    st.dataframe(pd.DataFrame([
+        {"column": name, "count": info["count"], "missing": info["missing"],
+         "mean": info.get("mean"), "std": info.get("std"), "min": info.get("min"),
+         **info.get("quantiles", {}), "max": info.get("max")}
+        for name, info in quality.items() if info["type"] == "numeric"
+    ]).set_index("column"))
+    numeric_columns = [name for name, info in quality.items() if info["type"] == "numeric"]
+    column = st.selectbox(T["monitor_column"], numeric_columns)
+    st.bar_chart(pd.DataFrame(quality[column]["histogram"]).set_index("label"))
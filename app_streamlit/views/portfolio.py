@@ -0,0 +1,99 @@
+"""
+Página de cartera: puntuación de un archivo subido.
+
+La puntuación corre en un hilo (``churn.jobs``) con el modelo en memoria del
+registro; la página solo consulta su estado. Mientras avanza, un fragmento
+se vuelve a dibujar cada segundo con el progreso, los agregados por nivel de
+riesgo y la tabla paginada de lo ya puntuado, sin rerun de toda la app. Lo
+puntuado se incorpora también a la cartera de la página **🔎 Segmentos**.
+"""
+import time
+
+import pandas as pd
+import streamlit as st
+
+from churn.jobs import UploadedJob
+from churn.portfolio import get_portfolio
+
+REFRESH_SECONDS = 1.0
+PAGE_SIZE = 50
+JOB_KEY = "portfolio_job"
+
+
+def _show_status(job, T):
+    s = job.snapshot()
+    if s["state"] == "running":
+        total = "{:,}".format(s["total_rows"]) if s["total_rows"] is not None else "?"
+        st.progress(s["progress"] or 0.0, text=T["portfolio_progress"].format(
+            rows=s["rows"], total=total, speed=s["rows_per_second"]))
+        if st.button(T["portfolio_cancel"]):
+            job.cancel()
+    elif s["state"] == "done":
+        st.success(T["portfolio_done"].format(**s))
+    elif s["state"] == "cancelled":
+        st.warning(T["portfolio_cancelled"].format(**s))
+    elif s["state"] == "error":
+        st.error(T["portfolio_error"].format(**s))
+    if s["missing"]:
+        st.caption(T["portfolio_missing"].format(**s))
+    if not s["rows"]:
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"#### {T['portfolio_bands']}")
+        st.dataframe(pd.DataFrame(s["bands"]).set_index("risk_level"))
+    with col2:
+        st.markdown(f"#### {T['portfolio_histogram']}")
+        st.bar_chart(pd.DataFrame(s["histogram"]).set_index("label"))
+
+    st.markdown(f"#### {T['portfolio_results']}")
+    pages = max(1, -(-s["rows"] // PAGE_SIZE))
+    number = st.number_input(T["portfolio_page"], min_value=1, max_value=pages, value=1, step=1,
+                             key="portfolio_page")
+    st.dataframe(job.page(int(number) - 1, PAGE_SIZE), hide_index=True)
+
+
+def _show_running(job, T):
+    _show_status(job, T)
+    if job.finished:
+        # Termina el refresco periódico: un rerun completo dibuja la versión final
+        st.rerun()
+
+
+_fragment = getattr(st, "fragment", None)
+if _fragment is not None:
+    _show_live = _fragment(run_every=REFRESH_SECONDS)(_show_running)
+else:
+    def _show_live(job, T):
+        # Streamlit < 1.37: sin fragmentos, se vuelve a correr la app completa
+        _show_status(job, T)
+        time.sleep(REFRESH_SECONDS)
+        st.rerun()
+
+
+def render(page_key, T, lang_code):
+    st.markdown(f"# {T['portfolio_title']}")
+    st.caption(T["portfolio_help"])
+
+    uploaded = st.file_uploader(T["portfolio_upload"], type=["csv", "parquet", "pq"])
+    job = st.session_state.get(JOB_KEY)
+    if uploaded is not None and st.button(T["portfolio_start"], type="primary"):
+        if job is not None:
+            job.close()
+        uploaded.seek(0)
+        job = st.session_state[JOB_KEY] = UploadedJob(uploaded, uploaded.name,
+                                                          store=get_portfolio()).start()
+        st.session_state.pop("portfolio_page", None)
+
+    if job is None:
+        return
+    if not job.finished:
+        _show_live(job, T)
+        return
+    _show_status(job, T)
+    if job.state == "done":
+        with open(job.output_path, "rb") as fh:
+            st.download_button(T["portfolio_download"], fh.read(),
+                               file_name="scores-%s.csv" % job.filename.rsplit(".", 1)[0],
+                               mime="text/csv")
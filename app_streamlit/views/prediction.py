@@ -0,0 +1,217 @@
+"""
+Página de predicción.
+
+El formulario se dibuja sin el stack de ML: ``churn.cache`` (registro, modelo
+y sklearn), ``churn.explain`` y pandas se importan la primera vez que se
+puntúa o se muestran resultados.
+"""
+import streamlit as st
+
+from app_streamlit.texts import FACTOR_LABELS, FACTOR_ORDER
+
+
+def _predict(customer_data, lang_code):
+    import numpy as np
+
+    from churn.cache import get_prediction_cache
+    from churn.explain import path_contributions, render_analysis, render_insights
+    from churn.risk import calculate_risk_level
+
+    cache = get_prediction_cache()
+    prob, entry = cache.predict(customer_data)
+    pred = int(prob > 0.5)
+
+    risk_level, risk_icon = calculate_risk_level(prob)
+    insights = cache.derive(
+        "insights", customer_data, lang_code,
+        lambda: render_insights(customer_data, lang_code)
+    )
+    smart_analysis = cache.derive(
+        "analysis", customer_data, lang_code,
+        lambda: render_analysis(customer_data, prob, lang_code)
+    )
+    importances = entry.feature_importances()
+    feature_importance = np.array([importances[f] for f in FACTOR_ORDER])
+    # Aporte de cada variable al log-odds de este cliente (solo GBM)
+    feature_contribution = None
+    if entry.compiled is not None:
+        contributions, _ = path_contributions(entry.compiled, entry.row(customer_data))
+        by_feature = dict(zip(entry.features, contributions[0]))
+        feature_contribution = np.array([by_feature[f] for f in FACTOR_ORDER])
+
+    return {
+        'customer_data': customer_data,
+        'pred': pred,
+        'prob': prob,
+        'risk_level': risk_level,
+        'risk_icon': risk_icon,
+        'insights': insights,
+        'smart_analysis': smart_analysis,
+        'feature_importance': feature_importance,
+        'feature_contribution': feature_contribution
+    }
+
+
+def _show_results(data_pred, T, lang_code):
+    import pandas as pd
+
+    pred = data_pred['pred']
+    prob = data_pred['prob']
+    risk_level = data_pred['risk_level']
+    risk_icon = data_pred['risk_icon']
+    insights = data_pred['insights']
+    smart_analysis = data_pred['smart_analysis']
+    feature_importance = data_pred['feature_importance']
+    feature_contribution = data_pred['feature_contribution']
+
+    # Resultados visuales
+    st.markdown("## " + T["prediction_title"])
+
+    col_a, col_b, col_c = st.columns(3)
+
+    with col_a:
+        st.metric(
+            label=T["prob_label"],
+            value=f"{prob*100:.1f}%",
+            delta=f"{risk_icon} {risk_level.upper()}"
+        )
+
+    with col_b:
+        retention_prob = (1 - prob) * 100
+        st.metric(
+            label="Prob. Retención" if lang_code == "es" else "Retention Prob.",
+            value=f"{retention_prob:.1f}%"
+        )
+
+    with col_c:
+        if pred == 1:
+            st.error(T["leave_msg"])
+        else:
+            st.success(T["stay_msg"])
+
+    st.markdown("---")
+
+    # Insights del cliente
+    st.markdown("### 📌 Insights del Perfil" if lang_code == "es" else "### 📌 Profile Insights")
+
+    insight_cols = st.columns(len(insights))
+    for idx, text in enumerate(insights):
+        with insight_cols[idx]:
+            st.info(text)
+
+    st.markdown("---")
+
+    # Análisis inteligente (SIN IA - SIEMPRE FUNCIONA)
+    st.markdown(f"## {T['analysis_title']}")
+
+    st.markdown(f"""
+        <div class="insight-card">
+
+{smart_analysis}
+
+        </div>
+        """, unsafe_allow_html=True)
+
+    # Feature importance
+    st.markdown("---")
+    st.markdown("### 📊 Factores de Influencia" if lang_code == "es" else "### 📊 Influence Factors")
+
+    features = list(FACTOR_LABELS[lang_code])
+
+    importance_df = pd.DataFrame({
+        'Factor': features,
+        'Importancia': feature_importance * 100
+    }).sort_values('Importancia', ascending=False)
+
+    st.bar_chart(importance_df.set_index('Factor'))
+
+    if feature_contribution is not None:
+        st.markdown("### 🧭 Aporte al Riesgo de este Cliente" if lang_code == "es"
+                    else "### 🧭 Contribution to this Customer's Risk")
+        st.caption("Cuánto sube (+) o baja (−) cada variable el log-odds de abandono respecto del cliente promedio"
+                   if lang_code == "es" else
+                   "How much each variable raises (+) or lowers (−) the churn log-odds versus the average customer")
+        contribution_df = pd.DataFrame({
+            'Factor': features,
+            'Aporte': feature_contribution
+        }).set_index('Factor')
+        st.bar_chart(contribution_df)
+
+
+def render(page_key, T, lang_code):
+    if 'prediction_done' not in st.session_state:
+        st.session_state.prediction_done = False
+
+    st.title(T["app_title"])
+    st.markdown(f"*{T['app_subtitle']}*")
+    st.markdown("---")
+
+    # Formulario de entrada
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.markdown(f"### {T['customer_profile']}")
+        credit_score = st.number_input(
+            T["credit_score"],
+            min_value=300,
+            max_value=850,
+            value=750,
+            step=10,
+            key="credit_score_input"
+        )
+        age = st.slider(T["age"], 18, 92, 30, key="age_input")
+        tenure = st.selectbox(
+            T["tenure"],
+            list(range(1, 21)),
+            index=0,
+            key="tenure_input"
+        )
+
+    with col2:
+        st.markdown(f"### {T['financial_health']}")
+        balance = st.number_input(
+            T["balance"],
+            min_value=0.0,
+            max_value=300000.0,
+            value=50000.0,
+            step=1000.0,
+            format="%.2f",
+            key="balance_input"
+        )
+        estimated_salary = st.number_input(
+            T["salary"],
+            min_value=0.0,
+            max_value=300000.0,
+            value=75000.0,
+            step=1000.0,
+            format="%.2f",
+            key="salary_input"
+        )
+
+    with col3:
+        st.markdown(f"### {T['engagement_level']}")
+        products_number = st.slider(T["products"], 0, 4, 1, key="products_input")
+        st.markdown("")
+        st.markdown("")
+        predict_clicked = st.button(T["predict_btn"], use_container_width=True, type="primary")
+
+    # Procesar predicción
+    if predict_clicked:
+        with st.spinner(T["analyzing"]):
+            # Campos de entrada del modelo; el esquema del artefacto arma la
+            # fila en su orden (churn.features)
+            customer_data = {
+                'credit_score': float(credit_score),
+                'tenure': float(tenure),
+                'age': float(age),
+                'balance': float(balance),
+                'estimated_salary': float(estimated_salary),
+                'products_number': float(products_number),
+            }
+            # Guardar en session state
+            st.session_state.current_prediction = _predict(customer_data, lang_code)
+            st.session_state.prediction_done = True
+
+    # Mostrar resultados si existen
+    if st.session_state.prediction_done:
+        _show_results(st.session_state.current_prediction, T, lang_code)
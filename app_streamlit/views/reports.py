@@ -0,0 +1,38 @@
+"""Páginas de los reportes de Evidently: solo dependen de ``churn.reports``."""
+import os
+
+import streamlit as st
+
+from churn.reports import get_report_store
+
+# Los reportes HTML se leen de assets/ a través de churn.reports
+static_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+REPORT_HEIGHTS = {"class": 3000, "dataq": 800, "general": 2000}
+
+
+def show_report(name, height, lang_code):
+    """
+    Muestra un reporte de Evidently leído una sola vez por proceso.
+    Con server.enableStaticServing el bundle JS/CSS compartido se sirve desde
+    static/ y el navegador lo cachea entre reportes.
+    """
+    store = get_report_store()
+    try:
+        report = store.get(name)
+    except FileNotFoundError:
+        st.error("Archivo no encontrado" if lang_code == "es" else "File not found")
+        return
+    if st.get_option("server.enableStaticServing"):
+        store.export_static(static_directory)
+        base_url = st.get_option("server.baseUrlPath").strip("/")
+        asset_url = "/%s/app/static/" % base_url if base_url else "/app/static/"
+        html_content = report.slim(asset_url)
+    else:
+        html_content = report.document()
+    st.components.v1.html(html_content, height=height, scrolling=True)
+
+
+def render(page_key, T, lang_code):
+    st.markdown(f"# {T[page_key + '_title']}")
+    show_report(page_key, REPORT_HEIGHTS[page_key], lang_code)
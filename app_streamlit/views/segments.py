@@ -0,0 +1,65 @@
+"""
+Página de segmentos: los clientes de mayor riesgo de la cartera puntuada.
+
+Consulta la ``PortfolioStore`` del proceso (``churn.portfolio``), que
+alimentan los trabajos de la página Cartera. Cada cambio de filtro es una
+consulta ``top`` sobre las particiones e índices, sin recorrer la cartera
+completa, así que responde igual con millones de clientes.
+"""
+import streamlit as st
+
+from churn import paths
+from churn.portfolio import get_portfolio
+from churn.risk import RISK_LEVELS
+
+MAX_K = 5000
+
+
+def _range(label, bounds, step):
+    # Los extremos salen del índice ordenado: no se recorre la columna en cada rerun
+    if bounds is None or bounds[0] == bounds[1]:
+        return None
+    low, high = float(bounds[0]), float(bounds[1])
+    selected = st.slider(label, low, high, (low, high), step=step)
+    # Un rango completo no filtra: así se evita leer su índice
+    return None if selected == (low, high) else selected
+
+
+def render(page_key, T, lang_code):
+    st.markdown(f"# {T['segments_title']}")
+    st.caption(T["segments_help"])
+
+    store = get_portfolio()
+    if not len(store):
+        st.info(T["segments_empty"])
+        if st.button(T["segments_load"], type="primary"):
+            with st.spinner(T["analyzing"]):
+                store.score_file(paths.DATA_PATH)
+                store.save()
+            st.rerun()
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    risk_level = col1.multiselect(T["segments_risk"], RISK_LEVELS)
+    country = col2.multiselect(T["segments_country"], sorted(store.vocab["country"]))
+    gender = col3.multiselect(T["segments_gender"], sorted(store.vocab["gender"]))
+    products = col4.multiselect(T["segments_products"], sorted(store.vocab["products_number"]))
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        balance = _range(T["segments_balance"], store.bounds("balance"), 1000.0)
+    with col2:
+        age = _range(T["segments_age"], store.bounds("age"), 1.0)
+    k = col3.number_input(T["segments_k"], 1, MAX_K, 500, step=100)
+
+    result, plan = store.top(int(k), risk_level=risk_level or None, country=country or None,
+                             gender=gender or None, products_number=products or None,
+                             balance=balance, age=age)
+    st.caption(T["segments_caption"].format(rows=len(result), total=len(store),
+                                            ms=plan["seconds"] * 1e3, plan=plan["plan"],
+                                            scanned=plan["scanned"]))
+    st.dataframe(result, hide_index=True, use_container_width=True)
+    st.download_button(T["segments_download"], result.to_csv(index=False).encode("utf-8"),
+                       file_name="top-%d.csv" % len(result), mime="text/csv")
+
+    st.markdown(f"#### {T['segments_counts']}")
+    st.dataframe(store.segments("country"), use_container_width=True)
@@ -0,0 +1,103 @@
+"""
+Página de escenarios: curvas de la probabilidad de un cliente sobre una o dos
+variables y el cambio mínimo que lo saca del riesgo alto (``churn.whatif``).
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app_streamlit.texts import FACTOR_LABELS, FACTOR_ORDER
+from churn.datastore import load_customers
+from churn.registry import get_registry
+from churn.whatif import (ACTIONABLE, EXAMPLE_CUSTOMER, HIGH_RISK, RANGES, grid, minimal_changes,
+                          partial_dependence, sweep)
+
+# La segunda variable se dibuja como una serie por valor: a lo sumo estas
+MAX_SERIES = 10
+# Clientes de la muestra para la dependencia parcial
+PD_SAMPLE = 500
+
+
+def _customer_inputs(T):
+    last = st.session_state.get("current_prediction")
+    defaults = dict(last["customer_data"]) if last else dict(EXAMPLE_CUSTOMER)
+    customer = {}
+    with st.expander(T["whatif_customer"], expanded=False):
+        cols = st.columns(3)
+        for i, feature in enumerate(FACTOR_ORDER):
+            low, high, integer = RANGES[feature]
+            label = T["salary" if feature == "estimated_salary" else
+                      "products" if feature == "products_number" else feature]
+            with cols[i % 3]:
+                if integer:
+                    value = st.number_input(label, int(low), int(high), int(defaults[feature]), step=1,
+                                            key="whatif_" + feature)
+                else:
+                    value = st.number_input(label, float(low), float(high), float(defaults[feature]),
+                                            step=1000.0, format="%.2f", key="whatif_" + feature)
+            customer[feature] = float(value)
+    return customer
+
+
+def _label(feature, lang_code):
+    return FACTOR_LABELS[lang_code][FACTOR_ORDER.index(feature)]
+
+
+def render(page_key, T, lang_code):
+    st.markdown(f"# {T['whatif_title']}")
+    st.caption(T["whatif_help"])
+
+    customer = _customer_inputs(T)
+    features = list(FACTOR_ORDER)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        x = st.selectbox(T["whatif_x"], features, index=features.index("balance"),
+                         format_func=lambda f: _label(f, lang_code))
+    with col2:
+        options = [None] + [f for f in features if f != x]
+        y = st.selectbox(T["whatif_y"], options, index=options.index("products_number")
+                         if "products_number" in options else 0,
+                         format_func=lambda f: T["whatif_none"] if f is None else _label(f, lang_code))
+    with col3:
+        steps = st.slider(T["whatif_steps"], 10, 1000, 200, step=10)
+
+    entry = get_registry().get()
+    axes = {x: grid(x, steps, include=customer[x])}
+    if y is not None:
+        axes[y] = grid(y, MAX_SERIES, include=customer[y])
+    result = sweep(customer, axes, entry)
+    current = float(entry.predict_proba(entry.row(customer))[0])
+
+    st.metric(T["whatif_current"], f"{current:.1%}")
+    st.caption(T["whatif_timing"].format(size=result.size, ms=result.seconds * 1e3))
+
+    if y is None:
+        chart = pd.DataFrame({T["whatif_customer_curve"]: result.probabilities}, index=axes[x])
+        if st.checkbox(T["whatif_pd"]):
+            data = load_customers()
+            sample = data.sample(min(PD_SAMPLE, len(data)), random_state=0)
+            chart[T["whatif_average_curve"]] = partial_dependence(sample, x, axes[x], entry)
+    else:
+        chart = pd.DataFrame(result.probabilities,
+                             index=axes[x], columns=["%s=%g" % (_label(y, lang_code), v) for v in axes[y]])
+    chart.index.name = _label(x, lang_code)
+    st.line_chart(chart)
+
+    if current < HIGH_RISK:
+        st.success(T["whatif_already_low"].format(threshold=HIGH_RISK))
+        return
+    best = result.minimal_change()
+    if best is None:
+        st.warning(T["whatif_no_joint"].format(threshold=HIGH_RISK))
+    else:
+        change = ", ".join("%s %g → %g" % (_label(f, lang_code), customer[f], v)
+                           for f, v in best["change"].items() if v != customer[f])
+        st.info(T["whatif_joint"].format(change=change, probability=best["probability"]))
+
+    st.markdown(f"#### {T['whatif_changes']}")
+    changes = minimal_changes(customer, ACTIONABLE, steps, entry=entry)
+    if changes:
+        table = pd.DataFrame(changes)
+        table["feature"] = [_label(f, lang_code) for f in table["feature"]]
+        table["probability"] = np.round(table["probability"], 3)
+        st.dataframe(table[["feature", "current", "value", "delta", "probability"]], hide_index=True)
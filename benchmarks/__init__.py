@@ -0,0 +1 @@
+"""Mediciones de rendimiento reproducibles (``python -m benchmarks.<nombre>``)."""
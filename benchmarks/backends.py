@@ -0,0 +1,164 @@
+"""
+Comparación de backends de modelo: ``gbm`` vs. ``hist``.
+
+Los datos de entrenamiento se generan a partir del 80 % del CSV incluido,
+remuestreado con reemplazo hasta 10x–1000x su tamaño (con un pequeño ruido
+en las variables continuas); el AUC se mide siempre sobre el 20 % restante
+del CSV original, que ningún modelo vio.
+
+Cada medición corre en un proceso propio para que el pico de memoria (RSS)
+sea el de ese entrenamiento. Se reporta:
+
+* tiempo de entrenamiento y aumento del RSS máximo durante ``fit``;
+* tamaño del modelo serializado;
+* latencia de una fila y rendimiento en lote a través de ``ModelEntry``
+  (el ``gbm`` usa el motor compilado, como en producción);
+* AUC en la partición de prueba.
+
+Uso::
+
+    python -m benchmarks.backends --scales 10 100
+    python -m benchmarks.backends --scales 1000 --max-gbm-rows 1000000 --json resultados.json
+"""
+import argparse
+import json
+import os
+import pickle
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from churn.backends import BACKENDS, get_backend  # noqa: E402
+from churn.datastore import load_customers  # noqa: E402
+from churn.registry import ModelEntry  # noqa: E402
+
+TARGET = "churn"
+CONTINUOUS = ("balance", "estimated_salary")
+
+
+def split_reference(seed=0, test_fraction=0.2):
+    """Particiones de entrenamiento y prueba del CSV, estratificadas por ``churn``."""
+    data = load_customers().copy()
+    rng = np.random.default_rng(seed)
+    test = np.zeros(len(data), dtype=bool)
+    for label in (0, 1):
+        rows = np.flatnonzero(data[TARGET].to_numpy() == label)
+        test[rng.choice(rows, int(len(rows) * test_fraction), replace=False)] = True
+    return data[~test].reset_index(drop=True), data[test].reset_index(drop=True)
+
+
+def synthesize(frame, n_rows, seed=0):
+    """``n_rows`` filas remuestreadas de ``frame`` con ruido del 1 % en las continuas."""
+    rng = np.random.default_rng(seed)
+    sample = frame.iloc[rng.integers(0, len(frame), n_rows)].reset_index(drop=True)
+    for column in CONTINUOUS:
+        values = sample[column].to_numpy(dtype=np.float64)
+        sample[column] = values * (1 + rng.normal(0, 0.01, n_rows))
+    return sample
+
+
+def _peak_rss_bytes():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(backend_name, scale, seed=0, latency_calls=500, batch_rows=100_000):
+    """Una medición completa; pensada para correr en un proceso aparte."""
+    from sklearn.metrics import roc_auc_score
+
+    backend = get_backend(backend_name)
+    train, test = split_reference(seed)
+    data = synthesize(train, len(train) * scale, seed)
+    X = backend.matrix(data)
+    y = data[TARGET].to_numpy()
+    del data
+
+    baseline = _peak_rss_bytes()
+    started = time.perf_counter()
+    model = backend.fit(X, y)
+    fit_seconds = time.perf_counter() - started
+    fit_rss = max(0, _peak_rss_bytes() - baseline)
+
+    entry = ModelEntry(backend.model_name, "bench", model, backend.features)
+    X_test = backend.matrix(test)
+    auc = roc_auc_score(test[TARGET].to_numpy(), entry.predict_proba(X_test))
+
+    timings = []
+    for i in range(latency_calls):
+        row = X_test[i % len(X_test)]
+        started = time.perf_counter()
+        entry.predict_proba(row)
+        timings.append(time.perf_counter() - started)
+
+    X_batch = X_test[np.arange(batch_rows) % len(X_test)]
+    started = time.perf_counter()
+    entry.predict_proba(X_batch)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        "backend": backend_name,
+        "scale": scale,
+        "rows": len(X),
+        "fit_seconds": fit_seconds,
+        "fit_rss_bytes": fit_rss,
+        "model_bytes": len(pickle.dumps(model)),
+        "single_row_us": float(np.median(timings) * 1e6),
+        "batch_rows_per_second": batch_rows / batch_seconds,
+        "auc": float(auc),
+        "compiled": entry.compiled is not None,
+    }
+
+
+def run(scales, backends, max_gbm_rows=1_000_000, seed=0):
+    base_rows = len(split_reference(seed)[0])
+    results = []
+    for scale in scales:
+        for name in backends:
+            if name == "gbm" and base_rows * scale > max_gbm_rows:
+                results.append({"backend": name, "scale": scale, "rows": base_rows * scale,
+                                "skipped": "más de %d filas" % max_gbm_rows})
+                continue
+            # Un proceso por medición: el RSS máximo no arrastra la anterior
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                results.append(pool.submit(measure, name, scale, seed).result())
+            print(_format_row(results[-1]), flush=True)
+    return results
+
+
+def _format_row(r):
+    if "skipped" in r:
+        return "%-5s %6dx %10d  omitido (%s)" % (r["backend"], r["scale"], r["rows"], r["skipped"])
+    return "%-5s %6dx %10d %9.2fs %9.0f MB %8.0f KB %9.0f µs %12.0f %7.4f" % (
+        r["backend"], r["scale"], r["rows"], r["fit_seconds"], r["fit_rss_bytes"] / 2**20,
+        r["model_bytes"] / 1024, r["single_row_us"], r["batch_rows_per_second"], r["auc"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comparación de backends gbm vs. hist")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100],
+                        help="múltiplos del tamaño del CSV (default: %(default)s)")
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), default=["gbm", "hist"])
+    parser.add_argument("--max-gbm-rows", type=int, default=1_000_000,
+                        help="por encima se omite gbm (splits exactos, muy lento)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    print("%-5s %7s %10s %10s %12s %11s %12s %12s %7s" % (
+        "motor", "escala", "filas", "fit", "RSS fit", "modelo", "1 fila", "filas/s", "AUC"))
+    results = run(args.scales, args.backends, args.max_gbm_rows, args.seed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
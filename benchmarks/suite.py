@@ -0,0 +1,370 @@
+"""
+Suite de benchmarks de las rutas calientes.
+
+Cada caso prepara sus datos una vez y mide una función: el número de
+llamadas por ronda se calibra para que cada ronda dure al menos
+``min_time / rounds`` y se guardan mediana, mínimo, media y desvío del
+tiempo por llamada. Casos:
+
+* ``load.*``: ``joblib.load`` y ``artifact.load`` del artefacto y carga completa en el registro;
+* ``predict.*``: ``predict_proba`` de sklearn y de ``ModelEntry`` (motor
+  compilado) con 1, 100, 10 000 y 1 000 000 filas;
+* ``train.app_fallback``: el entrenamiento con la configuración de ``app.py``;
+* ``data.*``: lectura del CSV, de la caché binaria y ``load_customers()`` de las páginas;
+* ``reports.*``: lectura de cada reporte de Evidently (en frío y cacheado);
+* ``explain.*``: el análisis de un cliente y las reglas/aportes en lote.
+
+Cada corrida se guarda como JSON en ``.cache/benchmarks/`` y ``compare``
+marca los casos que se volvieron más lentos que un umbral.
+
+Uso::
+
+    python -m benchmarks.suite run                   # todos los casos
+    python -m benchmarks.suite run -k predict --quick
+    python -m benchmarks.suite compare               # las dos últimas corridas
+    python -m benchmarks.suite compare base.json nueva.json --threshold 0.2
+"""
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from churn import paths  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT_DIR, ".cache", "benchmarks")
+PREDICT_ROWS = (1, 100, 10_000, 1_000_000)
+
+CASES = []
+
+
+def case(name, rows=None):
+    """Registra ``setup``: una función que prepara los datos y devuelve la función a medir."""
+    def register(setup):
+        CASES.append((name, rows, setup))
+        return setup
+    return register
+
+
+def _customers(rows=None):
+    from churn.datastore import load_customers
+
+    data = load_customers()
+    if rows is None:
+        return data
+    return data.iloc[np.arange(rows) % len(data)].reset_index(drop=True)
+
+
+@case("load.joblib")
+def _load_joblib():
+    import joblib
+
+    path = os.path.join(paths.MODELS_DIR, "gbm_model_production.joblib")
+    return lambda: joblib.load(path)
+
+
+@case("load.gbm")
+def _load_gbm():
+    from churn.artifact import load
+
+    path = os.path.join(paths.MODELS_DIR, "gbm_model_production.gbm")
+    return lambda: load(path)
+
+
+@case("load.registry")
+def _load_registry():
+    from churn.registry import ModelRegistry
+
+    # Registro nuevo en cada llamada: carga, validación, huella y compilación
+    return lambda: ModelRegistry().get()
+
+
+def _predict_case(kind, rows):
+    @case("predict.%s[rows=%d]" % (kind, rows), rows=rows)
+    def setup():
+        from churn.artifact import sklearn_model
+        from churn.compiled import sklearn_proba
+        from churn.registry import get_registry
+
+        entry = get_registry().get()
+        X = entry.spec.encode(_customers(rows))
+        if kind == "sklearn":
+            model = sklearn_model(entry)
+            return lambda: sklearn_proba(model, X)
+        return lambda: entry.predict_proba(X)
+
+
+for _rows in PREDICT_ROWS:
+    _predict_case("sklearn", _rows)
+    _predict_case("entry", _rows)
+
+
+@case("train.app_fallback")
+def _train_fallback():
+    from churn.registry import PRODUCTION_SPEC, train_fallback
+
+    return lambda: train_fallback(PRODUCTION_SPEC)
+
+
+@case("data.csv_parse")
+def _csv_parse():
+    from churn.datastore import parse_csv
+
+    return lambda: parse_csv(paths.DATA_PATH)
+
+
+@case("data.binary_cache")
+def _binary_cache():
+    from churn.datastore import CACHE_DIR, _load_uncached, load_customers
+
+    load_customers()  # deja la caché escrita
+    # Sin la memoria por proceso: comprobación de vigencia y mapeo de los .npy
+    return lambda: _load_uncached(paths.DATA_PATH, CACHE_DIR)
+
+
+@case("data.load_customers")
+def _load_customers():
+    from churn.datastore import load_customers
+
+    # Lo que hace cada página de la app en un rerun (memoria por proceso)
+    return lambda: load_customers()
+
+
+def _report_case(name):
+    @case("reports.read[%s]" % name)
+    def setup():
+        from churn.reports import ReportStore
+
+        # Almacén nuevo en cada llamada: lectura, desescape y partición del HTML
+        return lambda: ReportStore().get(name).document()
+
+
+for _name in ("class", "dataq", "general"):
+    _report_case(_name)
+
+
+@case("reports.cached")
+def _reports_cached():
+    from churn.reports import ReportStore
+
+    store = ReportStore()
+    return lambda: [store.get(name).document() for name in store.reports]
+
+
+@case("explain.smart_analysis")
+def _smart_analysis():
+    from churn.explain import render_analysis
+
+    values = _customers().iloc[0].to_dict()
+    return lambda: render_analysis(values, 0.42, "es")
+
+
+@case("explain.rules[rows=1000000]", rows=1_000_000)
+def _rules():
+    from churn.explain import condition_flags, factor_codes
+
+    frame = _customers(1_000_000)
+    return lambda: factor_codes(condition_flags(frame))
+
+
+@case("explain.contributions[rows=10000]", rows=10_000)
+def _contributions():
+    from churn.explain import path_contributions
+    from churn.registry import get_registry
+
+    entry = get_registry().get()
+    X = entry.spec.encode(_customers(10_000))
+    path_contributions(entry.compiled, X[:1])  # tabla de aportes ya construida
+    return lambda: path_contributions(entry.compiled, X)
+
+
+def time_call(fn, min_time=1.0, rounds=5):
+    """Tiempos por llamada de ``fn`` en ``rounds`` rondas calibradas."""
+    started = time.perf_counter()
+    fn()
+    first = time.perf_counter() - started
+    loops = max(1, int(min_time / rounds / max(first, 1e-9)))
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - started) / loops)
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "rounds": rounds,
+        "loops": loops,
+    }
+
+
+def select(patterns=None, max_rows=None):
+    selected = []
+    for name, rows, setup in CASES:
+        if patterns and not any(p in name or fnmatch.fnmatch(name, p) for p in patterns):
+            continue
+        if max_rows is not None and rows is not None and rows > max_rows:
+            continue
+        selected.append((name, rows, setup))
+    return selected
+
+
+def environment():
+    import pandas
+    import sklearn
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run(patterns=None, max_rows=None, min_time=1.0, rounds=5, progress=None):
+    results = {}
+    for name, rows, setup in select(patterns, max_rows):
+        stats = time_call(setup(), min_time, rounds)
+        if rows:
+            stats["rows"] = rows
+            stats["rows_per_second"] = rows / stats["median"]
+        results[name] = stats
+        if progress is not None:
+            progress(name, stats)
+    return {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+            "results": results}
+
+
+def save_run(data, directory=RESULTS_DIR, path=None):
+    if path is None:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "run-%s.json" % time.strftime("%Y%m%d-%H%M%S"))
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def saved_runs(directory=RESULTS_DIR):
+    return sorted(glob.glob(os.path.join(directory, "run-*.json")))
+
+
+def compare(base, new, threshold=0.10, stat="median"):
+    """Filas ``(caso, base, nueva, cambio relativo, más lento)`` de los casos comunes.
+
+    Un caso es más lento si supera el umbral y, además, la diferencia es mayor
+    que la suma de los desvíos de ambas corridas (no es ruido de medición).
+    """
+    rows = []
+    for name, stats in new["results"].items():
+        if name not in base["results"]:
+            continue
+        reference = base["results"][name]
+        before, after = reference[stat], stats[stat]
+        change = after / before - 1 if before else 0.0
+        noise = reference["stdev"] + stats["stdev"]
+        rows.append((name, before, after, change, change > threshold and after - before > noise))
+    return rows
+
+
+def _format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return "%.2f %s" % (seconds / scale, unit)
+    return "%.0f ns" % (seconds * 1e9)
+
+
+def _load_json(path):
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de las rutas calientes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="correr los casos y guardar el resultado")
+    run_parser.add_argument("-k", dest="patterns", action="append",
+                            help="solo casos que contengan este texto o patrón (repetible)")
+    run_parser.add_argument("--quick", action="store_true",
+                            help="rondas más cortas y sin los casos de 1M filas")
+    run_parser.add_argument("--min-time", type=float, default=1.0,
+                            help="segundos de medición por caso (default: %(default)s)")
+    run_parser.add_argument("--rounds", type=int, default=5)
+    run_parser.add_argument("--output", help="archivo JSON (default: .cache/benchmarks/run-<fecha>.json)")
+
+    compare_parser = commands.add_parser("compare", help="comparar dos corridas")
+    compare_parser.add_argument("base", nargs="?", help="corrida de referencia (default: la penúltima)")
+    compare_parser.add_argument("new", nargs="?", help="corrida nueva (default: la última)")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="aumento relativo que se marca como regresión (default: %(default)s)")
+    compare_parser.add_argument("--stat", choices=["median", "min", "mean"], default="median")
+
+    list_parser = commands.add_parser("list", help="listar los casos")
+    list_parser.add_argument("-k", dest="patterns", action="append")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, _, _ in select(args.patterns):
+            print(name)
+        return 0
+
+    if args.command == "run":
+        min_time, max_rows = args.min_time, None
+        if args.quick:
+            min_time, max_rows = min(min_time, 0.2), 100_000
+
+        def progress(name, stats):
+            throughput = ("%12.0f filas/s" % stats["rows_per_second"]) if "rows" in stats else ""
+            print("%-36s %12s ± %-10s %s" % (name, _format_seconds(stats["median"]),
+                                            _format_seconds(stats["stdev"]), throughput), flush=True)
+
+        data = run(args.patterns, max_rows, min_time, args.rounds, progress)
+        print("guardado en %s" % save_run(data, path=args.output))
+        return 0
+
+    if args.base and not args.new:
+        parser.error("indica ambas corridas o ninguna")
+    if args.base:
+        base_path, new_path = args.base, args.new
+    else:
+        runs = saved_runs()
+        if len(runs) < 2:
+            parser.error("se necesitan al menos dos corridas en %s" % RESULTS_DIR)
+        base_path, new_path = runs[-2:]
+    rows = compare(_load_json(base_path), _load_json(new_path), args.threshold, args.stat)
+    print("%s -> %s (%s)" % (os.path.basename(base_path), os.path.basename(new_path), args.stat))
+    print("%-36s %12s %12s %9s" % ("caso", "base", "nueva", "cambio"))
+    for name, before, after, change, slower in rows:
+        print("%-36s %12s %12s %+8.1f%%%s" % (name, _format_seconds(before), _format_seconds(after),
+                                              change * 100, "  ← más lento" if slower else ""))
+    slower = [r for r in rows if r[4]]
+    if slower:
+        print("%d casos más lentos que el umbral (+%.0f%%)" % (len(slower), args.threshold * 100))
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Herramientas de producción para el modelo de abandono de clientes."""
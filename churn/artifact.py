@@ -0,0 +1,379 @@
+"""
+Artefacto plano del GBM (``.gbm``).
+
+Los ``.joblib`` son objetos de sklearn en pickle: cargarlos importa toda la
+pila de sklearn y reconstruye cientos de objetos Python. El formato ``.gbm``
+guarda los árboles ya aplanados (los arreglos de ``CompiledGBM``) en un solo
+archivo binario que se lee con ``np.memmap``, sin sklearn ni pandas:
+
+* 8 bytes ``CHURNGBM`` y la longitud (``uint32``) de una cabecera JSON con el
+  esquema de variables, la versión de sklearn y los hiperparámetros, la huella
+  del ``.joblib`` de origen, el hash de los datos de entrenamiento, las
+  métricas y el SHA-256 de los arreglos;
+* los arreglos, alineados a 64 bytes: nodos empaquetados (variable ``int16``,
+  umbral ``float32``, hijos ``int32``), valor de cada hoja (``float64``),
+  raíces e importancias.
+
+Los umbrales se guardan como el mayor ``float32`` que no supera al original:
+como el GBM compara la entrada en ``float32``, el recorrido es el mismo y las
+probabilidades son idénticas bit a bit a las de sklearn. Los valores de las
+hojas quedan en ``float64`` por el mismo motivo.
+
+El registro prefiere el ``.gbm`` al ``.joblib`` de la misma versión, salvo
+que el ``.joblib`` haya cambiado después de exportarlo.
+
+Uso::
+
+    python -m churn.artifact export                 # todos los GBM de models/
+    python -m churn.artifact info models/gbm_model_production.gbm
+    python -m churn.artifact bench                  # carga, importación y memoria
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from churn import paths
+from churn.compiled import CompiledGBM, _expit, sklearn_proba
+
+MAGIC = b"CHURNGBM"
+FORMAT_VERSION = 1
+SUFFIX = ".gbm"
+ALIGN = 64
+
+NODE_DTYPE = np.dtype([("feature", "<i2"), ("threshold", "<f4"), ("left", "<i4"), ("right", "<i4")])
+
+
+class ArtifactError(ValueError):
+    """Artefacto ilegible, corrupto o desactualizado respecto de su origen."""
+
+
+def _align(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+def _threshold32(threshold):
+    """Mayor ``float32`` <= umbral: para una entrada ``float32``, ``x <= t`` no cambia."""
+    threshold32 = threshold.astype(np.float32)
+    rounded_up = threshold32.astype(np.float64) > threshold
+    threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+    return threshold32
+
+
+def _arrays(compiled, importances):
+    leaf = compiled.is_leaf()
+    if compiled.n_features > np.iinfo(np.int16).max or compiled.n_nodes > np.iinfo(np.int32).max:
+        raise ArtifactError("el modelo no entra en el formato (variables int16, nodos int32)")
+    nodes = np.empty(compiled.n_nodes, dtype=NODE_DTYPE)
+    nodes["feature"] = np.where(leaf, -1, compiled.feature)
+    nodes["threshold"] = np.where(leaf, np.inf, _threshold32(compiled.threshold))
+    nodes["left"] = compiled.left
+    nodes["right"] = compiled.right
+    return {
+        "nodes": nodes,
+        "value": compiled.value.astype("<f8"),
+        "roots": compiled.roots.astype("<i4"),
+        "importances": np.asarray(importances, dtype="<f8"),
+    }
+
+
+def _json_params(model):
+    params = model.get_params() if hasattr(model, "get_params") else {}
+    return {k: v for k, v in params.items() if isinstance(v, (bool, int, float, str, type(None)))}
+
+
+def _sidecar(path):
+    """Metadatos que ``churn.training`` guarda junto al artefacto, si existen."""
+    sidecar = os.path.splitext(path)[0] + ".json"
+    if not os.path.exists(sidecar):
+        return {}
+    with open(sidecar, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def training_metrics(entry, data_path):
+    """Métricas del modelo sobre los datos de entrenamiento (artefactos sin validación guardada)."""
+    from churn.datastore import load_customers
+    from churn.training import TARGET, fold_metrics
+
+    data = load_customers(data_path)
+    metrics = fold_metrics(data[TARGET].to_numpy(), entry.predict_proba(entry.spec.encode(data)))
+    return dict(metrics, evaluated_on="training_data", rows=len(data))
+
+
+def export(entry, path=None, data_path=paths.DATA_PATH, source_path=None):
+    """Escribe el ``.gbm`` de un ``ModelEntry`` (por defecto junto a su ``.joblib``)."""
+    import sklearn
+
+    compiled = entry.compiled
+    if compiled is None:
+        raise ArtifactError("%s no es un GBM binario compilable" % entry.label)
+    source_path = source_path or entry.path
+    if path is None:
+        if source_path is None:
+            raise ArtifactError("%s no tiene artefacto de origen; indicar la ruta de salida" % entry.label)
+        path = os.path.splitext(source_path)[0] + SUFFIX
+
+    from churn.datastore import file_sha256
+    from churn.registry import file_fingerprint
+
+    sidecar = _sidecar(source_path) if source_path else {}
+    if "metrics" in sidecar:
+        metrics = sidecar["metrics"]
+    elif "cv" in sidecar:
+        metrics = dict(sidecar["cv"], evaluated_on="cv")
+    elif data_path is not None:
+        metrics = training_metrics(entry, data_path)
+    else:
+        metrics = None
+    data = sidecar.get("data")
+    if data is None and data_path is not None:
+        data = {"path": os.path.relpath(data_path, paths.ROOT_DIR), "sha256": file_sha256(data_path)}
+
+    arrays = _arrays(compiled, entry.model.feature_importances_)
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.descr if array.dtype.names else array.dtype.str,
+                        "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    payload = bytearray(offset)
+    for name, array in arrays.items():
+        start = layout[name]["offset"]
+        payload[start:start + array.nbytes] = array.tobytes()
+
+    header = {
+        "format": FORMAT_VERSION,
+        "name": entry.name,
+        "version": entry.version,
+        "model_class": type(entry.model).__name__,
+        "sklearn_version": sidecar.get("sklearn", sklearn.__version__),
+        "params": _json_params(entry.model),
+        "spec": entry.spec.to_dict(),
+        "columns": list(entry.spec.columns),
+        "classes": [0, 1],
+        "n_features": compiled.n_features,
+        "n_trees": compiled.n_trees,
+        "n_nodes": compiled.n_nodes,
+        "depth": compiled.depth,
+        "init_raw": compiled.init_raw,
+        "source": {"file": os.path.basename(source_path), "fingerprint": file_fingerprint(source_path)}
+        if source_path else None,
+        "training_data": data,
+        "metrics": metrics,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "arrays": layout,
+        "payload_sha256": hashlib.sha256(payload).hexdigest(),
+    }
+    encoded = json.dumps(header, indent=1).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(encoded)) + encoded
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(prefix)
+        fh.write(b"\0" * (_align(len(prefix)) - len(prefix)))
+        fh.write(payload)
+    os.replace(tmp, path)
+    return path
+
+
+def read_header(path):
+    """Cabecera JSON y posición de los arreglos en el archivo."""
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ArtifactError("%s no es un artefacto .gbm" % path)
+        (length,) = struct.unpack("<I", fh.read(4))
+        header = json.loads(fh.read(length).decode("utf-8"))
+    if header.get("format") != FORMAT_VERSION:
+        raise ArtifactError("%s: formato %s no soportado" % (path, header.get("format")))
+    return header, _align(len(MAGIC) + 4 + length)
+
+
+class FlatGBM:
+    """GBM leído de un ``.gbm``, con la parte de la interfaz de sklearn que usa el proyecto."""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, compiled, header, importances):
+        self.compiled_ = compiled
+        self.header = header
+        self.n_features_in_ = compiled.n_features
+        self.feature_spec_ = header["spec"]
+        self.feature_names_in_ = np.array(header["columns"], dtype=object)
+        self.feature_importances_ = importances
+
+    def decision_function(self, X):
+        return self.compiled_.decision_function(X)
+
+    def predict_proba(self, X):
+        p = _expit(self.decision_function(X))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(np.int64)
+
+    def get_params(self, deep=True):
+        return dict(self.header["params"])
+
+    def __repr__(self):
+        return "<FlatGBM %s@v%s %d árboles>" % (self.header["name"], self.header["version"],
+                                               self.header["n_trees"])
+
+
+def load(path, verify=True):
+    """``FlatGBM`` de un ``.gbm``; ``verify`` comprueba el SHA-256 de los arreglos."""
+    header, start = read_header(path)
+    payload = np.memmap(path, dtype=np.uint8, mode="r", offset=start)
+    if verify and hashlib.sha256(payload).hexdigest() != header["payload_sha256"]:
+        raise ArtifactError("%s: los arreglos no coinciden con su hash (archivo dañado)" % path)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype([tuple(field) for field in spec["dtype"]] if isinstance(spec["dtype"], list)
+                         else spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        offset = spec["offset"]
+        arrays[name] = payload[offset:offset + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    nodes = arrays["nodes"]
+    leaf = nodes["feature"] < 0
+    compiled = CompiledGBM(
+        np.where(leaf, 0, nodes["feature"]), nodes["threshold"], nodes["left"], nodes["right"],
+        arrays["value"], arrays["roots"], header["depth"], header["init_raw"], header["n_features"])
+    return FlatGBM(compiled, header, arrays["importances"])
+
+
+def check_source(path, header):
+    """Falla si el ``.joblib`` de origen cambió después de exportar el ``.gbm``."""
+    source = header.get("source")
+    if not source:
+        return
+    source_path = os.path.join(os.path.dirname(path), source["file"])
+    if os.path.exists(source_path):
+        from churn.registry import file_fingerprint
+
+        if file_fingerprint(source_path) != source["fingerprint"]:
+            raise ArtifactError("%s es anterior a %s; volver a exportarlo" % (path, source["file"]))
+
+
+def load_model(path, mmap_mode=None):
+    """Estimador de un artefacto, ``.gbm`` o ``.joblib``."""
+    if path.endswith(SUFFIX):
+        return load(path)
+    import joblib
+
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def sklearn_model(entry):
+    """El estimador de sklearn de una entrada (leyendo su ``.joblib`` si vino de un ``.gbm``)."""
+    if not isinstance(entry.model, FlatGBM):
+        return entry.model
+    source = entry.model.header.get("source")
+    if not source:
+        raise ArtifactError("%s no registra su .joblib de origen" % entry.label)
+    return load_model(os.path.join(os.path.dirname(entry.path), source["file"]))
+
+
+# Cada medición corre en un proceso nuevo: importaciones, primera carga,
+# carga repetida y memoria máxima (ru_maxrss, en KB en Linux)
+_BENCH_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+%(imports)s
+imported = time.perf_counter()
+model = %(load)s
+loaded = time.perf_counter()
+timings = []
+for _ in range(%(repeat)d):
+    t = time.perf_counter()
+    %(load)s
+    timings.append(time.perf_counter() - t)
+print(json.dumps({"import": imported - started, "first_load": loaded - imported,
+                  "load": sorted(timings)[len(timings) // 2], "sklearn": "sklearn" in sys.modules,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def _bench_process(imports, load_expr, repeat=20):
+    code = _BENCH_SCRIPT % {"imports": imports, "load": load_expr, "repeat": repeat}
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=paths.ROOT_DIR).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench(joblib_path, gbm_path):
+    """Importación, carga y memoria de cada formato, en procesos nuevos."""
+    return {
+        "numpy (referencia)": _bench_process("import numpy", "None"),
+        "joblib.load": _bench_process("import joblib", "joblib.load(%r)" % joblib_path),
+        "artifact.load": _bench_process("from churn.artifact import load", "load(%r)" % gbm_path),
+        "artifact.load sin hash": _bench_process("from churn.artifact import load",
+                                                 "load(%r, verify=False)" % gbm_path),
+    }
+
+
+def _gbm_entries(models_dir):
+    from churn.registry import ModelRegistry
+
+    registry = ModelRegistry(models_dir, formats=(".joblib",))
+    names = sorted({os.path.splitext(f)[0].split("-v")[0] for f in os.listdir(models_dir)
+                    if f.endswith(".joblib")})
+    for name in names:
+        for version, path in registry.versions(name):
+            entry = registry._load(name, version, path, None)
+            if entry.compiled is not None:
+                yield entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Artefacto plano del GBM (.gbm)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="exportar los GBM de models/ (o los indicados)")
+    p_export.add_argument("paths", nargs="*", help="artefactos .joblib (default: todos los de models/)")
+    p_export.add_argument("--data", default=paths.DATA_PATH,
+                          help="datos de entrenamiento para el hash y las métricas")
+    p_info = sub.add_parser("info", help="mostrar la cabecera de un .gbm")
+    p_info.add_argument("path")
+    p_bench = sub.add_parser("bench", help="comparar con joblib.load")
+    p_bench.add_argument("--model", default="gbm_model_production")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        entries = list(_gbm_entries(paths.MODELS_DIR))
+        if args.paths:
+            wanted = {os.path.abspath(p) for p in args.paths}
+            entries = [e for e in entries if os.path.abspath(e.path) in wanted]
+        from churn.compiled import parity_inputs
+        from churn.datastore import load_customers
+
+        data = load_customers(args.data)
+        for entry in entries:
+            path = export(entry, data_path=args.data)
+            # Datos reales más valores justo en cada umbral y a sus lados
+            X = parity_inputs(entry.compiled, entry.spec.encode(data))
+            same = np.array_equal(load(path).predict_proba(X)[:, 1], sklearn_proba(entry.model, X))
+            print("%s -> %s (%.1f KB -> %.1f KB, idéntico a sklearn: %s)" % (
+                os.path.basename(entry.path), os.path.relpath(path, paths.ROOT_DIR),
+                os.path.getsize(entry.path) / 1024, os.path.getsize(path) / 1024,
+                "sí" if same else "NO"))
+            if not same:
+                return 1
+    elif args.command == "info":
+        header, start = read_header(args.path)
+        print(json.dumps(dict(header, payload_offset=start), indent=2, ensure_ascii=False))
+    else:
+        base = os.path.join(paths.MODELS_DIR, args.model)
+        results = bench(base + ".joblib", base + SUFFIX)
+        print("%-24s %10s %12s %12s %9s %8s" % ("", "import", "1ª carga", "carga", "RSS", "sklearn"))
+        for label, r in results.items():
+            print("%-24s %8.1fms %10.2fms %10.3fms %7.1fMB %8s" % (
+                label, r["import"] * 1e3, r["first_load"] * 1e3, r["load"] * 1e3, r["rss_mb"],
+                "sí" if r["sklearn"] else "no"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Backends de modelo intercambiables.
+
+Un backend define qué variables usa el modelo, cómo se arma la matriz de
+entrada y cómo se construye y entrena el estimador. El resto (registro,
+puntuación por lotes, servicio, búsqueda de hiperparámetros) trabaja con el
+estimador ya entrenado y con la matriz en el orden de ``features``.
+
+* ``gbm``: ``GradientBoostingClassifier`` con las seis variables numéricas
+  de producción (splits exactos; el motor compilado lo acelera al puntuar).
+* ``hist``: ``HistGradientBoostingClassifier`` con las mismas variables más
+  ``country`` y ``gender`` como categóricas nativas. Entrena sobre bins
+  (escala mucho mejor con el número de filas) y admite valores faltantes.
+
+La matriz se arma con el ``FeatureSpec`` del backend (``churn.features``):
+las categóricas entran como el código de su categoría en ``CATEGORIES`` y
+los valores desconocidos o vacíos quedan en NaN (el backend ``hist`` los
+trata como faltantes). El esquema se guarda en el estimador al entrenar.
+"""
+import numpy as np
+import pandas as pd
+
+from churn.features import CATEGORIES, spec_for
+from churn.registry import FALLBACK_PARAMS, PRODUCTION_FEATURES, PRODUCTION_MODEL
+
+
+def is_categorical(feature):
+    return feature in CATEGORIES
+
+
+def handles_missing(model):
+    """Si el estimador acepta NaN en la entrada."""
+    return type(model).__name__.startswith("HistGradientBoosting")
+
+
+class Backend:
+    """Interfaz común de entrenamiento para un tipo de estimador."""
+
+    name = None
+    # Artefacto en models/ donde se guarda por defecto
+    model_name = None
+    # Parámetro con el número de árboles, el que crece con warm_start
+    size_param = None
+    default_params = {}
+    grid = {}
+
+    def __init__(self, features=None):
+        self.features = tuple(features or self.default_features)
+        self.spec = spec_for(self.features)
+
+    def estimator(self, **params):
+        raise NotImplementedError
+
+    def matrix(self, frame):
+        return self.spec.encode(frame)
+
+    def fit(self, X, y, **params):
+        """Entrena con una matriz en el orden de ``features``; guarda nombres y esquema."""
+        model = self.estimator(**dict(self.default_params, **params))
+        model.fit(pd.DataFrame(np.asarray(X), columns=list(self.features)), np.asarray(y))
+        return self.spec.attach(model)
+
+
+class GBMBackend(Backend):
+    name = "gbm"
+    model_name = PRODUCTION_MODEL
+    size_param = "n_estimators"
+    default_features = PRODUCTION_FEATURES
+    default_params = FALLBACK_PARAMS
+    grid = {"learning_rate": [0.05, 0.1, 0.2], "max_depth": [2, 3, 4], "subsample": [1.0, 0.8]}
+
+    def estimator(self, **params):
+        from sklearn.ensemble import GradientBoostingClassifier
+
+        return GradientBoostingClassifier(**params)
+
+
+class HistGBMBackend(Backend):
+    name = "hist"
+    model_name = "hgb_model"
+    size_param = "max_iter"
+    default_features = PRODUCTION_FEATURES + tuple(CATEGORIES)
+    # Sin early stopping: con más de 10k filas sklearn lo activa y aparta datos
+    default_params = {"learning_rate": 0.1, "max_iter": 100, "max_leaf_nodes": 31,
+                      "early_stopping": False, "random_state": 42}
+    grid = {"learning_rate": [0.05, 0.1, 0.2], "max_leaf_nodes": [15, 31, 63],
+            "l2_regularization": [0.0, 1.0]}
+
+    def estimator(self, **params):
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        categorical = [is_categorical(f) for f in self.features]
+        return HistGradientBoostingClassifier(
+            categorical_features=categorical if any(categorical) else None, **params)
+
+
+BACKENDS = {backend.name: backend for backend in (GBMBackend, HistGBMBackend)}
+
+
+def get_backend(name, features=None):
+    try:
+        return BACKENDS[name](features)
+    except KeyError:
+        raise ValueError("backend desconocido %r (opciones: %s)" % (name, ", ".join(BACKENDS)))
@@ -0,0 +1,403 @@
+"""
+Puntuación por lotes de archivos de clientes.
+
+Lee un CSV o Parquet con el mismo esquema que
+``data/Bank Customer Churn Prediction.csv`` en bloques de tamaño fijo, calcula
+``predict_proba`` vectorizado por bloque y escribe la probabilidad y el nivel
+de riesgo en un CSV o Parquet de salida. La memoria queda acotada por el
+tamaño del bloque, no por el del archivo.
+
+Con ``--workers N`` la entrada se divide en fragmentos (rangos de bytes
+alineados a líneas en CSV, grupos de filas en Parquet) que un pool de
+procesos lee, puntúa y escribe por separado; el proceso principal concatena
+las partes en el orden de la entrada.
+
+Uso::
+
+    python -m churn.batch clientes.csv puntuaciones.parquet --chunksize 200000
+    python -m churn.batch clientes.csv puntuaciones.csv --workers 8
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+
+import numpy as np
+import pandas as pd
+
+from churn.artifact import load_model
+from churn.backends import handles_missing, is_categorical
+from churn.instrument import timed
+from churn.registry import PRODUCTION_MODEL, ModelEntry, get_registry
+from churn.risk import risk_levels
+
+ID_COLUMN = "customer_id"
+DEFAULT_CHUNKSIZE = 100_000
+
+# Tamaño máximo de un fragmento CSV: es lo que cada proceso tiene en memoria
+MAX_SHARD_BYTES = 64 << 20
+
+
+def file_format(path, explicit=None):
+    """Formato ("csv" o "parquet") a partir de la extensión del archivo."""
+    if explicit:
+        return explicit
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("Para leer o escribir Parquet instala pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def iter_chunks(path, features, chunksize=DEFAULT_CHUNKSIZE, fmt=None, extra=()):
+    """Itera el archivo en DataFrames de a lo sumo ``chunksize`` filas.
+
+    Además de las variables del modelo se leen el identificador y las
+    columnas de ``extra`` que estén presentes.
+    """
+    fmt = file_format(path, fmt)
+    if fmt == "parquet":
+        pa = _require_pyarrow()
+        parquet = pa.parquet.ParquetFile(path)
+        available = parquet.schema_arrow.names
+        _check_columns(available, features)
+        columns = [c for c in dict.fromkeys((ID_COLUMN, *features, *extra)) if c in available]
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    header = pd.read_csv(path, nrows=0).columns
+    _check_columns(header, features)
+    columns = [c for c in dict.fromkeys((ID_COLUMN, *features, *extra)) if c in header]
+    dtypes = {f: np.float64 for f in features if not is_categorical(f)}
+    yield from pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+
+
+def _check_columns(available, features):
+    missing = [f for f in features if f not in available]
+    if missing:
+        raise ValueError("faltan columnas en el archivo de entrada: %s" % ", ".join(missing))
+
+
+def score_matrix(entry, X):
+    """Probabilidades para ``X``; las filas con valores faltantes quedan en NaN
+    salvo que el modelo los admita."""
+    if handles_missing(entry.model):
+        return entry.predict_proba(X)
+    probabilities = np.full(len(X), np.nan)
+    valid = ~np.isnan(X).any(axis=1)
+    if valid.all():
+        probabilities[:] = entry.predict_proba(X)
+    elif valid.any():
+        probabilities[valid] = entry.predict_proba(X[valid])
+    return probabilities
+
+
+def result_frame(frame, probabilities):
+    """Columnas de salida para un bloque puntuado."""
+    result = pd.DataFrame(index=frame.index)
+    if ID_COLUMN in frame:
+        result[ID_COLUMN] = frame[ID_COLUMN].to_numpy()
+    result["churn_probability"] = probabilities
+    levels = risk_levels(probabilities)
+    levels[np.isnan(probabilities)] = ""
+    result["risk_level"] = levels
+    return result
+
+
+class ResultWriter:
+    """Escribe bloques de resultados de forma incremental en CSV o Parquet."""
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.format = file_format(path, fmt)
+        self.rows = 0
+        self._parquet = None
+        self._started = False
+
+    def write(self, frame):
+        if self.format == "parquet":
+            pa = _require_pyarrow()
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pa.parquet.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a" if self._started else "w",
+                         header=not self._started, index=False)
+        self._started = True
+        self.rows += len(frame)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        elif not self._started:
+            # Entrada vacía: se deja al menos la cabecera
+            pd.DataFrame(columns=["churn_probability", "risk_level"]).to_csv(self.path, index=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _score_chunks(entry, chunks, writer, progress=None):
+    """Puntúa una secuencia de bloques; devuelve el tiempo de ``predict_proba``."""
+    scoring_time = 0.0
+    for frame in chunks:
+        t0 = time.perf_counter()
+        probabilities = score_matrix(entry, entry.spec.encode(frame))
+        scoring_time += time.perf_counter() - t0
+        writer.write(result_frame(frame, probabilities))
+        if progress is not None:
+            progress(writer.rows)
+    return scoring_time
+
+
+@timed("batch.score_file")
+def score_file(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, model=PRODUCTION_MODEL,
+               input_format=None, output_format=None, progress=None, workers=1):
+    """Puntúa ``input_path`` bloque a bloque y devuelve estadísticas de la corrida."""
+    entry = get_registry().get(model)
+    if workers > 1:
+        return _score_parallel(entry, input_path, output_path, chunksize, input_format,
+                               output_format, progress, workers)
+    started = time.perf_counter()
+    with ResultWriter(output_path, output_format) as writer:
+        chunks = iter_chunks(input_path, entry.spec.inputs, chunksize, input_format)
+        scoring_time = _score_chunks(entry, chunks, writer, progress)
+    elapsed = time.perf_counter() - started
+    return {
+        "model": entry.label,
+        "rows": writer.rows,
+        "seconds": elapsed,
+        "scoring_seconds": scoring_time,
+        "rows_per_second": writer.rows / elapsed if elapsed else 0.0,
+        "workers": [{"pid": os.getpid(), "shards": 1, "rows": writer.rows,
+                     "busy_seconds": elapsed, "scoring_seconds": scoring_time}],
+    }
+
+
+# -------------------------------------------------------------------
+# Modo paralelo
+# -------------------------------------------------------------------
+def plan_csv_shards(path, n_shards, max_bytes=MAX_SHARD_BYTES):
+    """Divide el CSV en rangos de bytes que empiezan y terminan en un salto de línea.
+
+    Supone que los campos no contienen saltos de línea entre comillas, como
+    ocurre con el esquema de clientes.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as fh:
+        fh.readline()
+        start = fh.tell()
+        shard_bytes = max(1, min(max_bytes, -(-(size - start) // max(n_shards, 1))))
+        bounds = []
+        while start < size:
+            fh.seek(min(start + shard_bytes, size) - 1)
+            fh.readline()
+            end = fh.tell()
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def plan_parquet_shards(path, n_shards):
+    """Agrupa los row groups del Parquet en a lo sumo ``n_shards`` fragmentos."""
+    pa = _require_pyarrow()
+    n_groups = pa.parquet.ParquetFile(path).num_row_groups
+    per_shard = max(1, -(-n_groups // max(n_shards, 1)))
+    return [(i, min(i + per_shard, n_groups)) for i in range(0, n_groups, per_shard)]
+
+
+def iter_shard(path, fmt, bounds, features, chunksize):
+    """Itera los bloques de un fragmento producido por ``plan_*_shards``."""
+    start, end = bounds
+    if fmt == "parquet":
+        pa = _require_pyarrow()
+        parquet = pa.parquet.ParquetFile(path)
+        available = parquet.schema_arrow.names
+        columns = [c for c in (ID_COLUMN, *features) if c in available]
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns,
+                                          row_groups=list(range(start, end))):
+            yield batch.to_pandas()
+        return
+
+    header = list(pd.read_csv(path, nrows=0).columns)
+    columns = [c for c in (ID_COLUMN, *features) if c in header]
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        raw = io.BytesIO(fh.read(end - start))
+    dtypes = {f: np.float64 for f in features if not is_categorical(f)}
+    yield from pd.read_csv(raw, header=None, names=header, usecols=columns,
+                           dtype=dtypes, chunksize=chunksize)
+
+
+_worker_entry = None
+
+
+def _init_worker(name, version, spec, model_path):
+    # Cada proceso carga su propia copia del modelo: deserializar los árboles
+    # de sklearn y compilarlos copia los arreglos, así que mapear el archivo
+    # no ahorraría memoria. Con el .gbm son unos 35 KB por proceso.
+    global _worker_entry
+    model = load_model(model_path)
+    _worker_entry = ModelEntry(name, version, model, spec, path=model_path)
+
+
+def _score_shard(task):
+    input_path, input_format, bounds, part_path, output_format, chunksize = task
+    started = time.perf_counter()
+    chunks = iter_shard(input_path, input_format, bounds, _worker_entry.spec.inputs, chunksize)
+    with ResultWriter(part_path, output_format) as writer:
+        scoring_time = _score_chunks(_worker_entry, chunks, writer)
+    return {
+        "pid": os.getpid(),
+        "rows": writer.rows,
+        "busy_seconds": time.perf_counter() - started,
+        "scoring_seconds": scoring_time,
+    }
+
+
+def _append_part(part_path, output, fmt, first):
+    if fmt == "parquet":
+        pa = _require_pyarrow()
+        table = pa.parquet.read_table(part_path)
+        if output["writer"] is None:
+            output["writer"] = pa.parquet.ParquetWriter(output["path"], table.schema)
+        output["writer"].write_table(table)
+        return
+    with open(part_path, "rb") as src:
+        if not first:
+            src.readline()
+        shutil.copyfileobj(src, output["file"], 1 << 20)
+
+
+def _score_parallel(entry, input_path, output_path, chunksize, input_format, output_format,
+                    progress, workers):
+    input_format = file_format(input_path, input_format)
+    output_format = file_format(output_path, output_format)
+    if input_format == "parquet":
+        shards = plan_parquet_shards(input_path, workers * 4)
+    else:
+        _check_columns(pd.read_csv(input_path, nrows=0).columns, entry.spec.inputs)
+        shards = plan_csv_shards(input_path, workers * 4)
+
+    started = time.perf_counter()
+    tmpdir = tempfile.mkdtemp(prefix=".churn-batch-", dir=os.path.dirname(os.path.abspath(output_path)))
+    model_path = entry.path
+    if model_path is None:
+        # Modelo entrenado en memoria: los procesos lo cargan desde el volcado
+        model_path = os.path.join(tmpdir, "model.joblib")
+        joblib.dump(entry.model, model_path)
+    suffix = ".parquet" if output_format == "parquet" else ".csv"
+    tasks = [
+        (input_path, input_format, bounds, os.path.join(tmpdir, "part-%05d%s" % (i, suffix)),
+         output_format, chunksize)
+        for i, bounds in enumerate(shards)
+    ]
+
+    per_worker = {}
+    rows = 0
+    output = {"path": output_path, "writer": None, "file": None}
+    try:
+        if output_format == "csv":
+            output["file"] = open(output_path, "wb")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(entry.name, entry.version, entry.spec, model_path)) as pool:
+            # map() devuelve los resultados en el orden de envío: las partes se
+            # concatenan en el orden de la entrada aunque terminen desordenadas.
+            for i, stats in enumerate(pool.map(_score_shard, tasks)):
+                part_path = tasks[i][3]
+                _append_part(part_path, output, output_format, first=(i == 0))
+                os.remove(part_path)
+                worker = per_worker.setdefault(stats["pid"], {
+                    "pid": stats["pid"], "shards": 0, "rows": 0,
+                    "busy_seconds": 0.0, "scoring_seconds": 0.0,
+                })
+                worker["shards"] += 1
+                for key in ("rows", "busy_seconds", "scoring_seconds"):
+                    worker[key] += stats[key]
+                rows += stats["rows"]
+                if progress is not None:
+                    progress(rows)
+        if not tasks and output_format == "csv":
+            output["file"].write(b"churn_probability,risk_level\n")
+    finally:
+        if output["file"] is not None:
+            output["file"].close()
+        if output["writer"] is not None:
+            output["writer"].close()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "model": entry.label,
+        "rows": rows,
+        "seconds": elapsed,
+        "scoring_seconds": sum(w["scoring_seconds"] for w in per_worker.values()),
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+        "workers": sorted(per_worker.values(), key=lambda w: w["pid"]),
+    }
+
+
+def print_throughput(stats, file=sys.stdout):
+    """Tabla de filas/s por proceso para dimensionar máquinas."""
+    print("%8s %7s %10s %10s %12s" % ("pid", "frags", "filas", "seg", "filas/s"), file=file)
+    for worker in stats["workers"]:
+        busy = worker["busy_seconds"]
+        print("%8d %7d %10d %10.2f %12.0f" % (
+            worker["pid"], worker["shards"], worker["rows"], busy,
+            worker["rows"] / busy if busy else 0.0,
+        ), file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Puntuación por lotes del modelo de abandono")
+    parser.add_argument("input", help="CSV o Parquet con las columnas del modelo")
+    parser.add_argument("output", help="archivo de salida (.csv o .parquet)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="filas por bloque (default: %(default)s)")
+    parser.add_argument("--model", default=PRODUCTION_MODEL, help="nombre del modelo en models/")
+    parser.add_argument("--input-format", choices=["csv", "parquet"])
+    parser.add_argument("--output-format", choices=["csv", "parquet"])
+    parser.add_argument("--workers", type=int, default=1,
+                        help="procesos en paralelo (default: %(default)s)")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        parser.error("no existe el archivo %s" % args.input)
+
+    progress = None
+    if not args.quiet:
+        def progress(rows):
+            print("\r%d filas puntuadas" % rows, end="", file=sys.stderr, flush=True)
+
+    try:
+        stats = score_file(args.input, args.output, args.chunksize, args.model,
+                           args.input_format, args.output_format, progress, args.workers)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if not args.quiet:
+        print(file=sys.stderr)
+    print("%(rows)d filas en %(seconds).2fs (%(rows_per_second).0f filas/s) con %(model)s" % stats)
+    if args.workers > 1 and not args.quiet:
+        print_throughput(stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
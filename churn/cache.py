@@ -0,0 +1,157 @@
+"""
+Caché de predicciones.
+
+Los controles de la app están cuantizados (puntaje de a 10, antigüedad 1–20,
+productos 0–4, saldo y salario de a 1000), así que los mismos clientes se
+repiten entre usuarios. ``PredictionCache`` guarda la probabilidad y los
+textos derivados (análisis e insights por idioma) en cachés LRU acotadas,
+con vencimiento opcional, indexadas por la fila normalizada y la huella del
+artefacto. Al cambiar el modelo las claves viejas dejan de coincidir y,
+además, el registro avisa para liberar la memoria de inmediato. Si hay una
+tabla precalculada para el artefacto (``churn.lookup``), los fallos de la
+caché se leen de ella en vez de recorrer los árboles.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from churn.lookup import get_lookup
+from churn.registry import PRODUCTION_MODEL, get_registry
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Diccionario acotado con desalojo LRU, TTL opcional y contadores."""
+
+    def __init__(self, maxsize=10_000, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_row(values, spec):
+    """Clave canónica: la fila codificada por el esquema del modelo."""
+    return _row_key(spec.encode_row(values))
+
+
+def _row_key(row):
+    # tolist() da floats de Python, más baratos de hashear que escalares NumPy
+    return tuple(row.tolist() if hasattr(row, "tolist") else row)
+
+
+class PredictionCache:
+    """Probabilidades y textos derivados cacheados por modelo y fila."""
+
+    def __init__(self, model=PRODUCTION_MODEL, maxsize=10_000, ttl=None, registry=None):
+        self.model = model
+        self.registry = registry or get_registry()
+        self.scores = LRUCache(maxsize, ttl)
+        self.derived = LRUCache(maxsize, ttl)
+        self.registry.subscribe(self._on_swap)
+
+    def _on_swap(self, name, previous, entry):
+        if name == self.model:
+            self.scores.clear()
+            self.derived.clear()
+
+    def lookup(self, entry, row):
+        """Probabilidad cacheada para una fila ya en el orden del modelo, o ``None``."""
+        return self.scores.get((entry.fingerprint, _row_key(row)))
+
+    def store(self, entry, row, probability):
+        self.scores.put((entry.fingerprint, _row_key(row)), probability)
+
+    def predict(self, values):
+        """``(probabilidad, entry)`` para un cliente dado como diccionario."""
+        entry = self.registry.get(self.model)
+        row = entry.spec.encode_row(values)
+        probability = self.lookup(entry, row)
+        if probability is None:
+            table = get_lookup(entry)
+            if table is not None:
+                probability = table.score_row(row)
+            if probability is None:
+                probability = float(entry.predict_proba(row)[0])
+            self.store(entry, row, probability)
+        return probability, entry
+
+    def derive(self, kind, values, lang, compute):
+        """Texto derivado (``kind``) para el cliente e idioma; ``compute()`` si no está."""
+        entry = self.registry.get(self.model)
+        key = (entry.fingerprint, kind, lang, normalize_row(values, entry.spec))
+        return self.derived.get_or_compute(key, compute)
+
+    def stats(self):
+        return {"scores": self.scores.stats(), "derived": self.derived.stats()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Caché compartida por el proceso para el modelo de producción."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache()
+    return _cache
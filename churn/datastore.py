@@ -0,0 +1,246 @@
+"""
+Acceso a los datos de clientes.
+
+El CSV se interpreta una sola vez con tipos estrechos (int16, int8, float32,
+categorías) y se guarda como una columna ``.npy`` por variable en
+``.cache/datastore/``. Los arranques siguientes mapean esas columnas en
+memoria en lugar de volver a leer el CSV. La caché se invalida cuando cambia
+el contenido del archivo de origen (tamaño/fecha y, si difieren, su SHA-256).
+
+balance y estimated_salary quedan en float32: el modelo convierte la entrada
+a float32 antes de comparar con los umbrales, así que las predicciones no
+cambian.
+
+El DataFrame devuelto es de solo lectura (sus columnas apuntan al mapeo).
+
+Medición de tiempos y memoria::
+
+    python -m churn.datastore --report
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from churn import paths
+from churn.instrument import timer
+
+CACHE_DIR = os.path.join(paths.ROOT_DIR, ".cache", "datastore")
+
+DTYPES = {
+    "customer_id": "int32",
+    "credit_score": "int16",
+    "country": "category",
+    "gender": "category",
+    "age": "int8",
+    "tenure": "int8",
+    "balance": "float32",
+    "products_number": "int8",
+    "credit_card": "int8",
+    "active_member": "int8",
+    "estimated_salary": "float32",
+    "churn": "int8",
+}
+
+_FORMAT_VERSION = 1
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_csv(path):
+    """Lee el CSV con los tipos de ``DTYPES`` (sin caché)."""
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(path, dtype={c: t for c, t in DTYPES.items() if c in header})
+
+
+def _cache_path(source, cache_dir):
+    """Directorio de la caché de ``source``: el nombre más un hash de la ruta
+    absoluta, para que dos archivos con el mismo nombre no compartan caché."""
+    source = os.path.abspath(source)
+    name = os.path.splitext(os.path.basename(source))[0].replace(" ", "_")
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(cache_dir, "%s-%s" % (name, digest))
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(frame, source, directory, sha256=None):
+    """Guarda ``frame`` como columnas .npy más ``meta.json`` (reemplazo atómico)."""
+    stat = os.stat(source)
+    meta = {
+        "format": _FORMAT_VERSION,
+        "source": os.path.abspath(source),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256 or file_sha256(source),
+        "rows": len(frame),
+        "columns": {},
+    }
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        for i, column in enumerate(frame.columns):
+            series = frame[column]
+            info = {"file": "%02d.npy" % i}
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                info["dtype"] = "category"
+                info["categories"] = [str(c) for c in series.cat.categories]
+                values = series.cat.codes.to_numpy()
+            else:
+                values = series.to_numpy()
+                info["dtype"] = str(values.dtype)
+            np.save(os.path.join(tmp, info["file"]), np.ascontiguousarray(values))
+            meta["columns"][column] = info
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, indent=2)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(tmp, directory)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return meta
+
+
+def read_cache(directory, meta=None):
+    """DataFrame cuyas columnas son mapeos de solo lectura de los .npy."""
+    meta = meta or _read_meta(directory)
+    columns = {}
+    for column, info in meta["columns"].items():
+        values = np.load(os.path.join(directory, info["file"]), mmap_mode="r")
+        if info["dtype"] == "category":
+            dtype = pd.CategoricalDtype(info["categories"])
+            columns[column] = pd.Categorical.from_codes(values, dtype=dtype)
+        else:
+            columns[column] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def _cache_is_fresh(meta, source):
+    if not meta or meta.get("format") != _FORMAT_VERSION:
+        return False, None
+    if meta.get("source") != os.path.abspath(source):
+        return False, None
+    stat = os.stat(source)
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return True, None
+    # Misma fecha/tamaño no es garantía en ambos sentidos: se decide por el hash
+    sha256 = file_sha256(source)
+    return sha256 == meta["sha256"], sha256
+
+
+def load_customers(source=paths.DATA_PATH, cache_dir=CACHE_DIR, use_cache=True):
+    """Datos de clientes tipados, desde la caché binaria cuando está vigente.
+
+    El resultado se memoriza por proceso mientras el archivo no cambie.
+    """
+    stat = os.stat(source)
+    key = (os.path.abspath(source), cache_dir, use_cache)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    memo = _memo.get(key)
+    if memo is not None and memo[0] == signature:
+        return memo[1]
+
+    with _memo_lock, timer("data.load", cache=str(use_cache).lower()):
+        frame = _load_uncached(source, cache_dir) if use_cache else parse_csv(source)
+        _memo[key] = (signature, frame)
+        return frame
+
+
+def _load_uncached(source, cache_dir):
+    directory = _cache_path(source, cache_dir)
+    meta = _read_meta(directory)
+    fresh, sha256 = _cache_is_fresh(meta, source)
+    if fresh:
+        if sha256 is not None:
+            # Archivo tocado pero con el mismo contenido: se actualiza la firma
+            stat = os.stat(source)
+            meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as fh:
+                json.dump(meta, fh, indent=2)
+        return read_cache(directory, meta)
+
+    frame = parse_csv(source)
+    try:
+        meta = write_cache(frame, source, directory, sha256)
+    except OSError:
+        # Sin permisos de escritura: se trabaja con el CSV ya leído
+        return frame
+    return read_cache(directory, meta)
+
+
+def memory_footprint(frame):
+    """Bytes ocupados por las columnas (incluye los mapeados)."""
+    return int(frame.memory_usage(deep=True, index=False).sum())
+
+
+def _timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def report(source=paths.DATA_PATH):
+    """Tiempos de carga y memoria: CSV por defecto vs. tipado vs. caché mapeada."""
+    with tempfile.TemporaryDirectory() as tmp:
+        t_default, default = _timed(lambda: pd.read_csv(source))
+        t_typed, typed = _timed(lambda: parse_csv(source))
+        t_build, _ = _timed(lambda: write_cache(typed, source, _cache_path(source, tmp)), repeat=1)
+        directory = _cache_path(source, tmp)
+        t_mmap, mapped = _timed(lambda: read_cache(directory))
+        on_disk = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+    return [
+        ("pd.read_csv (tipos por defecto)", t_default, memory_footprint(default)),
+        ("CSV con tipos estrechos", t_typed, memory_footprint(typed)),
+        ("escritura de la caché", t_build, on_disk),
+        ("caché mapeada (np.load mmap)", t_mmap, memory_footprint(mapped)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Caché binaria de los datos de clientes")
+    parser.add_argument("--source", default=paths.DATA_PATH)
+    parser.add_argument("--report", action="store_true", help="medir tiempos y memoria")
+    parser.add_argument("--rebuild", action="store_true", help="regenerar la caché")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        shutil.rmtree(_cache_path(args.source, CACHE_DIR), ignore_errors=True)
+    if args.report:
+        print("%-34s %10s %12s" % ("método", "ms", "memoria"))
+        for label, seconds, size in report(args.source):
+            print("%-34s %10.2f %10.1f KB" % (label, seconds * 1000, size / 1024))
+    else:
+        frame = load_customers(args.source)
+        print("%d filas en %s" % (len(frame), _cache_path(args.source, CACHE_DIR)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Monitor de deriva de datos sobre el tráfico puntuado.
+
+``DriftMonitor`` compara la distribución de las variables que llegan al
+servicio con la de entrenamiento (``Bank Customer Churn Prediction.csv``):
+
+* Los bins de cada variable se fijan una vez a partir de los cuantiles de
+  entrenamiento (o de sus valores únicos si son pocos).
+* Cada registro observado se copia a un búfer preasignado; al llenarse (o al
+  cambiar la ventana) se vuelca con un solo ``bincount`` en un anillo
+  preasignado de histogramas por ventana de tiempo. No se retienen filas y el
+  costo por registro es constante.
+* ``evaluate()`` suma las ventanas vigentes y calcula PSI y la distancia KS
+  (sobre las CDF por bins) contra entrenamiento. Los cruces de umbral se
+  registran en el log ``churn.drift`` y en un archivo JSONL.
+
+Uso fuera del servicio::
+
+    python -m churn.drift nuevos_clientes.csv   # deriva de un archivo
+    python -m churn.drift --bench               # costo por registro
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from churn import paths
+from churn.batch import DEFAULT_CHUNKSIZE, iter_chunks
+from churn.features import PRODUCTION_SPEC, FeatureSpec, spec_for
+
+logger = logging.getLogger(__name__)
+
+ALERTS_PATH = os.path.join(paths.ROOT_DIR, ".cache", "monitoring", "drift_alerts.jsonl")
+
+DEFAULT_BINS = 10
+PSI_THRESHOLD = 0.2
+KS_THRESHOLD = 0.1
+
+# Proporción mínima por bin al calcular PSI (evita log(0))
+_EPSILON = 1e-4
+
+
+def bin_edges(values, bins=DEFAULT_BINS):
+    """Bordes interiores: puntos medios si hay pocos valores, si no cuantiles."""
+    values = values[~np.isnan(values)]
+    unique = np.unique(values)
+    if len(unique) <= bins:
+        return (unique[:-1] + unique[1:]) / 2
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+
+
+def psi(expected, actual):
+    """Population Stability Index entre dos vectores de proporciones."""
+    expected = np.maximum(expected, _EPSILON)
+    actual = np.maximum(actual, _EPSILON)
+    return float(((actual - expected) * np.log(actual / expected)).sum())
+
+
+def ks_distance(expected, actual):
+    """Máxima diferencia entre las CDF acumuladas por bins."""
+    return float(np.abs(np.cumsum(expected) - np.cumsum(actual)).max())
+
+
+class Reference:
+    """Bins y proporciones de entrenamiento por columna del modelo."""
+
+    def __init__(self, features, edges, proportions, spec=None):
+        self.features = tuple(features)
+        self.edges = edges
+        self.proportions = proportions
+        self.spec = spec or spec_for(features)
+
+    @classmethod
+    def from_frame(cls, frame, spec=PRODUCTION_SPEC, bins=DEFAULT_BINS):
+        """Referencia a partir de datos crudos; ``spec`` puede ser una lista de columnas."""
+        spec = spec if isinstance(spec, FeatureSpec) else spec_for(spec)
+        features = spec.columns
+        edges, proportions = [], []
+        matrix = spec.encode(frame)
+        for j, feature in enumerate(features):
+            values = matrix[:, j]
+            feature_edges = bin_edges(values, bins)
+            counts = np.bincount(np.searchsorted(feature_edges, values[~np.isnan(values)], side="right"),
+                                 minlength=len(feature_edges) + 1)
+            edges.append(feature_edges)
+            proportions.append(counts / counts.sum())
+        return cls(features, edges, proportions, spec)
+
+    @classmethod
+    def from_training(cls, spec=PRODUCTION_SPEC, bins=DEFAULT_BINS):
+        from churn.datastore import load_customers
+        return cls.from_frame(load_customers(), spec, bins)
+
+
+class DriftMonitor:
+    """Histogramas por ventana de tiempo y deriva contra entrenamiento."""
+
+    def __init__(self, reference, window_seconds=300, windows=12, buffer_rows=1024,
+                 psi_threshold=PSI_THRESHOLD, ks_threshold=KS_THRESHOLD, min_count=500,
+                 alerts_path=ALERTS_PATH, clock=time.time):
+        self.reference = reference
+        self.features = reference.features
+        self.window_seconds = window_seconds
+        self.windows = windows
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.min_count = min_count
+        self.alerts_path = alerts_path
+        self._clock = clock
+
+        n_features = len(self.features)
+        # Una columna extra por variable para los valores faltantes
+        self._width = max(len(e) for e in reference.edges) + 2
+        self._missing = self._width - 1
+        self._offsets = np.arange(n_features) * self._width
+        self._counts = np.zeros((windows, n_features, self._width), dtype=np.int64)
+        self._window_ids = np.full(windows, -1, dtype=np.int64)
+        self._buffer = np.empty((buffer_rows, n_features), dtype=np.float64)
+        self._buffered = 0
+        self._buffer_window = None
+        self._lock = threading.Lock()
+        self._alerting = set()
+        self.observed = 0
+
+    def _window_id(self, now=None):
+        return int((self._clock() if now is None else now) // self.window_seconds)
+
+    def observe(self, row):
+        """Registra una fila en el orden del modelo."""
+        window = self._window_id()
+        with self._lock:
+            if self._buffered == len(self._buffer) or window != self._buffer_window:
+                self._flush()
+                self._buffer_window = window
+            self._buffer[self._buffered] = row
+            self._buffered += 1
+
+    def observe_batch(self, X):
+        """Registra una matriz de filas en el orden del modelo."""
+        X = np.asarray(X, dtype=np.float64)
+        window = self._window_id()
+        with self._lock:
+            self._flush()
+            self._add(X, window)
+
+    def _flush(self):
+        if self._buffered:
+            self._add(self._buffer[:self._buffered], self._buffer_window)
+            self._buffered = 0
+
+    def _add(self, X, window):
+        if not len(X):
+            return
+        slot = window % self.windows
+        if self._window_ids[slot] != window:
+            self._counts[slot] = 0
+            self._window_ids[slot] = window
+        index = np.empty(X.shape, dtype=np.int64)
+        for j, edges in enumerate(self.reference.edges):
+            index[:, j] = np.searchsorted(edges, X[:, j], side="right")
+        index[np.isnan(X)] = self._missing
+        index += self._offsets
+        self._counts[slot] += np.bincount(index.ravel(), minlength=self._counts[slot].size).reshape(
+            self._counts[slot].shape)
+        self.observed += len(X)
+
+    def current_counts(self, windows=None):
+        """Conteos sumados de las últimas ``windows`` ventanas (todas por defecto)."""
+        windows = self.windows if windows is None else windows
+        latest = self._window_id()
+        with self._lock:
+            self._flush()
+            live = (self._window_ids > latest - windows) & (self._window_ids <= latest)
+            return self._counts[live].sum(axis=0)
+
+    def evaluate(self, windows=None):
+        """PSI y KS por variable sobre las ventanas vigentes; emite alertas."""
+        counts = self.current_counts(windows)
+        result = {"observed": self.observed, "window_seconds": self.window_seconds, "features": {}}
+        for j, feature in enumerate(self.features):
+            n_bins = len(self.reference.edges[j]) + 1
+            present = counts[j, :n_bins]
+            total = int(present.sum())
+            entry = {"count": total, "missing": int(counts[j, self._missing]),
+                     "psi": None, "ks": None, "drift": False}
+            if total:
+                actual = present / total
+                expected = self.reference.proportions[j]
+                entry["psi"] = psi(expected, actual)
+                entry["ks"] = ks_distance(expected, actual)
+                entry["drift"] = total >= self.min_count and (
+                    entry["psi"] >= self.psi_threshold or entry["ks"] >= self.ks_threshold)
+            result["features"][feature] = entry
+            self._alert(feature, entry)
+        result["drift"] = any(f["drift"] for f in result["features"].values())
+        return result
+
+    def _alert(self, feature, entry):
+        # Se avisa al entrar y al salir del estado de deriva, no en cada evaluación.
+        # evaluate() corre en el hilo de fondo y en GET /drift: la transición se
+        # decide bajo el lock para que cada una se avise una sola vez
+        with self._lock:
+            if entry["drift"] == (feature in self._alerting):
+                return
+            if entry["drift"]:
+                self._alerting.add(feature)
+            else:
+                self._alerting.discard(feature)
+        if entry["drift"]:
+            logger.warning("deriva en %s: PSI %.3f, KS %.3f (n=%d)",
+                           feature, entry["psi"], entry["ks"], entry["count"])
+        else:
+            logger.info("%s volvió a la distribución de entrenamiento", feature)
+        if self.alerts_path:
+            record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "feature": feature,
+                      "status": "drift" if entry["drift"] else "ok",
+                      "psi": entry["psi"], "ks": entry["ks"], "count": entry["count"]}
+            os.makedirs(os.path.dirname(self.alerts_path), exist_ok=True)
+            with open(self.alerts_path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(record) + "\n")
+
+    def start(self, interval=30.0):
+        """Evalúa la deriva en segundo plano cada ``interval`` segundos."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evaluate()
+                except Exception:
+                    logger.exception("error al evaluar la deriva")
+        thread = threading.Thread(target=loop, name="drift-monitor", daemon=True)
+        thread.start()
+        return thread
+
+
+def _bench(monitor, rows):
+    X = np.random.default_rng(0).normal(600, 100, (rows, len(monitor.features)))
+    started = time.perf_counter()
+    for row in X:
+        monitor.observe(row)
+    per_row = (time.perf_counter() - started) / rows
+    started = time.perf_counter()
+    monitor.observe_batch(X)
+    per_batch_row = (time.perf_counter() - started) / rows
+    return per_row, per_batch_row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deriva de datos contra el entrenamiento")
+    parser.add_argument("sources", nargs="*", help="archivos CSV o Parquet a comparar")
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--alerts", default=ALERTS_PATH, help="archivo JSONL de alertas")
+    parser.add_argument("--bench", action="store_true", help="medir el costo por registro")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    reference = Reference.from_training(bins=args.bins)
+    monitor = DriftMonitor(reference, window_seconds=math.inf, windows=1, alerts_path=args.alerts)
+    if args.bench:
+        per_row, per_batch_row = _bench(monitor, 200_000)
+        print("observe(): %.2f µs/registro, observe_batch(): %.3f µs/registro" % (
+            per_row * 1e6, per_batch_row * 1e6))
+        return 0
+    if not args.sources:
+        parser.error("indica al menos un archivo o --bench")
+    for path in args.sources:
+        for chunk in iter_chunks(path, reference.spec.inputs, args.chunksize):
+            monitor.observe_batch(reference.spec.encode(chunk))
+    result = monitor.evaluate()
+    print("%-18s %8s %8s %8s" % ("variable", "n", "PSI", "KS"))
+    for feature, entry in result["features"].items():
+        print("%-18s %8d %8.3f %8.3f%s" % (feature, entry["count"], entry["psi"] or 0,
+                                           entry["ks"] or 0, "  ← deriva" if entry["drift"] else ""))
+    return 1 if result["drift"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+Esquema de variables de los modelos.
+
+Un ``FeatureSpec`` declara qué campos de entrada usa un modelo y cómo se
+convierten en las columnas de su matriz, en orden:
+
+* ``numeric``: el valor tal cual, como ``float64``.
+* ``ordinal``: una categoría como su código en ``categories`` (NaN si no se
+  reconoce).
+* ``onehot``: una categoría como ``len(categories)`` columnas 0/1.
+* ``binned``: un valor numérico de ``source`` asignado a un tramo por
+  ``edges`` y expandido en columnas 0/1, como ``onehot``.
+
+``encode`` convierte un DataFrame (o un diccionario de arreglos) completo con
+operaciones NumPy por columna; ``encode_row`` es la variante para una sola
+fila, pensada para la ruta caliente del servicio y de la app. El esquema se
+guarda dentro del artefacto como ``feature_spec_`` (un diccionario, para que
+el artefacto se pueda leer sin este módulo) y el registro comprueba al
+cargarlo que sus columnas coinciden con las del modelo.
+
+Uso::
+
+    python -m churn.features            # esquemas conocidos
+    python -m churn.features --bench    # costo de encode_row y encode
+"""
+import argparse
+import bisect
+import json
+import math
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+KINDS = ("numeric", "ordinal", "onehot", "binned")
+
+CATEGORIES = {
+    "country": ("France", "Germany", "Spain"),
+    "gender": ("Female", "Male"),
+}
+
+# Orden de columnas con el que se entrenó gbm_model_production.joblib
+PRODUCTION_FEATURES = (
+    "credit_score",
+    "age",
+    "balance",
+    "products_number",
+    "estimated_salary",
+    "tenure",
+)
+
+# Tramos de credit_score_group del modelo de 12 columnas (gbm.py). El
+# cuaderno que los definió no está en el repositorio: los bordes son
+# supuestos, elegidos por ser los que dan menor log-loss del artefacto sobre
+# el CSV entre varias alternativas razonables. El modelo casi no usa estas
+# columnas (importancia < 0.2 %), así que el efecto sobre las predicciones es
+# mínimo.
+CREDIT_SCORE_GROUPS = ("Very Poor", "Mid Poor", "Poor", "Fair", "Good", "Excellent")
+CREDIT_SCORE_EDGES = (400, 500, 580, 670, 740)
+
+
+class SchemaError(ValueError):
+    """Los datos o el artefacto no coinciden con el esquema de variables."""
+
+
+class Feature:
+    """Una variable del esquema y las columnas que produce."""
+
+    def __init__(self, name, kind="numeric", source=None, categories=None, edges=None):
+        if kind not in KINDS:
+            raise ValueError("tipo de variable desconocido %r" % kind)
+        self.name = name
+        self.kind = kind
+        self.source = source or name
+        self.categories = tuple(categories) if categories is not None else None
+        self.edges = tuple(float(e) for e in edges) if edges is not None else None
+        if kind in ("ordinal", "onehot") and not self.categories:
+            raise ValueError("%s: faltan las categorías" % name)
+        if kind == "binned" and (self.edges is None or len(self.edges) + 1 != len(self.categories or ())):
+            raise ValueError("%s: se esperaban %d bordes" % (name, len(self.categories or ()) - 1))
+        self._codes = {c: i for i, c in enumerate(self.categories or ())}
+
+    @property
+    def columns(self):
+        if self.kind in ("numeric", "ordinal"):
+            return (self.name,)
+        return tuple("%s_%s" % (self.name, c) for c in self.categories)
+
+    def codes(self, values):
+        """Códigos enteros de una columna completa; -1 si falta o no se reconoce."""
+        if self.kind == "binned":
+            values = np.asarray(values, dtype=np.float64)
+            codes = np.searchsorted(self.edges, values, side="right")
+            codes[np.isnan(values)] = -1
+            return codes
+        index = pd.Index(self.categories)
+        if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+            # Se traducen las categorías (pocas), no cada fila
+            codes = np.asarray(values.cat.codes)
+            return np.where(codes < 0, -1, index.get_indexer(values.cat.categories)[codes])
+        return index.get_indexer(np.asarray(values))
+
+    def code(self, value):
+        """Código de un solo valor (``None`` si falta o no se reconoce)."""
+        if self.kind == "binned":
+            value = float(value)
+            return None if math.isnan(value) else bisect.bisect_right(self.edges, value)
+        return self._codes.get(value)
+
+    def to_dict(self):
+        data = {"name": self.name, "kind": self.kind}
+        if self.source != self.name:
+            data["source"] = self.source
+        if self.categories is not None:
+            data["categories"] = list(self.categories)
+        if self.edges is not None:
+            data["edges"] = list(self.edges)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data.get("kind", "numeric"), data.get("source"),
+                   data.get("categories"), data.get("edges"))
+
+    def __eq__(self, other):
+        return isinstance(other, Feature) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "<Feature %s %s>" % (self.name, self.kind)
+
+
+class FeatureSpec:
+    """Campos de entrada, columnas del modelo y su codificación."""
+
+    def __init__(self, features):
+        self.features = tuple(features)
+        self.columns = tuple(c for f in self.features for c in f.columns)
+        if len(set(self.columns)) != len(self.columns):
+            raise ValueError("columnas repetidas en el esquema: %s" % list(self.columns))
+        self.inputs = tuple(dict.fromkeys(f.source for f in self.features))
+        self.width = len(self.columns)
+        # Si todos los campos son numéricos y cada uno es una columna, la fila
+        # se arma sin pasos intermedios (el caso del modelo de producción).
+        self.direct = self.columns == self.inputs and all(
+            f.kind == "numeric" for f in self.features)
+        self._plan = []
+        offset = 0
+        for feature in self.features:
+            self._plan.append((feature, offset))
+            offset += len(feature.columns)
+
+    @classmethod
+    def from_names(cls, names):
+        """Esquema con una columna por nombre: ordinal si es categórica conocida."""
+        return cls(Feature(n, "ordinal", categories=CATEGORIES[n]) if n in CATEGORIES
+                   else Feature(n) for n in names)
+
+    def check_inputs(self, available):
+        missing = [f for f in self.inputs if f not in available]
+        if missing:
+            raise SchemaError("faltan campos: %s" % ", ".join(missing))
+
+    def encode(self, data):
+        """Matriz ``float64`` (filas × ``columns``) para un DataFrame o diccionario de columnas."""
+        self.check_inputs(data)
+        n_rows = len(data[self.inputs[0]]) if self.inputs else 0
+        X = np.zeros((n_rows, self.width), dtype=np.float64)
+        for feature, offset in self._plan:
+            values = data[feature.source]
+            try:
+                if feature.kind == "numeric":
+                    X[:, offset] = np.asarray(values)
+                    continue
+                codes = feature.codes(values)
+            except (TypeError, ValueError):
+                raise SchemaError("%s: se esperaban valores numéricos" % feature.source)
+            if feature.kind == "ordinal":
+                X[:, offset] = np.where(codes < 0, np.nan, codes)
+            else:
+                rows = np.flatnonzero(codes >= 0)
+                X[rows, offset + codes[rows]] = 1.0
+        return X
+
+    def encode_row(self, values):
+        """Fila ``float64`` (``columns``) a partir de un diccionario de campos."""
+        try:
+            if self.direct:
+                fields = list(map(values.__getitem__, self.inputs))
+                # fromiter convertiría None en NaN; float() lo rechaza, como en el camino general
+                if None in fields:
+                    raise SchemaError("los campos deben ser numéricos")
+                return np.fromiter(fields, np.float64, self.width)
+            row = np.zeros(self.width, dtype=np.float64)
+            for feature, offset in self._plan:
+                value = values[feature.source]
+                if feature.kind == "numeric":
+                    row[offset] = float(value)
+                    continue
+                code = feature.code(value)
+                if feature.kind == "ordinal":
+                    row[offset] = np.nan if code is None else code
+                elif code is not None:
+                    row[offset + code] = 1.0
+            return row
+        except KeyError:
+            self.check_inputs(values)
+            raise
+        except (TypeError, ValueError):
+            raise SchemaError("los campos deben ser numéricos")
+
+    def validate(self, X):
+        """Comprueba que ``X`` tiene el ancho del esquema."""
+        X = np.asarray(X)
+        if X.shape[-1] != self.width:
+            raise SchemaError("se esperaban %d columnas (%s), llegaron %d" % (
+                self.width, ", ".join(self.columns), X.shape[-1]))
+        return X
+
+    def check_model(self, model):
+        """Comprueba que el estimador fue entrenado con estas columnas, en este orden."""
+        n_features = getattr(model, "n_features_in_", None)
+        if n_features != self.width:
+            raise SchemaError(
+                "el modelo espera %s variables, el esquema declara %d" % (n_features, self.width))
+        names = getattr(model, "feature_names_in_", None)
+        if names is not None and tuple(names) != self.columns:
+            raise SchemaError("orden de variables inesperado: %s" % list(names))
+
+    def attach(self, model):
+        """Guarda el esquema en el estimador para que viaje con el artefacto."""
+        self.check_model(model)
+        model.feature_spec_ = self.to_dict()
+        return model
+
+    def to_dict(self):
+        return {"features": [f.to_dict() for f in self.features]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(Feature.from_dict(f) for f in data["features"])
+
+    def __eq__(self, other):
+        return isinstance(other, FeatureSpec) and self.features == other.features
+
+    def __repr__(self):
+        return "<FeatureSpec %s>" % ", ".join(self.columns)
+
+
+PRODUCTION_SPEC = FeatureSpec.from_names(PRODUCTION_FEATURES)
+
+LEGACY_SPEC = FeatureSpec(list(PRODUCTION_SPEC.features) + [
+    Feature("credit_score_group", "binned", source="credit_score",
+            categories=CREDIT_SCORE_GROUPS, edges=CREDIT_SCORE_EDGES),
+])
+
+_specs = {}
+
+
+def spec_for(names):
+    """``FeatureSpec.from_names`` memorizado por tupla de nombres."""
+    names = tuple(names)
+    spec = _specs.get(names)
+    if spec is None:
+        spec = _specs[names] = FeatureSpec.from_names(names)
+    return spec
+
+
+def model_spec(model):
+    """Esquema guardado en el artefacto, o ``None`` si no tiene."""
+    data = getattr(model, "feature_spec_", None)
+    return FeatureSpec.from_dict(data) if data is not None else None
+
+
+def feature_matrix(frame, features):
+    """Matriz ``float64`` en el orden de ``features`` (una columna por nombre)."""
+    return spec_for(features).encode(frame)
+
+
+def _bench(spec, calls=100_000, rows=100_000):
+    values = {"credit_score": 650, "age": 40, "balance": 50000.0, "products_number": 2,
+              "estimated_salary": 75000.0, "tenure": 5, "country": "Spain", "gender": "Female"}
+    started = time.perf_counter()
+    for _ in range(calls):
+        spec.encode_row(values)
+    per_row = (time.perf_counter() - started) / calls
+
+    from churn.datastore import load_customers
+
+    data = load_customers()
+    frame = data.iloc[np.arange(rows) % len(data)].reset_index(drop=True)
+    started = time.perf_counter()
+    spec.encode(frame)
+    per_batch_row = (time.perf_counter() - started) / rows
+    return per_row, per_batch_row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Esquemas de variables de los modelos")
+    parser.add_argument("--bench", action="store_true", help="medir encode_row y encode")
+    args = parser.parse_args(argv)
+
+    specs = {"producción": PRODUCTION_SPEC, "legado (12 columnas)": LEGACY_SPEC,
+             "hist": spec_for(PRODUCTION_FEATURES + tuple(CATEGORIES))}
+    for label, spec in specs.items():
+        if args.bench:
+            per_row, per_batch_row = _bench(spec)
+            print("%-22s encode_row: %.2f µs, encode: %.3f µs/fila" % (
+                label, per_row * 1e6, per_batch_row * 1e6))
+        else:
+            print("%s: %s" % (label, json.dumps(spec.to_dict(), ensure_ascii=False)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,477 @@
+"""
+Instrumentación de las rutas calientes.
+
+Temporizadores por operación (``timer``, ``timed``) que alimentan histogramas
+en memoria con los buckets de Prometheus. Desactivados (por defecto) cuestan
+una comprobación de un booleano: ``timer`` devuelve un contexto nulo
+compartido y ``timed`` llama directo a la función.
+
+Con la instrumentación activa los histogramas se pueden:
+
+* consultar en texto de Prometheus (``render_prometheus``), servido en
+  ``GET /metrics`` por ``churn.service`` o por ``serve_metrics`` en la app;
+* volcar evento por evento a un archivo JSONL.
+
+``request`` marca una petición completa (un rerun de la app, una llamada al
+servicio): además de medirla puede perfilarla con cProfile (``.prof``) o con
+un muestreador de pilas (``.folded``, para flamegraphs), un archivo por
+petición en ``.cache/profiles/``.
+
+La app lee la configuración del entorno::
+
+    CHURN_INSTRUMENT=1 CHURN_METRICS_PORT=9464 \\
+    CHURN_METRICS_JSONL=.cache/metrics.jsonl CHURN_PROFILE=cprofile \\
+        streamlit run app_streamlit/app.py
+
+Uso::
+
+    python -m churn.instrument report .cache/metrics.jsonl   # percentiles por operación
+    python -m churn.instrument profile .cache/profiles/app.rerun-*.prof
+"""
+import argparse
+import bisect
+import collections
+import contextlib
+import functools
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from churn import paths
+
+PROFILE_DIR = os.path.join(paths.ROOT_DIR, ".cache", "profiles")
+PROFILE_MODES = ("cprofile", "sample")
+
+# Límites superiores de los buckets, en segundos
+BUCKETS = (25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3,
+           50e-3, 100e-3, 250e-3, 500e-3, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_NAME = "churn_operation_seconds"
+
+_NULL = contextlib.nullcontext()
+
+
+class Histogram:
+    """Conteos por bucket, suma y total de duraciones."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Cuantil aproximado: límite superior del bucket que lo contiene."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else None,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99)}
+
+
+class Metrics:
+    """Histogramas por operación y etiquetas, con un destino JSONL opcional."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._jsonl = None
+        self.jsonl_path = None
+
+    def open_jsonl(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+            self._jsonl = open(path, "a", encoding="utf-8", buffering=1)
+            self.jsonl_path = path
+
+    def observe(self, name, seconds, labels=None):
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+            if self._jsonl is not None:
+                record = {"time": time.time(), "op": name, "seconds": seconds}
+                if labels:
+                    record.update(labels)
+                self._jsonl.write(json.dumps(record) + "\n")
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        """``{operación: {etiquetas: resumen}}`` de lo medido hasta ahora."""
+        with self._lock:
+            items = [(key, h.to_dict()) for key, h in self._histograms.items()]
+        result = {}
+        for (name, labels), summary in sorted(items):
+            label = ",".join("%s=%s" % pair for pair in labels)
+            result.setdefault(name, {})[label] = summary
+        return result
+
+    def render_prometheus(self):
+        """Histogramas en el formato de texto de Prometheus."""
+        lines = ["# HELP %s Duración de las operaciones instrumentadas." % METRIC_NAME,
+                 "# TYPE %s histogram" % METRIC_NAME]
+        with self._lock:
+            items = sorted((key, list(h.counts), h.sum, h.count) for key, h in self._histograms.items())
+        for (name, labels), counts, total, count in items:
+            base = 'op="%s"' % _escape(name) + "".join(
+                ',%s="%s"' % (k, _escape(str(v))) for k, v in labels)
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, counts):
+                cumulative += bucket
+                lines.append('%s_bucket{%s,le="%g"} %d' % (METRIC_NAME, base, bound, cumulative))
+            lines.append('%s_bucket{%s,le="+Inf"} %d' % (METRIC_NAME, base, count))
+            lines.append("%s_sum{%s} %.9f" % (METRIC_NAME, base, total))
+            lines.append("%s_count{%s} %d" % (METRIC_NAME, base, count))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_enabled = False
+_metrics = Metrics()
+_profile_mode = None
+_profile_dir = PROFILE_DIR
+_sample_interval = 0.005
+_active = threading.local()
+_profile_seq = 0
+_configure_lock = threading.Lock()
+_metrics_server = None
+
+
+def enabled():
+    return _enabled
+
+
+def get_metrics():
+    return _metrics
+
+
+def configure(enabled=True, jsonl=None, profile=None, profile_dir=PROFILE_DIR, sample_interval=0.005):
+    """Activa o desactiva la instrumentación para todo el proceso."""
+    global _enabled, _profile_mode, _profile_dir, _sample_interval
+    if profile is not None and profile not in PROFILE_MODES:
+        raise ValueError("modo de perfilado desconocido %r (opciones: %s)" % (
+            profile, ", ".join(PROFILE_MODES)))
+    with _configure_lock:
+        if jsonl and jsonl != _metrics.jsonl_path:
+            _metrics.open_jsonl(jsonl)
+        _profile_mode = profile
+        _profile_dir = profile_dir
+        _sample_interval = sample_interval
+        _enabled = bool(enabled or jsonl or profile)
+
+
+def configure_from_env(environ=None):
+    """Configura desde ``CHURN_INSTRUMENT``, ``CHURN_METRICS_JSONL``, ``CHURN_PROFILE``,
+    ``CHURN_PROFILE_DIR`` y ``CHURN_METRICS_PORT``. Se puede llamar en cada rerun."""
+    environ = os.environ if environ is None else environ
+    flag = environ.get("CHURN_INSTRUMENT", "").lower() not in ("", "0", "false", "no")
+    jsonl = environ.get("CHURN_METRICS_JSONL") or None
+    profile = environ.get("CHURN_PROFILE") or None
+    port = environ.get("CHURN_METRICS_PORT")
+    if not (flag or jsonl or profile or port):
+        return False
+    configure(True, jsonl, profile, environ.get("CHURN_PROFILE_DIR") or PROFILE_DIR)
+    if port:
+        serve_metrics(int(port))
+    return True
+
+
+def observe(name, seconds, **labels):
+    if _enabled:
+        _metrics.observe(name, seconds, labels)
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _metrics.observe(self.name, time.perf_counter() - self.started, self.labels)
+
+
+def timer(name, **labels):
+    """Contexto que mide el bloque como ``name``; nulo si la instrumentación está apagada."""
+    if not _enabled:
+        return _NULL
+    return _Timer(name, labels)
+
+
+def timed(name, **labels):
+    """Decorador equivalente a envolver la función en ``timer(name)``."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _metrics.observe(name, time.perf_counter() - started, labels)
+        return wrapper
+    return decorate
+
+
+class SamplingProfiler:
+    """Muestrea la pila de un hilo cada ``interval`` segundos desde otro hilo."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename),
+                                             code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def dump(self, path):
+        """Formato de pilas plegadas (``flamegraph.pl``, speedscope)."""
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write("%s %d\n" % (stack, count))
+
+
+class _Request:
+    """Petición medida y, si corresponde, perfilada."""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.started = None
+        self.profiler = None
+        self.profile_path = None
+
+    def start(self):
+        previous = getattr(_active, "request", None)
+        if previous is not None:
+            # La anterior no llegó a cerrarse (p. ej. st.stop() a mitad de un rerun)
+            previous.stop()
+        _active.request = self
+        if _profile_mode == "cprofile":
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Python 3.12+: ya hay otro perfilador activo (otra petición concurrente)
+                self.profiler = None
+        elif _profile_mode == "sample":
+            self.profiler = SamplingProfiler(threading.get_ident(), _sample_interval).start()
+        self.started = time.perf_counter()
+        return self
+
+    def stop(self):
+        if self.started is None:
+            return None
+        seconds = time.perf_counter() - self.started
+        self.started = None
+        if getattr(_active, "request", None) is self:
+            _active.request = None
+        if self.profiler is not None:
+            self._dump_profile()
+        _metrics.observe(self.name, seconds, self.labels)
+        return seconds
+
+    def _dump_profile(self):
+        global _profile_seq
+        os.makedirs(_profile_dir, exist_ok=True)
+        with _configure_lock:
+            _profile_seq += 1
+            seq = _profile_seq
+        stem = os.path.join(_profile_dir, "%s-%s-%d-%04d" % (
+            self.name, time.strftime("%Y%m%d-%H%M%S"), os.getpid(), seq))
+        if isinstance(self.profiler, SamplingProfiler):
+            self.profiler.stop()
+            self.profile_path = stem + ".folded"
+            self.profiler.dump(self.profile_path)
+        else:
+            self.profiler.disable()
+            self.profile_path = stem + ".prof"
+            self.profiler.dump_stats(self.profile_path)
+        self.profiler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _NullRequest:
+    def start(self):
+        return self
+
+    def stop(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_REQUEST = _NullRequest()
+
+
+def request(name, **labels):
+    """Petición completa: se mide y, con perfilado activo, se guarda su perfil.
+
+    Se usa como contexto o con ``start()``/``stop()`` cuando el código no se
+    puede envolver en un bloque (el script de la app).
+    """
+    if not _enabled:
+        return _NULL_REQUEST
+    return _Request(name, labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = _metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Sirve ``GET /metrics`` en un hilo aparte; una sola vez por proceso."""
+    global _metrics_server
+    with _configure_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics", daemon=True).start()
+    return _metrics_server
+
+
+def summarize_jsonl(path):
+    """Percentiles exactos por operación a partir de un archivo JSONL."""
+    import numpy as np
+
+    durations = collections.defaultdict(list)
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            record = json.loads(line)
+            durations[record["op"]].append(record["seconds"])
+    summary = {}
+    for name, values in sorted(durations.items()):
+        values = np.asarray(values)
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        summary[name] = {"count": len(values), "total": float(values.sum()), "mean": float(values.mean()),
+                         "p50": float(p50), "p90": float(p90), "p99": float(p99),
+                         "max": float(values.max())}
+    return summary
+
+
+def _ms(seconds):
+    return "%.3f" % (seconds * 1e3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Métricas y perfiles de la instrumentación")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="percentiles por operación de un JSONL")
+    report_parser.add_argument("path")
+    profile_parser = commands.add_parser("profile", help="funciones más costosas de uno o más perfiles")
+    profile_parser.add_argument("paths", nargs="*", help="archivos .prof o .folded (default: el último)")
+    profile_parser.add_argument("--top", type=int, default=25)
+    profile_parser.add_argument("--sort", default="cumulative", help="orden de pstats (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        summary = summarize_jsonl(args.path)
+        print("%-28s %8s %10s %9s %9s %9s %9s" % ("operación", "n", "total s", "p50 ms", "p90 ms",
+                                                  "p99 ms", "máx ms"))
+        for name, s in summary.items():
+            print("%-28s %8d %10.3f %9s %9s %9s %9s" % (name, s["count"], s["total"], _ms(s["p50"]),
+                                                        _ms(s["p90"]), _ms(s["p99"]), _ms(s["max"])))
+        return 0
+
+    profiles = args.paths or sorted(glob.glob(os.path.join(PROFILE_DIR, "*.prof")) +
+                                    glob.glob(os.path.join(PROFILE_DIR, "*.folded")),
+                                    key=os.path.getmtime)[-1:]
+    if not profiles:
+        parser.error("no hay perfiles en %s" % PROFILE_DIR)
+    folded = [p for p in profiles if p.endswith(".folded")]
+    stats_paths = [p for p in profiles if not p.endswith(".folded")]
+    if stats_paths:
+        import pstats
+
+        pstats.Stats(*stats_paths).sort_stats(args.sort).print_stats(args.top)
+    if folded:
+        # Tiempo propio por función: la última entrada de cada pila muestreada
+        own = collections.Counter()
+        for path in folded:
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    stack, count = line.rsplit(" ", 1)
+                    own[stack.rsplit(";", 1)[-1]] += int(count)
+        total = sum(own.values())
+        for function, count in own.most_common(args.top):
+            print("%6.1f%%  %s" % (100 * count / total, function))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
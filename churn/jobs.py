@@ -0,0 +1,281 @@
+"""
+Puntuación de archivos en segundo plano.
+
+``ScoringJob`` puntúa un CSV o Parquet en un hilo aparte, bloque a bloque,
+con el modelo que ya tiene en memoria el registro. Mientras corre se puede
+consultar sin bloquear:
+
+* ``snapshot()``: estado, filas procesadas, avance y agregados por nivel de
+  riesgo (conteo, probabilidad media) e histograma de probabilidades, que se
+  actualizan con cada bloque;
+* ``page(number, size)``: una página de los resultados ya calculados.
+
+En memoria solo queda el bloque que se está puntuando y los resultados en
+forma compacta (identificador, probabilidad en ``float32`` y código de
+riesgo); el archivo de salida se escribe a medida que avanza. Con ``store``
+cada bloque se incorpora además a una ``churn.portfolio.PortfolioStore``. Es
+lo que usa la página **📂 Cartera** de la app.
+
+Uso::
+
+    python -m churn.jobs clientes.csv puntuaciones.csv --chunksize 50000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from churn.batch import (ID_COLUMN, ResultWriter, _require_pyarrow, file_format, iter_chunks,
+                         score_matrix)
+from churn.portfolio import EXTRA as PORTFOLIO_COLUMNS
+from churn.registry import PRODUCTION_MODEL, get_registry
+from churn.risk import RISK_LEVELS, risk_codes
+from churn.stats import Histogram
+
+DEFAULT_CHUNKSIZE = 50_000
+# Código de riesgo de las filas que no se pudieron puntuar (valores faltantes)
+MISSING_CODE = -1
+
+
+def count_rows(path, fmt=None):
+    """Filas de datos del archivo, sin cargarlo (``None`` si no se puede saber)."""
+    if file_format(path, fmt) == "parquet":
+        pa = _require_pyarrow()
+        return pa.parquet.ParquetFile(path).metadata.num_rows
+    lines, last = 0, b"\n"
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+class ScoringJob:
+    """Puntuación de un archivo en un hilo, consultable mientras avanza."""
+
+    def __init__(self, input_path, output_path, model=PRODUCTION_MODEL, chunksize=DEFAULT_CHUNKSIZE,
+                 input_format=None, output_format=None, registry=None, store=None):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.model = model
+        self.chunksize = chunksize
+        self.input_format = input_format
+        self.output_format = output_format
+        self.registry = registry or get_registry()
+        self.store = store
+        self.state = "pending"
+        self.error = None
+        self.label = None
+        self.total_rows = None
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = None
+        # Resultados por bloque y desplazamiento de cada uno
+        self._ids = []
+        self._probabilities = []
+        self._codes = []
+        self._offsets = [0]
+        self._band_counts = np.zeros(len(RISK_LEVELS), dtype=np.int64)
+        self._band_sums = np.zeros(len(RISK_LEVELS))
+        self._missing = 0
+        self._histogram = Histogram(0.0, 1.0, bins=20)
+
+    @property
+    def rows(self):
+        return self._offsets[-1]
+
+    def start(self):
+        self.started_at = time.time()
+        self.state = "running"
+        self._thread = threading.Thread(target=self._run, name="scoring-job", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.state
+
+    @property
+    def finished(self):
+        return self.state in ("done", "cancelled", "error")
+
+    def _run(self):
+        try:
+            try:
+                self.total_rows = count_rows(self.input_path, self.input_format)
+            except (OSError, ValueError):
+                self.total_rows = None
+            # El modelo ya cargado (y compilado) del registro, no uno nuevo por trabajo
+            entry = self.registry.get(self.model)
+            self.label = entry.label
+            with ResultWriter(self.output_path, self.output_format) as writer:
+                chunks = iter_chunks(self.input_path, entry.spec.inputs, self.chunksize,
+                                     self.input_format,
+                                     PORTFOLIO_COLUMNS if self.store is not None else ())
+                for frame in chunks:
+                    if self._cancel.is_set():
+                        self.state = "cancelled"
+                        break
+                    probabilities = score_matrix(entry, entry.spec.encode(frame))
+                    ids = frame[ID_COLUMN].to_numpy() if ID_COLUMN in frame else None
+                    result = self._add(ids, probabilities)
+                    writer.write(result)
+                    if self.store is not None and ids is not None:
+                        self.store.upsert(frame, probabilities, self.label)
+                    # Se suelta antes de leer el siguiente: un solo bloque crudo en memoria
+                    del frame
+            if self.state == "running":
+                self.state = "done"
+            if self.store is not None and self.rows:
+                self.store.save()
+        except Exception as exc:
+            self.error = str(exc) or exc.__class__.__name__
+            self.state = "error"
+        finally:
+            self.finished_at = time.time()
+
+    def _add(self, ids, probabilities):
+        """Incorpora un bloque a los agregados; devuelve sus filas de salida."""
+        missing = np.isnan(probabilities)
+        codes = risk_codes(np.where(missing, 0.0, probabilities))
+        codes[missing] = MISSING_CODE
+        valid = codes >= 0
+        counts = np.bincount(codes[valid], minlength=len(RISK_LEVELS))
+        sums = np.bincount(codes[valid], weights=probabilities[valid], minlength=len(RISK_LEVELS))
+        start = self.rows
+        if ids is None:
+            ids = np.arange(start, start + len(probabilities))
+        with self._lock:
+            self._ids.append(ids)
+            self._probabilities.append(probabilities.astype(np.float32))
+            self._codes.append(codes)
+            self._band_counts += counts
+            self._band_sums += sums
+            self._missing += int(missing.sum())
+            self._histogram.update(probabilities)
+            self._offsets.append(start + len(probabilities))
+        return self._frame(ids, probabilities, codes)
+
+    @staticmethod
+    def _frame(ids, probabilities, codes):
+        levels = np.asarray(RISK_LEVELS + ("",), dtype=object)[codes]
+        return pd.DataFrame({ID_COLUMN: ids, "churn_probability": probabilities, "risk_level": levels})
+
+    def snapshot(self):
+        """Estado y agregados del trabajo en este momento."""
+        with self._lock:
+            rows = self.rows
+            counts = self._band_counts.copy()
+            sums = self._band_sums.copy()
+            missing = self._missing
+            histogram = self._histogram.counts.copy()
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        progress = None
+        if self.state == "done":
+            progress = 1.0
+        elif self.total_rows:
+            progress = min(rows / self.total_rows, 1.0)
+        edges = self._histogram.edges
+        return {
+            "state": self.state,
+            "error": self.error,
+            "model": self.label,
+            "rows": rows,
+            "total_rows": self.total_rows,
+            "progress": progress,
+            "seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed else 0.0,
+            "missing": missing,
+            "bands": [{"risk_level": level, "customers": int(n),
+                       "mean_probability": float(s / n) if n else None}
+                      for level, n, s in zip(RISK_LEVELS, counts, sums)],
+            "histogram": [{"label": "%.2f–%.2f" % (edges[i], edges[i + 1]), "count": int(c)}
+                          for i, c in enumerate(histogram)],
+        }
+
+    def page(self, number, size=50):
+        """Filas ``[number * size, (number + 1) * size)`` de los resultados disponibles."""
+        with self._lock:
+            offsets = list(self._offsets)
+            blocks = list(zip(self._ids, self._probabilities, self._codes))
+        start, stop = number * size, min((number + 1) * size, offsets[-1])
+        if start >= stop:
+            return self._frame(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int8))
+        first = int(np.searchsorted(offsets, start, side="right")) - 1
+        parts = []
+        index = first
+        while index < len(blocks) and offsets[index] < stop:
+            lo = max(start - offsets[index], 0)
+            hi = min(stop - offsets[index], offsets[index + 1] - offsets[index])
+            ids, probabilities, codes = blocks[index]
+            parts.append(self._frame(ids[lo:hi], probabilities[lo:hi], codes[lo:hi]))
+            index += 1
+        return pd.concat(parts, ignore_index=True)
+
+
+class UploadedJob(ScoringJob):
+    """Trabajo sobre una copia temporal de un archivo subido; borra sus archivos al cerrarse."""
+
+    def __init__(self, fileobj, filename, output_format="csv", **kwargs):
+        self.directory = tempfile.mkdtemp(prefix="churn-portfolio-")
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+        input_format = file_format(filename)
+        input_path = os.path.join(self.directory, "input." + input_format)
+        # Se copia por bloques: el archivo no se parsea entero en memoria
+        with open(input_path, "wb") as fh:
+            shutil.copyfileobj(fileobj, fh, 1 << 20)
+        output_path = os.path.join(self.directory, "scores." + output_format)
+        super().__init__(input_path, output_path, input_format=input_format,
+                         output_format=output_format, **kwargs)
+        self.filename = filename
+
+    def close(self):
+        self.cancel()
+        self.wait()
+        self._finalizer()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Puntuación de un archivo en segundo plano")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--model", default=PRODUCTION_MODEL)
+    args = parser.parse_args(argv)
+
+    job = ScoringJob(args.input, args.output, args.model, args.chunksize).start()
+    while not job.finished:
+        job.wait(0.5)
+        s = job.snapshot()
+        total = s["total_rows"] if s["total_rows"] is not None else "?"
+        print("%s: %d/%s filas (%.0f filas/s)" % (s["state"], s["rows"], total, s["rows_per_second"]),
+              flush=True)
+    s = job.snapshot()
+    if s["state"] == "error":
+        print("error: %s" % s["error"], file=sys.stderr)
+        return 1
+    for band in s["bands"]:
+        mean = "%.3f" % band["mean_probability"] if band["mean_probability"] is not None else "-"
+        print("%-6s %10d clientes, probabilidad media %s" % (band["risk_level"], band["customers"], mean))
+    if s["missing"]:
+        print("%d filas sin puntuar (valores faltantes)" % s["missing"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
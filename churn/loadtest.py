@@ -0,0 +1,118 @@
+"""
+Prueba de carga del servicio de puntuación.
+
+Lanza ``--concurrency`` hilos con conexiones HTTP/1.1 persistentes contra un
+servicio ya levantado (``python -m churn.service``) y reporta latencias
+p50/p90/p99 y el rendimiento. Los clientes se toman del CSV de entrenamiento.
+
+Uso::
+
+    python -m churn.loadtest --url http://127.0.0.1:8000 --concurrency 32 --requests 20000
+    python -m churn.loadtest --batch-size 100   # usa /predict_batch
+"""
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from churn.datastore import load_customers
+from churn.service import INPUT_FIELDS
+
+
+def load_payloads(n, batch_size=0, seed=0):
+    """Cuerpos JSON ya serializados para no medir la serialización del cliente."""
+    data = load_customers()[list(INPUT_FIELDS)]
+    rng = np.random.default_rng(seed)
+    records = data.to_dict("records")
+    picks = rng.integers(0, len(records), n * max(batch_size, 1))
+    if not batch_size:
+        return [json.dumps(records[i]).encode() for i in picks]
+    return [
+        json.dumps({"customers": [records[i] for i in picks[j:j + batch_size]]}).encode()
+        for j in range(0, len(picks), batch_size)
+    ]
+
+
+def _worker(host, port, path, payloads, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    for body in payloads:
+        started = time.perf_counter()
+        try:
+            conn.request("POST", path, body, headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(repr(exc))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def run(url, concurrency, requests, batch_size=0):
+    """Ejecuta la prueba y devuelve un resumen con latencias en milisegundos."""
+    parts = urlsplit(url)
+    path = "/predict_batch" if batch_size else "/predict"
+    payloads = load_payloads(requests, batch_size)
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=_worker, args=(parts.hostname, parts.port or 80, path,
+                                               payloads[i::concurrency], latencies, errors))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    rows = len(latencies) * max(batch_size, 1)
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "rows_per_second": rows / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)) if len(ms) else None,
+        "p90_ms": float(np.percentile(ms, 90)) if len(ms) else None,
+        "p99_ms": float(np.percentile(ms, 99)) if len(ms) else None,
+        "max_ms": float(ms.max()) if len(ms) else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de puntuación")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="clientes por petición a /predict_batch (0 = /predict)")
+    parser.add_argument("--json", action="store_true", help="imprimir el resumen como JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.url, args.concurrency, args.requests, args.batch_size)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("%(requests)d peticiones (%(errors)d errores) en %(seconds).2fs" % report)
+        print("rendimiento: %(requests_per_second).0f peticiones/s, %(rows_per_second).0f clientes/s" % report)
+        if report["requests"]:
+            print("latencia: p50 %(p50_ms).2f ms, p90 %(p90_ms).2f ms, "
+                  "p99 %(p99_ms).2f ms, máx %(max_ms).2f ms" % report)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
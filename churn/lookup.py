@@ -0,0 +1,445 @@
+"""
+Tabla precalculada de puntajes sobre la grilla de la app.
+
+Los controles de la app solo producen valores discretos (``DOMAIN``: puntaje
+de a 10, edad 18–92, antigüedad 1–20, productos 0–4, saldo y salario de a
+1000). Dentro de esa grilla los umbrales del GBM dividen cada variable en
+pocas *celdas*: valores que quedan del mismo lado de todos los umbrales y,
+por lo tanto, reciben el mismo puntaje en cada árbol.
+
+El producto de celdas sigue siendo grande para una tabla densa (≈10⁸ para el
+modelo de producción), pero cada hoja de un árbol depende solo de las
+variables de su camino (a lo sumo la profundidad, 3). La construcción
+reparte el valor de cada hoja en una tabla por conjunto de variables del
+camino, indexada por celdas, y suma las tablas contenidas en otras. Un
+puntaje es entonces ``sigmoide(sesgo + Σ tabla[celdas])``: unas pocas
+lecturas por fila, sin recorrer árboles. Si el producto de celdas entra en
+el presupuesto de memoria se arma además la tabla densa (una sola lectura).
+Si ni las tablas factorizadas entran, no se construye nada y se puntúa en
+vivo.
+
+Las filas fuera de la grilla (p. ej. un saldo de 1234.5) se puntúan en vivo
+con el modelo. La verificación comprueba que cada valor de la grilla cae del
+mismo lado de cada umbral que el representante de su celda y compara la
+tabla con ``predict_proba`` sobre celdas (todas con ``--full``) y sobre
+puntos de la grilla. La única diferencia posible es el orden de la suma en
+punto flotante (≈1e-16).
+
+La tabla se guarda en ``.cache/lookup/`` por huella del artefacto y la caché
+de predicciones de la app la usa cuando existe.
+
+Uso::
+
+    python -m churn.lookup --build --verify      # construir y verificar
+    python -m churn.lookup --verify --full       # todas las celdas (≈3 minutos)
+    python -m churn.lookup --bench
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from churn import paths
+from churn.artifact import sklearn_model
+from churn.compiled import _expit, sklearn_proba
+from churn.registry import PRODUCTION_MODEL, get_registry
+
+CACHE_DIR = os.path.join(paths.ROOT_DIR, ".cache", "lookup")
+
+# (mínimo, máximo, paso) de cada variable en los controles de la app
+DOMAIN = {
+    "credit_score": (300, 850, 10),
+    "age": (18, 92, 1),
+    "tenure": (1, 20, 1),
+    "products_number": (0, 4, 1),
+    "balance": (0, 300_000, 1000),
+    "estimated_salary": (0, 300_000, 1000),
+}
+
+DEFAULT_BUDGET_MB = 64
+
+# Diferencia máxima admitida contra predict_proba (orden de la suma)
+TOLERANCE = 1e-12
+
+
+class LookupTable:
+    """Puntajes precalculados por celda para las filas de la grilla."""
+
+    def __init__(self, features, domain, cell_maps, tables, bias, fingerprint=None, dense=None):
+        self.features = tuple(features)
+        self.domain = [tuple(float(v) for v in domain[f]) for f in self.features]
+        # Para cada variable: índice en la grilla -> celda
+        self.cell_maps = [np.asarray(m, dtype=np.intp) for m in cell_maps]
+        # Tablas factorizadas: (posiciones de las variables, arreglo por celdas)
+        self.tables = [(tuple(axes), np.ascontiguousarray(t)) for axes, t in tables]
+        self.bias = float(bias)
+        self.fingerprint = fingerprint
+        self.dense = dense
+        self.shape = tuple(int(m.max()) + 1 for m in self.cell_maps)
+        # Todas las tablas en un solo arreglo: la posición de una fila en cada
+        # tabla es ``offsets + strides @ celdas`` y se leen con un único take
+        self._values = np.concatenate([t.ravel() for _, t in self.tables])
+        self._strides = np.zeros((len(self.tables), len(self.features)), dtype=np.intp)
+        self._offsets = np.zeros(len(self.tables), dtype=np.intp)
+        offset = 0
+        for i, (axes, table) in enumerate(self.tables):
+            for a, stride in zip(axes, table.strides):
+                self._strides[i, a] = stride // table.itemsize
+            self._offsets[i] = offset
+            offset += table.size
+        # Camino de una fila en Python puro: (mínimo, paso, celdas como lista)
+        self._row_domain = [(low, step, m.tolist()) for (low, _, step), m in zip(self.domain, self.cell_maps)]
+
+    @property
+    def nbytes(self):
+        total = sum(t.nbytes for _, t in self.tables)
+        return total + (self.dense.nbytes if self.dense is not None else 0)
+
+    @property
+    def n_cells(self):
+        return int(np.prod([float(s) for s in self.shape]))
+
+    def cells(self, X):
+        """Celdas de cada fila (filas × variables) y máscara de filas dentro de la grilla."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        cells = np.zeros(X.shape, dtype=np.intp)
+        covered = np.ones(len(X), dtype=bool)
+        for j, ((low, high, step), cell_map) in enumerate(zip(self.domain, self.cell_maps)):
+            position = (X[:, j] - low) / step
+            index = np.rint(position)
+            ok = (index == position) & (index >= 0) & (index < len(cell_map))
+            covered &= ok
+            cells[ok, j] = cell_map[index[ok].astype(np.intp)]
+        return cells, covered
+
+    def raw_cells(self, cells):
+        """Log-odds para una matriz de celdas."""
+        if self.dense is not None:
+            return self.dense[tuple(cells.T)]
+        positions = cells @ self._strides.T
+        positions += self._offsets
+        return self.bias + self._values.take(positions).sum(axis=1)
+
+    def predict_proba(self, X):
+        """Probabilidad por fila; NaN en las filas fuera de la grilla."""
+        cells, covered = self.cells(X)
+        probabilities = np.full(len(cells), np.nan)
+        if covered.any():
+            probabilities[covered] = _expit(self.raw_cells(cells[covered]))
+        return probabilities
+
+    def score_row(self, row):
+        """Probabilidad de una fila, o ``None`` si está fuera de la grilla."""
+        if isinstance(row, np.ndarray):
+            row = row.tolist()
+        cells = []
+        for value, (low, step, cell_map) in zip(row, self._row_domain):
+            position = (value - low) / step
+            if not 0 <= position < len(cell_map):
+                return None
+            index = int(position)
+            if index != position:
+                return None
+            cells.append(cell_map[index])
+        if self.dense is not None:
+            return float(_expit(self.dense[tuple(cells)]))
+        positions = self._strides.dot(np.array(cells, dtype=np.intp))
+        positions += self._offsets
+        return float(_expit(self.bias + self._values.take(positions).sum()))
+
+    def save(self, path):
+        arrays = {"cell_map_%d" % j: m for j, m in enumerate(self.cell_maps)}
+        arrays.update(("table_%d" % i, t) for i, (_, t) in enumerate(self.tables))
+        meta = {"features": self.features, "domain": self.domain, "bias": self.bias,
+                "fingerprint": self.fingerprint, "axes": [list(a) for a, _ in self.tables],
+                "dense": self.dense is not None}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # np.savez agrega ".npz" si el nombre no termina así
+        tmp = path[:-len(".npz")] + ".tmp.npz"
+        np.savez(tmp, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+                 **arrays, **({"dense": self.dense} if self.dense is not None else {}))
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            features = meta["features"]
+            cell_maps = [data["cell_map_%d" % j] for j in range(len(features))]
+            tables = [(axes, data["table_%d" % i]) for i, axes in enumerate(meta["axes"])]
+            dense = data["dense"] if meta["dense"] else None
+        domain = dict(zip(features, meta["domain"]))
+        return cls(features, domain, cell_maps, tables, meta["bias"], meta["fingerprint"], dense)
+
+    def __repr__(self):
+        return "<LookupTable %s celdas, %d tablas, %.1f MB>" % (
+            "×".join(map(str, self.shape)), len(self.tables), self.nbytes / 2**20)
+
+
+def _grid(low, high, step):
+    return np.arange(low, high + step / 2, step, dtype=np.float64)
+
+
+def feature_cells(compiled, feature, low, high, step):
+    """Celda de cada valor de la grilla y valor representante de cada celda.
+
+    Igual que el motor compilado, el valor se pasa a float32 y se compara
+    con el umbral en float64 (``x <= umbral`` va a la izquierda). Dos valores
+    con la misma cantidad de umbrales por debajo caen del mismo lado de todos.
+    """
+    internal = ~compiled.is_leaf() & (compiled.feature == feature)
+    thresholds = np.unique(compiled.threshold[internal])
+    values = _grid(low, high, step).astype(np.float32).astype(np.float64)
+    below = np.searchsorted(thresholds, values, side="left")
+    _, first, cell_map = np.unique(below, return_index=True, return_inverse=True)
+    return cell_map, values[first], thresholds
+
+
+def _leaf_paths(compiled, root):
+    """``(nodos del camino con su dirección, valor)`` de cada hoja de un árbol."""
+    leaf = compiled.is_leaf()
+    stack = [(root, ())]
+    while stack:
+        node, path = stack.pop()
+        if leaf[node]:
+            yield path, compiled.value[node]
+            continue
+        stack.append((compiled.right[node], path + ((node, True),)))
+        stack.append((compiled.left[node], path + ((node, False),)))
+
+
+def factor_tables(compiled, representatives):
+    """Tablas por conjunto de variables de los caminos a las hojas, más el sesgo."""
+    tables = {}
+    bias = compiled.init_raw
+    for root in compiled.roots:
+        for path, value in _leaf_paths(compiled, root):
+            masks = {}
+            for node, right in path:
+                j = int(compiled.feature[node])
+                side = representatives[j] > compiled.threshold[node]
+                masks[j] = masks.get(j, True) & (side if right else ~side)
+            if not masks:
+                bias += value
+                continue
+            axes = tuple(sorted(masks))
+            term = value * masks[axes[0]].astype(np.float64)
+            for j in axes[1:]:
+                term = np.multiply.outer(term, masks[j])
+            if axes in tables:
+                tables[axes] += term
+            else:
+                tables[axes] = term
+    return tables, bias
+
+
+def fold_tables(tables):
+    """Suma cada tabla en otra cuyas variables la contengan (menos lecturas por fila)."""
+    tables = dict(tables)
+    for axes in sorted(tables, key=len):
+        supersets = [other for other in tables if other != axes and set(axes) <= set(other)]
+        if not supersets:
+            continue
+        target = min(supersets, key=lambda other: tables[other].size)
+        shape = [tables[target].shape[k] if a in axes else 1 for k, a in enumerate(target)]
+        tables[target] += tables.pop(axes).reshape(shape)
+    return tables
+
+
+def build(entry, domain=DOMAIN, budget_mb=DEFAULT_BUDGET_MB):
+    """``LookupTable`` para ``entry``, o ``None`` si no entra en el presupuesto."""
+    compiled = entry.compiled
+    if compiled is None:
+        raise ValueError("%s no es un GBM compilable" % entry.label)
+    spec = entry.spec
+    missing = [c for c in spec.columns if c not in domain]
+    if not spec.direct or missing:
+        raise ValueError("el esquema de %s no es numérico directo sobre la grilla: %s" % (
+            entry.label, ", ".join(missing) or "codificación"))
+    budget = budget_mb * 2**20
+
+    cell_maps, representatives = [], []
+    for j, name in enumerate(spec.columns):
+        cell_map, values, _ = feature_cells(compiled, j, *domain[name])
+        cell_maps.append(cell_map)
+        representatives.append(values)
+    shape = [len(v) for v in representatives]
+
+    # Cada camino usa a lo sumo ``depth`` variables: las tablas quedan chicas
+    tables, bias = factor_tables(compiled, representatives)
+    tables = fold_tables(tables)
+    nbytes = sum(t.nbytes for t in tables.values())
+    if nbytes > budget:
+        return None
+    dense = None
+    dense_bytes = 8 * np.prod([float(s) for s in shape])
+    if nbytes + dense_bytes <= budget:
+        dense = np.full(shape, bias)
+        for axes, table in tables.items():
+            dense += table.reshape([table.shape[axes.index(j)] if j in axes else 1
+                                    for j in range(len(shape))])
+    return LookupTable(spec.columns, domain, cell_maps, sorted(tables.items()), bias,
+                       entry.fingerprint, dense)
+
+
+def table_path(entry, directory=CACHE_DIR):
+    return os.path.join(directory, "%s-%s.npz" % (entry.name, entry.fingerprint))
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def get_lookup(entry, directory=CACHE_DIR):
+    """Tabla construida para este artefacto (por huella), o ``None`` si no hay."""
+    key = (directory, entry.name, entry.fingerprint)
+    if key in _loaded:
+        return _loaded[key]
+    with _loaded_lock:
+        if key not in _loaded:
+            path = table_path(entry, directory)
+            table = None
+            if os.path.exists(path):
+                table = LookupTable.load(path)
+            # Solo la tabla del artefacto vigente queda en memoria
+            for other in [k for k in _loaded if k[:2] == key[:2]]:
+                del _loaded[other]
+            _loaded[key] = table
+        return _loaded[key]
+
+
+def check_cells(compiled, table):
+    """Todo valor de la grilla cae del mismo lado de cada umbral que el representante
+    de su celda. Devuelve la cantidad de valores comprobados."""
+    checked = 0
+    for j, ((low, high, step), cell_map) in enumerate(zip(table.domain, table.cell_maps)):
+        _, representatives, thresholds = feature_cells(compiled, j, low, high, step)
+        values = _grid(low, high, step).astype(np.float32).astype(np.float64)
+        sides = values[:, None] <= thresholds[None, :]
+        expected = representatives[cell_map][:, None] <= thresholds[None, :]
+        if not np.array_equal(sides, expected):
+            raise AssertionError("la variable %s tiene valores en celdas equivocadas" % table.features[j])
+        checked += len(values)
+    return checked
+
+
+def iter_cells(shape, block=1_000_000, sample=None, seed=0):
+    """Bloques de celdas: todas en orden, o ``sample`` al azar."""
+    if sample is not None:
+        rng = np.random.default_rng(seed)
+        for start in range(0, sample, block):
+            n = min(block, sample - start)
+            yield np.column_stack([rng.integers(0, s, n) for s in shape])
+        return
+    total = int(np.prod([float(s) for s in shape]))
+    for start in range(0, total, block):
+        flat = np.arange(start, min(start + block, total))
+        yield np.column_stack(np.unravel_index(flat, shape))
+
+
+def verify(entry, table, sample=1_000_000, points=20_000, seed=0):
+    """Compara la tabla con el modelo. ``sample=None`` recorre todas las celdas."""
+    compiled = entry.compiled
+    checked_values = check_cells(compiled, table)
+    representatives = [feature_cells(compiled, j, *d)[1] for j, d in enumerate(table.domain)]
+
+    max_diff, n_cells = 0.0, 0
+    for cells in iter_cells(table.shape, sample=sample, seed=seed):
+        X = np.column_stack([representatives[j][cells[:, j]] for j in range(cells.shape[1])])
+        expected = compiled.predict_proba(X)
+        got = _expit(table.raw_cells(cells))
+        max_diff = max(max_diff, float(np.abs(got - expected).max()))
+        n_cells += len(cells)
+
+    # Puntos de la grilla (no representantes) contra predict_proba de sklearn
+    rng = np.random.default_rng(seed + 1)
+    X = np.column_stack([rng.choice(_grid(*d), points) for d in table.domain])
+    expected = sklearn_proba(sklearn_model(entry), X)
+    got = table.predict_proba(X)
+    point_diff = float(np.abs(got - expected).max())
+    # Fuera de la grilla la tabla no responde
+    off = X.copy()
+    off[:, 0] += 0.5
+    uncovered = int(np.isnan(table.predict_proba(off)).sum())
+    return {"values_checked": checked_values, "cells_checked": n_cells, "cells_total": table.n_cells,
+            "max_diff_cells": max_diff, "points_checked": points, "max_diff_points": point_diff,
+            "off_grid_uncovered": uncovered, "ok": max(max_diff, point_diff) <= TOLERANCE
+            and uncovered == points}
+
+
+def _bench(entry, table, rows=100_000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.choice(_grid(*d), rows) for d in table.domain])
+    row = X[0]
+    results = {}
+    for label, fn, arg, n in (("fila, tabla", table.score_row, row, 20_000),
+                              ("fila, modelo", entry.predict_proba, row, 20_000),
+                              ("lote, tabla", table.predict_proba, X, 5),
+                              ("lote, modelo", entry.predict_proba, X, 5)):
+        fn(arg)
+        started = time.perf_counter()
+        for _ in range(n):
+            fn(arg)
+        per_call = (time.perf_counter() - started) / n
+        results[label] = per_call / (len(arg) if arg.ndim == 2 else 1)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tabla precalculada de puntajes sobre la grilla de la app")
+    parser.add_argument("--model", default=PRODUCTION_MODEL)
+    parser.add_argument("--build", action="store_true", help="construir y guardar la tabla")
+    parser.add_argument("--budget-mb", type=float, default=DEFAULT_BUDGET_MB,
+                        help="memoria máxima de la tabla (default: %(default)s)")
+    parser.add_argument("--verify", action="store_true", help="comparar con predict_proba")
+    parser.add_argument("--full", action="store_true", help="verificar todas las celdas")
+    parser.add_argument("--bench", action="store_true", help="medir lecturas contra el modelo")
+    args = parser.parse_args(argv)
+
+    entry = get_registry().get(args.model)
+    if args.build:
+        started = time.perf_counter()
+        table = build(entry, budget_mb=args.budget_mb)
+        if table is None:
+            print("las tablas no entran en %.0f MB: se seguirá puntuando en vivo" % args.budget_mb)
+            return 1
+        path = table.save(table_path(entry))
+        print("%r en %.2f s -> %s" % (table, time.perf_counter() - started, path))
+    else:
+        table = get_lookup(entry)
+        if table is None:
+            print("no hay tabla para %s; construirla con --build" % entry.label)
+            return 1
+    celdas = "×".join(map(str, table.shape))
+    print("celdas por variable: %s" % ", ".join("%s=%d" % pair for pair in zip(table.features, table.shape)))
+    print("%d tablas, %s celdas en total, densa: %s" % (len(table.tables), celdas,
+                                                       "sí" if table.dense is not None else "no"))
+
+    if args.verify:
+        started = time.perf_counter()
+        report = verify(entry, table, sample=None if args.full else 1_000_000)
+        print("verificación (%.1f s): %d valores de la grilla en su celda; %d de %d celdas, "
+              "máx. |Δ| %.2e; %d puntos contra sklearn, máx. |Δ| %.2e; %d/%d fuera de la grilla "
+              "sin respuesta -> %s" % (
+                  time.perf_counter() - started, report["values_checked"], report["cells_checked"],
+                  report["cells_total"], report["max_diff_cells"], report["points_checked"],
+                  report["max_diff_points"], report["off_grid_uncovered"], report["points_checked"],
+                  "OK" if report["ok"] else "FALLA"))
+        if not report["ok"]:
+            return 1
+    if args.bench:
+        for label, seconds in _bench(entry, table).items():
+            print("%-14s %8.3f µs por fila" % (label, seconds * 1e6))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
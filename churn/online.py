@@ -0,0 +1,415 @@
+"""
+Actualización incremental del GBM con lotes nuevos de etiquetas.
+
+Cada lote etiquetado (las variables del modelo más ``churn``) se agrega al
+historial en ``data/history/``: un Parquet por lote y un ``manifest.json``
+con los lotes y las actualizaciones. Una parte estratificada de cada lote
+queda reservada para validar. El lote solo entra al historial si la
+actualización se guarda; uno rechazado o evaluado con ``--dry-run`` se puede
+volver a procesar.
+
+``update`` decide entre tres caminos:
+
+* **incremental** (el normal): copia el GBM vigente y le agrega ``stages``
+  árboles ajustados con ``warm_start`` sobre los residuos del lote nuevo. El
+  costo depende del tamaño del lote, no del historial.
+* **reentrenamiento completo**: solo si el lote deriva respecto de los datos
+  de entrenamiento (``churn.drift``), si el AUC del modelo vigente sobre el
+  lote cae más de ``decay`` respecto de su línea base, o si el modelo ya
+  superó ``max_estimators`` árboles. Entrena con el CSV original más todo el
+  historial.
+* **rechazo**: el candidato de cualquiera de los dos caminos se compara con el
+  modelo vigente sobre la reserva del lote y las más recientes del historial
+  (a lo sumo ``CHECK_ROWS`` filas). Si empeora la pérdida logarítmica o el
+  AUC más allá de las tolerancias, no se guarda.
+
+El modelo aceptado se guarda como versión nueva (``churn.training.save_model``,
+con su ``.gbm``) y el registro lo toma sin reiniciar la app.
+
+Uso::
+
+    python -m churn.online update etiquetas_2026_09.csv
+    python -m churn.online update etiquetas.parquet --stages 20 --dry-run
+    python -m churn.online history
+"""
+import argparse
+import copy
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from churn import paths
+from churn.artifact import FlatGBM, sklearn_model, training_metrics
+from churn.backends import get_backend
+from churn.batch import _require_pyarrow, iter_chunks
+from churn.datastore import load_customers
+from churn.drift import DriftMonitor, Reference
+from churn.registry import PRODUCTION_MODEL, get_registry
+from churn.training import TARGET, fold_metrics, save_model
+
+HISTORY_DIR = os.path.join(paths.ROOT_DIR, "data", "history")
+
+DEFAULT_STAGES = 10
+HOLDOUT_FRACTION = 0.2
+# Filas de reserva (del lote y de los anteriores) para la comprobación de regresión
+CHECK_ROWS = 5000
+# Tolerancias del candidato frente al modelo vigente en la reserva
+LOSS_TOLERANCE = 0.01   # relativa
+AUC_TOLERANCE = 0.005   # absoluta
+# Caída de AUC en el lote nuevo que obliga a reentrenar
+DECAY_THRESHOLD = 0.05
+# Árboles a partir de los cuales se reentrena en lugar de seguir creciendo
+MAX_ESTIMATORS = 300
+
+
+class HistoryStore:
+    """Lotes etiquetados en Parquet (uno por archivo) y su manifiesto."""
+
+    def __init__(self, directory=HISTORY_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+    def manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"batches": [], "updates": []}
+        with open(self.manifest_path, encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    @property
+    def batches(self):
+        return self.manifest()["batches"]
+
+    def append(self, frame, source=None, holdout_fraction=HOLDOUT_FRACTION, seed=0):
+        """Guarda un lote con su columna ``holdout`` y lo agrega al historial."""
+        batch = self.stage(frame, source, holdout_fraction, seed)
+        self.commit(batch)
+        return batch
+
+    def stage(self, frame, source=None, holdout_fraction=HOLDOUT_FRACTION, seed=0):
+        """Escribe el Parquet de un lote sin agregarlo al manifiesto; devuelve su registro.
+
+        Un lote con el mismo contenido que uno ya guardado se rechaza. El lote
+        entra al historial con ``commit`` o se borra con ``discard``.
+        """
+        _require_pyarrow()
+        digest = hashlib.sha256(pd.util.hash_pandas_object(frame, index=False).to_numpy()).hexdigest()
+        manifest = self.manifest()
+        for batch in manifest["batches"]:
+            if batch["sha256"] == digest:
+                raise ValueError("el lote ya está en el historial (%s)" % batch["id"])
+
+        frame = frame.reset_index(drop=True).copy()
+        frame["holdout"] = stratified_holdout(frame[TARGET].to_numpy(), holdout_fraction, seed)
+        batch_id = "%s-%s" % (time.strftime("%Y%m%d-%H%M%S"), digest[:8])
+        filename = "batch-%s.parquet" % batch_id
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, filename)
+        frame.to_parquet(path + ".tmp", index=False, engine="pyarrow")
+        os.replace(path + ".tmp", path)
+
+        record = {"id": batch_id, "file": filename, "source": source, "rows": len(frame),
+                  "holdout_rows": int(frame["holdout"].sum()),
+                  "churn_rate": float(frame[TARGET].mean()), "sha256": digest,
+                  "added_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        return record
+
+    def commit(self, batch):
+        manifest = self.manifest()
+        manifest["batches"].append(batch)
+        self._write_manifest(manifest)
+
+    def discard(self, batch):
+        try:
+            os.remove(os.path.join(self.directory, batch["file"]))
+        except FileNotFoundError:
+            pass
+
+    def read(self, batch, columns=None):
+        _require_pyarrow()
+        return pd.read_parquet(os.path.join(self.directory, batch["file"]), columns=columns)
+
+    def frames(self, columns=None):
+        for batch in self.batches:
+            yield self.read(batch, columns)
+
+    def recent_holdout(self, max_rows=CHECK_ROWS, exclude=(), columns=None):
+        """Reservas de los lotes más nuevos, hasta ``max_rows`` filas."""
+        parts, rows = [], 0
+        for batch in reversed(self.batches):
+            if rows >= max_rows:
+                break
+            if batch["id"] in exclude:
+                continue
+            frame = self.read(batch, columns and list(columns) + ["holdout"])
+            frame = frame[frame["holdout"]]
+            parts.append(frame.iloc[:max_rows - rows])
+            rows += len(parts[-1])
+        return pd.concat(parts, ignore_index=True) if parts else None
+
+    def log_update(self, record):
+        manifest = self.manifest()
+        manifest["updates"].append(record)
+        self._write_manifest(manifest)
+
+    def last_update_for(self, fingerprint):
+        for record in reversed(self.manifest()["updates"]):
+            if record.get("fingerprint") == fingerprint:
+                return record
+        return None
+
+
+def stratified_holdout(y, fraction=HOLDOUT_FRACTION, seed=0):
+    """Máscara con ``fraction`` de las filas de cada clase."""
+    rng = np.random.default_rng(seed)
+    mask = np.zeros(len(y), dtype=bool)
+    for label in np.unique(y):
+        rows = np.flatnonzero(y == label)
+        mask[rng.choice(rows, int(round(fraction * len(rows))), replace=False)] = True
+    return mask
+
+
+def read_batch(path, spec):
+    """Lote etiquetado: las variables de ``spec`` y ``churn`` sin faltantes."""
+    frame = pd.concat(iter_chunks(path, spec.inputs, extra=(TARGET,)), ignore_index=True)
+    if TARGET not in frame.columns:
+        raise ValueError("%s no tiene la columna %r" % (path, TARGET))
+    incomplete = int(frame[list(spec.inputs) + [TARGET]].isna().any(axis=1).sum())
+    if incomplete:
+        raise ValueError("%s tiene %d filas con valores faltantes" % (path, incomplete))
+    labels = set(np.unique(frame[TARGET]))
+    if not labels <= {0, 1}:
+        raise ValueError("%s: etiquetas distintas de 0/1: %s" % (path, sorted(labels - {0, 1})))
+    if len(labels) < 2:
+        raise ValueError("%s tiene una sola clase; no se puede ajustar ni validar" % path)
+    frame[TARGET] = frame[TARGET].astype(np.int64)
+    return frame
+
+
+def _frame(model, X):
+    # Con nombres de columnas si el modelo se entrenó con ellos (evita el aviso de sklearn)
+    names = getattr(model, "feature_names_in_", None)
+    return pd.DataFrame(X, columns=list(names)) if names is not None else X
+
+
+def evaluate(model, X, y):
+    return fold_metrics(y, model.predict_proba(_frame(model, X))[:, 1])
+
+
+def batch_drift(frame, spec, reference=None):
+    """PSI/KS de cada variable del lote contra los datos de entrenamiento."""
+    reference = reference or Reference.from_training(spec)
+    monitor = DriftMonitor(reference, window_seconds=math.inf, windows=1,
+                           min_count=min(500, len(frame)), alerts_path=None)
+    monitor.observe_batch(spec.encode(frame))
+    return monitor.evaluate()
+
+
+def extend(model, X, y, stages=DEFAULT_STAGES, seed=0):
+    """Copia de ``model`` con ``stages`` árboles más, ajustados sobre ``X``, ``y``."""
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, n_estimators=model.n_estimators_ + stages, random_state=seed)
+    model.fit(_frame(model, X), y)
+    model.set_params(warm_start=False)
+    return model
+
+
+def retrain(spec, store, model, data_path=paths.DATA_PATH, fit=None):
+    """GBM nuevo con el CSV original, las filas de ajuste de todo el historial y ``fit``."""
+    backend = get_backend("gbm", spec.columns)
+    current = model.get_params()
+    params = {k: current[k] for k in backend.default_params if k in current and k != "n_estimators"}
+    parts = [load_customers(data_path)[list(spec.inputs) + [TARGET]]]
+    for frame in store.frames(list(spec.inputs) + [TARGET, "holdout"]):
+        parts.append(frame[~frame["holdout"]].drop(columns="holdout"))
+    if fit is not None:
+        parts.append(fit[list(spec.inputs) + [TARGET]])
+    data = pd.concat(parts, ignore_index=True)
+    return backend.fit(spec.encode(data), data[TARGET].to_numpy(), **params), len(data)
+
+
+def baseline_auc(entry, store, data_path=paths.DATA_PATH):
+    """AUC de referencia del modelo vigente: el de su última comprobación o el de su artefacto."""
+    record = store.last_update_for(entry.fingerprint)
+    if record is not None:
+        return record["candidate"]["roc_auc"]
+    if isinstance(entry.model, FlatGBM) and (entry.model.header.get("metrics") or {}).get("roc_auc"):
+        return entry.model.header["metrics"]["roc_auc"]
+    return training_metrics(entry, data_path)["roc_auc"]
+
+
+def passes_check(current, candidate, loss_tolerance=LOSS_TOLERANCE, auc_tolerance=AUC_TOLERANCE):
+    return (candidate["log_loss"] <= current["log_loss"] * (1 + loss_tolerance)
+            and candidate["roc_auc"] >= current["roc_auc"] - auc_tolerance)
+
+
+def update(path, name=PRODUCTION_MODEL, stages=DEFAULT_STAGES, store=None, registry=None,
+           models_dir=paths.MODELS_DIR, data_path=paths.DATA_PATH, decay=DECAY_THRESHOLD,
+           max_estimators=MAX_ESTIMATORS, save=True, seed=0):
+    """Evalúa el lote de ``path`` y actualiza el modelo; devuelve un resumen.
+
+    El lote entra al historial solo si el modelo actualizado se guarda: con
+    ``save=False`` o si el candidato se rechaza, el mismo lote se puede
+    volver a procesar.
+    """
+    started = time.perf_counter()
+    store = store or HistoryStore()
+    registry = registry or get_registry()
+    entry = registry.get(name)
+    spec = entry.spec
+    model = sklearn_model(entry)
+    if not hasattr(model, "n_estimators_"):
+        raise ValueError("%s no es un GBM de sklearn; solo se actualizan GBM" % entry.label)
+
+    frame = read_batch(path, spec)
+    batch = store.stage(frame[list(spec.inputs) + [TARGET]], os.path.basename(path), seed=seed)
+    try:
+        result = _update(store, registry, name, entry, spec, model, frame, batch, stages,
+                         models_dir, data_path, decay, max_estimators, save, seed)
+    except BaseException:
+        store.discard(batch)
+        raise
+    if result["path"] is None:
+        store.discard(batch)
+    result["seconds"] = time.perf_counter() - started
+    store.log_update(dict(result, updated_at=time.strftime("%Y-%m-%dT%H:%M:%S")))
+    return result
+
+
+def _update(store, registry, name, entry, spec, model, frame, batch, stages, models_dir, data_path,
+            decay, max_estimators, save, seed):
+    stored = store.read(batch, list(spec.inputs) + [TARGET, "holdout"])
+    fit = stored[~stored["holdout"]]
+    X_fit, y_fit = spec.encode(fit), fit[TARGET].to_numpy()
+
+    # Reserva del lote más las de los lotes anteriores más recientes
+    previous = store.recent_holdout(CHECK_ROWS - batch["holdout_rows"],
+                                    columns=list(spec.inputs) + [TARGET])
+    check = pd.concat([stored[stored["holdout"]]] + ([previous] if previous is not None else []),
+                      ignore_index=True)
+    X_check, y_check = spec.encode(check), check[TARGET].to_numpy()
+
+    drift = batch_drift(frame, spec)
+    current_batch = evaluate(model, spec.encode(frame), frame[TARGET].to_numpy())
+    baseline = baseline_auc(entry, store, data_path)
+    reasons = []
+    if drift["drift"]:
+        reasons.append("deriva en %s" % ", ".join(f for f, d in drift["features"].items() if d["drift"]))
+    if baseline - current_batch["roc_auc"] > decay:
+        reasons.append("AUC del lote %.3f, %.3f por debajo de la línea base %.3f" % (
+            current_batch["roc_auc"], baseline - current_batch["roc_auc"], baseline))
+    if model.n_estimators_ + stages > max_estimators:
+        reasons.append("%d árboles superaría el máximo de %d" % (model.n_estimators_ + stages, max_estimators))
+
+    fit_started = time.perf_counter()
+    if reasons:
+        action = "retrain"
+        candidate, train_rows = retrain(spec, store, model, data_path, fit)
+    else:
+        action = "incremental"
+        candidate, train_rows = extend(model, X_fit, y_fit, stages, seed), len(fit)
+    fit_seconds = time.perf_counter() - fit_started
+
+    current = dict(evaluate(model, X_check, y_check), rows=len(check))
+    proposed = dict(evaluate(candidate, X_check, y_check), rows=len(check))
+    accepted = bool(passes_check(current, proposed))
+    result = {
+        "batch": batch["id"], "rows": batch["rows"], "base": entry.label, "action": action,
+        "reasons": reasons, "accepted": accepted, "train_rows": train_rows,
+        "estimators": [int(model.n_estimators_), int(candidate.n_estimators_)],
+        "batch_auc": current_batch["roc_auc"], "baseline_auc": baseline,
+        "current": current, "candidate": proposed, "fit_seconds": fit_seconds, "path": None,
+    }
+    if accepted and save:
+        import sklearn
+
+        metadata = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": "gbm",
+            "features": list(spec.columns),
+            "feature_spec": spec.to_dict(),
+            "params": {k: v for k, v in candidate.get_params().items()
+                       if isinstance(v, (bool, int, float, str, type(None)))},
+            "update": {k: result[k] for k in ("batch", "base", "action", "reasons", "train_rows")},
+            "metrics": dict(proposed, evaluated_on="holdout"),
+            "data": {"history": len(store.batches) + 1, "batch_sha256": batch["sha256"]},
+            "sklearn": sklearn.__version__,
+        }
+        result["path"] = save_model(candidate, metadata, name, models_dir)
+        store.commit(batch)
+        result["fingerprint"] = registry.refresh(name).fingerprint
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Actualización incremental del GBM con etiquetas nuevas")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_update = sub.add_parser("update", help="agregar un lote etiquetado y actualizar el modelo")
+    p_update.add_argument("path", help="CSV o Parquet con las variables del modelo y churn")
+    p_update.add_argument("--model", default=PRODUCTION_MODEL)
+    p_update.add_argument("--stages", type=int, default=DEFAULT_STAGES,
+                          help="árboles a agregar (default: %(default)s)")
+    p_update.add_argument("--decay", type=float, default=DECAY_THRESHOLD,
+                          help="caída de AUC que obliga a reentrenar (default: %(default)s)")
+    p_update.add_argument("--max-estimators", type=int, default=MAX_ESTIMATORS)
+    p_update.add_argument("--history", default=HISTORY_DIR, help="directorio del historial")
+    p_update.add_argument("--dry-run", action="store_true",
+                          help="evaluar sin guardar el modelo ni agregar el lote al historial")
+    sub.add_parser("history", help="lotes y actualizaciones registrados").add_argument(
+        "--history", default=HISTORY_DIR)
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.history)
+    if args.command == "history":
+        manifest = store.manifest()
+        for batch in manifest["batches"]:
+            print("%s %8d filas (%d reserva) churn %.1f%%  %s" % (
+                batch["id"], batch["rows"], batch["holdout_rows"], 100 * batch["churn_rate"],
+                batch["source"] or ""))
+        for record in manifest["updates"]:
+            print("%s %-11s %-9s %s -> %s" % (
+                record["updated_at"], record["action"], "aceptado" if record["accepted"] else "rechazado",
+                record["base"], os.path.basename(record["path"]) if record["path"] else "-"))
+        return 0
+
+    try:
+        result = update(args.path, args.model, args.stages, store, decay=args.decay,
+                        max_estimators=args.max_estimators, save=not args.dry_run)
+    except ValueError as exc:
+        print("error: %s" % exc, file=sys.stderr)
+        return 1
+    print("lote %s: %d filas; modelo %s (AUC en el lote %.3f, línea base %.3f)" % (
+        result["batch"], result["rows"], result["base"], result["batch_auc"], result["baseline_auc"]))
+    if result["reasons"]:
+        print("reentrenamiento completo: %s" % "; ".join(result["reasons"]))
+    print("%s: %d -> %d árboles, %d filas de ajuste en %.2f s" % (
+        result["action"], result["estimators"][0], result["estimators"][1], result["train_rows"],
+        result["fit_seconds"]))
+    for label in ("current", "candidate"):
+        m = result[label]
+        print("  %-10s log_loss %.4f  AUC %.4f  exactitud %.3f  (%d filas de reserva)" % (
+            "vigente" if label == "current" else "candidato", m["log_loss"], m["roc_auc"],
+            m["accuracy"], m["rows"]))
+    if not result["accepted"]:
+        print("rechazado: el candidato empeora la reserva; se mantiene %s y el lote no entra al historial"
+              % result["base"])
+        return 1
+    print("guardado en %s" % result["path"] if result["path"]
+          else "aceptado (--dry-run: sin guardar el modelo ni el lote)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,8 @@
+"""Rutas de archivos compartidas por la aplicación y los scripts."""
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODELS_DIR = os.path.join(ROOT_DIR, "models")
+DATA_PATH = os.path.join(ROOT_DIR, "data", "Bank Customer Churn Prediction.csv")
+REPORTS_DIR = os.path.join(ROOT_DIR, "assets")
@@ -0,0 +1,371 @@
+"""
+Reportes de monitoreo incrementales.
+
+Reemplaza las instantáneas HTML de Evidently por un estado de agregados de
+una sola pasada (``churn.stats``) que se guarda en
+``.cache/monitoring/state.json``. Cada archivo nuevo se lee en bloques, se
+puntúa con el modelo de producción y se suma al estado; los archivos ya
+incorporados (mismo SHA-256) se omiten. A partir del estado se escriben
+``report.json`` y un ``report.html`` liviano (sin JavaScript), que la página
+de monitoreo de la app lee directamente.
+
+Si cambia el modelo de producción, las métricas de clasificación dejan de
+valer: el estado se reconstruye con los archivos registrados.
+
+Uso::
+
+    python -m churn.pipeline                       # datos de entrenamiento
+    python -m churn.pipeline nuevos_clientes.csv   # suma un lote nuevo
+    python -m churn.pipeline --rebuild             # recalcula todo
+"""
+import argparse
+import html
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from churn import paths
+from churn.batch import DEFAULT_CHUNKSIZE, iter_chunks, score_matrix
+from churn.datastore import file_sha256
+from churn.registry import PRODUCTION_MODEL, get_registry
+from churn.risk import RISK_LEVELS, risk_codes
+from churn.stats import BinaryScoreStats, CategoryCounts, Histogram, RunningMoments
+
+logger = logging.getLogger(__name__)
+
+MONITORING_DIR = os.path.join(paths.ROOT_DIR, ".cache", "monitoring")
+
+TARGET = "churn"
+
+# columna: (mínimo, máximo, bins); bins=None -> enteros (cuantiles exactos)
+NUMERIC_COLUMNS = {
+    "credit_score": (300, 900, None),
+    "age": (18, 100, None),
+    "tenure": (0, 10, None),
+    "balance": (0, 300_000, 300),
+    "products_number": (1, 4, None),
+    "credit_card": (0, 1, None),
+    "active_member": (0, 1, None),
+    "estimated_salary": (0, 200_000, 200),
+}
+CATEGORICAL_COLUMNS = ("country", "gender")
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+_STATE_VERSION = 1
+
+
+def _new_histogram(spec):
+    low, high, bins = spec
+    return Histogram(low, high, bins, discrete=bins is None)
+
+
+class MonitoringState:
+    """Agregados acumulados de todos los lotes incorporados."""
+
+    def __init__(self, model_label, fingerprint):
+        self.model_label = model_label
+        self.fingerprint = fingerprint
+        self.rows = 0
+        self.sources = []
+        self.numeric = {c: {"moments": RunningMoments(), "histogram": _new_histogram(spec)}
+                        for c, spec in NUMERIC_COLUMNS.items()}
+        self.categorical = {c: CategoryCounts() for c in CATEGORICAL_COLUMNS}
+        self.scores = Histogram(0.0, 1.0, 100)
+        self.risk = dict.fromkeys(RISK_LEVELS, 0)
+        self.classification = BinaryScoreStats()
+
+    def has_source(self, sha256):
+        return any(s["sha256"] == sha256 for s in self.sources)
+
+    def update(self, frame, probabilities):
+        self.rows += len(frame)
+        for column, stats in self.numeric.items():
+            if column in frame:
+                values = frame[column].to_numpy(dtype=np.float64)
+                stats["moments"].update(values)
+                stats["histogram"].update(values)
+        for column, counts in self.categorical.items():
+            if column in frame:
+                counts.update(frame[column].to_numpy(dtype=object))
+        scored = probabilities[~np.isnan(probabilities)]
+        self.scores.update(scored)
+        codes = np.bincount(risk_codes(scored), minlength=len(RISK_LEVELS))
+        for level, count in zip(RISK_LEVELS, codes.tolist()):
+            self.risk[level] += count
+        if TARGET in frame:
+            labels = frame[TARGET].to_numpy(dtype=np.float64)
+            labeled = ~np.isnan(labels)
+            self.classification.update(labels[labeled], probabilities[labeled])
+
+    def to_dict(self):
+        return {
+            "version": _STATE_VERSION,
+            "model": self.model_label,
+            "fingerprint": self.fingerprint,
+            "rows": self.rows,
+            "sources": self.sources,
+            "numeric": {c: {"moments": s["moments"].to_dict(), "histogram": s["histogram"].to_dict()}
+                        for c, s in self.numeric.items()},
+            "categorical": {c: s.to_dict() for c, s in self.categorical.items()},
+            "scores": self.scores.to_dict(),
+            "risk": self.risk,
+            "classification": self.classification.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data["model"], data["fingerprint"])
+        state.rows = data["rows"]
+        state.sources = data["sources"]
+        for column, stats in data["numeric"].items():
+            state.numeric[column] = {"moments": RunningMoments.from_dict(stats["moments"]),
+                                     "histogram": Histogram.from_dict(stats["histogram"])}
+        state.categorical = {c: CategoryCounts.from_dict(s) for c, s in data["categorical"].items()}
+        state.scores = Histogram.from_dict(data["scores"])
+        state.risk = data["risk"]
+        state.classification = BinaryScoreStats.from_dict(data["classification"])
+        return state
+
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except FileNotFoundError:
+        return None
+    if data.get("version") != _STATE_VERSION:
+        return None
+    return MonitoringState.from_dict(data)
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp, path)
+
+
+def save_state(state, path):
+    _write_atomic(path, json.dumps(state.to_dict()))
+
+
+def ingest(state, entry, path, chunksize=DEFAULT_CHUNKSIZE, sha256=None):
+    """Suma un archivo al estado en una pasada por bloques. Devuelve las filas leídas."""
+    inputs = entry.spec.inputs
+    extra = [c for c in (*NUMERIC_COLUMNS, *CATEGORICAL_COLUMNS, TARGET) if c not in inputs]
+    rows = 0
+    for chunk in iter_chunks(path, inputs, chunksize, extra=extra):
+        state.update(chunk, score_matrix(entry, entry.spec.encode(chunk)))
+        rows += len(chunk)
+    state.sources.append({
+        "path": os.path.abspath(path),
+        "sha256": sha256 or file_sha256(path),
+        "rows": rows,
+        "added_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    return rows
+
+
+def run(sources=(), directory=MONITORING_DIR, model=PRODUCTION_MODEL, chunksize=DEFAULT_CHUNKSIZE,
+        rebuild=False):
+    """Actualiza el estado con ``sources`` y reescribe los reportes. Devuelve el reporte."""
+    entry = get_registry().get(model)
+    state_path = os.path.join(directory, "state.json")
+    state = None if rebuild else load_state(state_path)
+    if state is not None and state.fingerprint != entry.fingerprint:
+        logger.warning("el modelo cambió (%s -> %s); se reconstruye el estado",
+                       state.model_label, entry.label)
+        rebuild = True
+    if state is None or rebuild:
+        previous = [s["path"] for s in state.sources] if state is not None else []
+        state = MonitoringState(entry.label, entry.fingerprint)
+        sources = [p for p in previous if os.path.exists(p)] + list(sources)
+    if not sources and not state.sources:
+        sources = [paths.DATA_PATH]
+
+    for path in sources:
+        sha256 = file_sha256(path)
+        if state.has_source(sha256):
+            logger.info("%s ya está incorporado; se omite", path)
+            continue
+        started = time.perf_counter()
+        rows = ingest(state, entry, path, chunksize, sha256)
+        logger.info("%s: %d filas en %.2fs", path, rows, time.perf_counter() - started)
+
+    save_state(state, state_path)
+    report = summarize(state)
+    _write_atomic(os.path.join(directory, "report.json"), json.dumps(report, indent=2))
+    _write_atomic(os.path.join(directory, "report.html"), render_html(report))
+    return report
+
+
+def load_report(directory=MONITORING_DIR):
+    """Último ``report.json`` generado, o ``None``."""
+    try:
+        with open(os.path.join(directory, "report.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def _display_bins(histogram, limit=40):
+    """Bins agrupados para graficar (a lo sumo ``limit``)."""
+    edges = histogram.edges
+    counts = histogram.counts
+    group = max(1, -(-histogram.bins // limit))
+    bins = []
+    for start in range(0, histogram.bins, group):
+        stop = min(start + group, histogram.bins)
+        if histogram.discrete and group == 1:
+            label = "%g" % ((edges[start] + edges[start + 1]) / 2)
+        else:
+            label = "%g–%g" % (edges[start], edges[stop])
+        bins.append({"label": label, "count": int(counts[start:stop].sum())})
+    return bins
+
+
+def summarize(state):
+    """Reporte JSON a partir del estado."""
+    quality = {}
+    for column, stats in state.numeric.items():
+        moments, histogram = stats["moments"], stats["histogram"]
+        if not moments.count and not moments.missing:
+            continue
+        minimum = moments.min if moments.count else None
+        maximum = moments.max if moments.count else None
+        quality[column] = {
+            "type": "numeric",
+            "count": moments.count,
+            "missing": moments.missing,
+            "mean": moments.mean if moments.count else None,
+            "std": moments.std if moments.count else None,
+            "min": minimum,
+            "max": maximum,
+            "quantiles": dict(zip(["p%d" % round(q * 100) for q in QUANTILES],
+                                  histogram.quantiles(QUANTILES, minimum, maximum))),
+            "out_of_range": histogram.underflow + histogram.overflow,
+            "histogram": _display_bins(histogram),
+        }
+    for column, counts in state.categorical.items():
+        if not counts.total and not counts.missing:
+            continue
+        quality[column] = {
+            "type": "categorical",
+            "count": counts.total,
+            "missing": counts.missing,
+            "unique": len(counts.counts),
+            "frequencies": dict(sorted(counts.counts.items(), key=lambda kv: -kv[1])),
+        }
+    classification = None
+    if state.classification.count:
+        classification = state.classification.metrics()
+        classification["calibration"] = state.classification.calibration()
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model": state.model_label,
+        "fingerprint": state.fingerprint,
+        "rows": state.rows,
+        "sources": state.sources,
+        "classification": classification,
+        "scores": {"histogram": _display_bins(state.scores, limit=20), "risk": state.risk},
+        "data_quality": quality,
+    }
+
+
+def _fmt(value, digits=3):
+    if value is None:
+        return "–"
+    if isinstance(value, float):
+        return "%.*f" % (digits, value)
+    return str(value)
+
+
+def _bars(bins):
+    peak = max([b["count"] for b in bins] + [1])
+    rows = "".join(
+        '<tr><td>%s</td><td><div class="bar" style="width:%.1f%%"></div></td><td>%d</td></tr>'
+        % (html.escape(b["label"]), 100 * b["count"] / peak, b["count"]) for b in bins)
+    return '<table class="hist">%s</table>' % rows
+
+
+def render_html(report):
+    """HTML autocontenido y liviano (sin JavaScript)."""
+    parts = [
+        "<!doctype html><html><head><meta charset='utf-8'><title>Monitoreo del modelo</title>",
+        "<style>body{font-family:sans-serif;margin:2em;color:#222}table{border-collapse:collapse;"
+        "margin:.5em 0 1.5em}td,th{padding:.2em .6em;border-bottom:1px solid #ddd;text-align:right}"
+        "th:first-child,td:first-child{text-align:left}.hist td{border:0;padding:0 .4em}"
+        ".hist td:nth-child(2){width:300px}.bar{background:#4c78a8;height:.8em}</style></head><body>",
+        "<h1>Monitoreo del modelo</h1>",
+        "<p>Modelo <b>%s</b> · %d filas · generado %s</p>" % (
+            html.escape(report["model"]), report["rows"], report["generated_at"]),
+    ]
+    metrics = report["classification"]
+    if metrics:
+        parts.append("<h2>Clasificación</h2><table>")
+        for key in ("accuracy", "precision", "recall", "f1", "roc_auc", "log_loss", "brier",
+                    "churn_rate", "predicted_rate"):
+            parts.append("<tr><th>%s</th><td>%s</td></tr>" % (key, _fmt(metrics[key])))
+        parts.append("</table>")
+        c = metrics["confusion"]
+        parts.append("<h3>Matriz de confusión (umbral %.2f)</h3><table>"
+                     "<tr><th></th><th>pred. 0</th><th>pred. 1</th></tr>"
+                     "<tr><th>real 0</th><td>%d</td><td>%d</td></tr>"
+                     "<tr><th>real 1</th><td>%d</td><td>%d</td></tr></table>"
+                     % (metrics["threshold"], c["tn"], c["fp"], c["fn"], c["tp"]))
+        parts.append("<h3>Calibración</h3><table><tr><th>tramo</th><th>n</th>"
+                     "<th>predicha</th><th>observada</th></tr>")
+        for row in metrics["calibration"]:
+            parts.append("<tr><td>%.1f–%.1f</td><td>%d</td><td>%.3f</td><td>%.3f</td></tr>" % (
+                row["range"][0], row["range"][1], row["count"], row["predicted"], row["observed"]))
+        parts.append("</table>")
+    parts.append("<h2>Distribución de probabilidades</h2>")
+    parts.append(_bars(report["scores"]["histogram"]))
+    parts.append("<p>Riesgo: %s</p>" % " · ".join(
+        "%s %d" % (level, count) for level, count in report["scores"]["risk"].items()))
+    parts.append("<h2>Calidad de datos</h2><table><tr><th>columna</th><th>n</th><th>faltantes</th>"
+                 "<th>media</th><th>desv.</th><th>mín.</th><th>p50</th><th>máx.</th></tr>")
+    for column, info in report["data_quality"].items():
+        if info["type"] == "numeric":
+            parts.append("<tr><td>%s</td><td>%d</td><td>%d</td><td>%s</td><td>%s</td><td>%s</td>"
+                         "<td>%s</td><td>%s</td></tr>" % (
+                             column, info["count"], info["missing"], _fmt(info["mean"], 2),
+                             _fmt(info["std"], 2), _fmt(info["min"], 2),
+                             _fmt(info["quantiles"]["p50"], 2), _fmt(info["max"], 2)))
+        else:
+            parts.append("<tr><td>%s</td><td>%d</td><td>%d</td><td colspan='5'>%s</td></tr>" % (
+                column, info["count"], info["missing"], html.escape(", ".join(
+                    "%s: %d" % kv for kv in info["frequencies"].items()))))
+    parts.append("</table>")
+    for column, info in report["data_quality"].items():
+        if info["type"] == "numeric":
+            parts.append("<h3>%s</h3>%s" % (column, _bars(info["histogram"])))
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reportes de monitoreo incrementales")
+    parser.add_argument("sources", nargs="*", help="archivos CSV o Parquet a incorporar")
+    parser.add_argument("--dir", default=MONITORING_DIR, help="estado y reportes (default: %(default)s)")
+    parser.add_argument("--model", default=PRODUCTION_MODEL)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--rebuild", action="store_true", help="descartar el estado y recalcular")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    started = time.perf_counter()
+    report = run(args.sources, args.dir, args.model, args.chunksize, args.rebuild)
+    print("%d filas, %d archivos -> %s (%.2fs)" % (
+        report["rows"], len(report["sources"]), args.dir, time.perf_counter() - started))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,581 @@
+"""
+Cartera puntuada con índices para consultas de ranking.
+
+``PortfolioStore`` guarda el último puntaje de cada cliente (por
+``customer_id``) en columnas NumPy compactas, junto con los atributos por los
+que se filtra, y mantiene:
+
+* **particiones** por nivel de riesgo × país × género × productos, cada una
+  con sus filas ordenadas por probabilidad descendente;
+* **índices ordenados** por saldo y por edad, para los filtros de rango.
+
+``top(k, ...)`` resuelve "los 500 clientes de mayor riesgo en España con saldo
+> 100k" sin recorrer toda la cartera. Si el filtro de rango más selectivo
+deja pocas filas, se toman del índice ordenado, se filtran y se selecciona
+con ``argpartition``. Si no, se recorre cada partición elegida en orden de
+probabilidad hasta juntar ``k`` filas que pasen los filtros y se mezclan los
+primeros de cada una.
+
+``upsert`` incorpora clientes nuevos o repuntuados. Cada cliente se saca de
+su partición y de los índices y se inserta en su posición ordenada; no se
+reconstruye todo salvo que el lote sea una parte grande de la cartera. Los
+trabajos de ``churn.jobs`` alimentan la cartera de la app mientras puntúan.
+
+Uso::
+
+    python -m churn.portfolio load clientes.csv
+    python -m churn.portfolio top --k 500 --country Spain --min-balance 100000
+    python -m churn.portfolio --bench 2000000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from churn import paths
+from churn.batch import ID_COLUMN, iter_chunks, score_matrix
+from churn.registry import PRODUCTION_MODEL, get_registry
+from churn.risk import RISK_LEVELS, risk_codes
+
+STORE_DIR = os.path.join(paths.ROOT_DIR, ".cache", "portfolio")
+
+# Atributos categóricos de las particiones (además del nivel de riesgo)
+SEGMENTS = ("country", "gender", "products_number")
+# Atributos con índice ordenado para filtros de rango
+RANGES = ("balance", "age")
+COLUMNS = (ID_COLUMN, "churn_probability", "risk_code") + SEGMENTS + RANGES
+# Columnas que se leen del archivo además de las del modelo
+EXTRA = SEGMENTS + RANGES
+
+_DTYPES = {ID_COLUMN: np.int64, "churn_probability": np.float32, "risk_code": np.int8,
+           "country": np.int8, "gender": np.int8, "products_number": np.int8,
+           "balance": np.float32, "age": np.int16}
+
+# El recorrido de una partición empieza con bloques de este tamaño y los duplica
+WALK_BLOCK = 1024
+# Si el lote es más de esta fracción de la cartera, se reconstruyen los índices
+REBUILD_FRACTION = 0.25
+# Un índice de rango se usa si deja menos filas que esta fracción de las particiones
+RANGE_PLAN_FRACTION = 0.25
+
+
+def _split_key(key):
+    """``(código de riesgo, códigos de SEGMENTS...)`` de una clave de partición."""
+    codes = []
+    for _ in SEGMENTS:
+        key, code = divmod(key, 128)
+        codes.append(code)
+    return (key,) + tuple(codes[::-1])
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+class PortfolioStore:
+    """Último puntaje de cada cliente, particionado y con índices por saldo y edad."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._n = 0
+        self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in _DTYPES.items()}
+        # Valores de cada atributo categórico, en el orden de sus códigos
+        self.vocab = {name: [] for name in SEGMENTS}
+        self.model = None
+        self.updated_at = None
+        self._rebuild()
+
+    def __len__(self):
+        return self._n
+
+    def column(self, name):
+        return self._columns[name][:self._n]
+
+    def bounds(self, name):
+        """``(mínimo, máximo)`` de una variable de ``RANGES`` según su índice; None si está vacía."""
+        with self._lock:
+            _, values = self._ranges[name]
+            return (values[0], values[-1]) if len(values) else None
+
+    # -- índices -----------------------------------------------------------
+
+    def _partition_keys(self, positions):
+        keys = self._columns["risk_code"][positions].astype(np.int64)
+        for name in SEGMENTS:
+            keys = keys * 128 + self._columns[name][positions]
+        return keys
+
+    def _rebuild(self):
+        n = self._n
+        ids = self.column(ID_COLUMN)
+        self._id_order = np.argsort(ids, kind="stable").astype(np.int32)
+        self._sorted_ids = ids[self._id_order]
+        self._ranges = {}
+        for name in RANGES:
+            order = np.argsort(self.column(name), kind="stable").astype(np.int32)
+            self._ranges[name] = (order, self.column(name)[order])
+        self._partitions = {}
+        if not n:
+            return
+        positions = np.arange(n, dtype=np.int32)
+        keys = self._partition_keys(positions)
+        order = np.lexsort((-self.column("churn_probability"), keys))
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, np.diff(keys) != 0])
+        for key, part in zip(keys[starts], np.split(order.astype(np.int32), starts[1:])):
+            self._partitions[int(key)] = (part, -self._columns["churn_probability"][part])
+
+    def _remove(self, positions):
+        """Saca ``positions`` de las particiones y de los índices de rango."""
+        keys = self._partition_keys(positions)
+        for key in np.unique(keys):
+            part, neg = self._partitions[int(key)]
+            keep = ~np.isin(part, positions[keys == key])
+            if keep.any():
+                self._partitions[int(key)] = (part[keep], neg[keep])
+            else:
+                del self._partitions[int(key)]
+        for name in RANGES:
+            order, values = self._ranges[name]
+            keep = ~np.isin(order, positions)
+            self._ranges[name] = (order[keep], values[keep])
+
+    def _insert(self, positions):
+        """Inserta ``positions`` (con sus valores ya escritos) en su lugar ordenado."""
+        keys = self._partition_keys(positions)
+        probabilities = self._columns["churn_probability"]
+        for key in np.unique(keys):
+            new = positions[keys == key]
+            new_neg = -probabilities[new]
+            order = np.argsort(new_neg, kind="stable")
+            new, new_neg = new[order], new_neg[order]
+            part, neg = self._partitions.get(int(key), (np.empty(0, np.int32), np.empty(0, np.float32)))
+            at = np.searchsorted(neg, new_neg, side="right")
+            self._partitions[int(key)] = (np.insert(part, at, new), np.insert(neg, at, new_neg))
+        for name in RANGES:
+            order, values = self._ranges[name]
+            new_values = self._columns[name][positions]
+            by_value = np.argsort(new_values, kind="stable")
+            at = np.searchsorted(values, new_values[by_value], side="right")
+            self._ranges[name] = (np.insert(order, at, positions[by_value]),
+                                  np.insert(values, at, new_values[by_value]))
+
+    # -- actualización -----------------------------------------------------
+
+    def _codes(self, name, values):
+        vocab = self.vocab[name]
+        lookup = {v: i for i, v in enumerate(vocab)}
+        # products_number llega como float cuando se lee como variable del modelo
+        values = pd.Series(values).astype(np.int64 if name == "products_number" else str)
+        unique = pd.unique(values)
+        for value in unique:
+            if value not in lookup:
+                if len(vocab) >= 127:
+                    raise ValueError("demasiados valores distintos de %s" % name)
+                lookup[value] = len(vocab)
+                vocab.append(value.item() if hasattr(value, "item") else value)
+        return values.map(lookup).to_numpy(dtype=np.int8)
+
+    def _grow(self, size):
+        capacity = len(self._columns[ID_COLUMN])
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._n] = column[:self._n]
+            self._columns[name] = grown
+
+    def upsert(self, frame, probabilities, model=None):
+        """Agrega o actualiza los clientes de ``frame`` con sus probabilidades.
+
+        Las filas sin probabilidad (valores faltantes) se ignoran. Devuelve
+        ``(nuevos, actualizados)``.
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        valid = ~np.isnan(probabilities)
+        frame = frame[valid]
+        probabilities = probabilities[valid]
+        if not len(frame):
+            return 0, 0
+        if ID_COLUMN not in frame:
+            raise ValueError("la cartera necesita la columna %s" % ID_COLUMN)
+        ids = frame[ID_COLUMN].to_numpy(dtype=np.int64)
+        # Si un cliente se repite en el lote, vale la última fila
+        ids_rev = ids[::-1]
+        _, last = np.unique(ids_rev, return_index=True)
+        keep = np.sort(len(ids) - 1 - last)
+        if len(keep) != len(ids):
+            frame, probabilities, ids = frame.iloc[keep], probabilities[keep], ids[keep]
+
+        values = {
+            ID_COLUMN: ids,
+            "churn_probability": probabilities.astype(np.float32),
+            "risk_code": risk_codes(probabilities),
+        }
+        for name in SEGMENTS:
+            values[name] = self._codes(name, frame[name].to_numpy() if name in frame else [""] * len(frame))
+        for name in RANGES:
+            values[name] = frame[name].to_numpy(dtype=_DTYPES[name]) if name in frame else np.zeros(
+                len(frame), dtype=_DTYPES[name])
+
+        with self._lock:
+            at = np.searchsorted(self._sorted_ids, ids)
+            at_clipped = np.minimum(at, max(len(self._sorted_ids) - 1, 0))
+            exists = (at < len(self._sorted_ids)) & (self._sorted_ids[at_clipped] == ids) if self._n else \
+                np.zeros(len(ids), dtype=bool)
+            old = self._id_order[at_clipped[exists]]
+            n_new = int((~exists).sum())
+            new = np.arange(self._n, self._n + n_new, dtype=np.int32)
+            rebuild = len(ids) > REBUILD_FRACTION * (self._n + n_new)
+            if len(old) and not rebuild:
+                self._remove(old)
+            self._grow(self._n + n_new)
+            for name, column in self._columns.items():
+                column[old] = values[name][exists]
+                column[new] = values[name][~exists]
+            self._n += n_new
+            if rebuild:
+                self._rebuild()
+            else:
+                self._insert(np.concatenate([old, new]).astype(np.int32))
+                if n_new:
+                    new_ids = ids[~exists]
+                    order = np.argsort(new_ids, kind="stable")
+                    where = np.searchsorted(self._sorted_ids, new_ids[order])
+                    self._sorted_ids = np.insert(self._sorted_ids, where, new_ids[order])
+                    self._id_order = np.insert(self._id_order, where, new[order])
+            if model is not None:
+                self.model = model
+            self.updated_at = time.time()
+        return n_new, len(old)
+
+    def score_file(self, path, entry=None, model=PRODUCTION_MODEL, chunksize=100_000, fmt=None):
+        """Puntúa un archivo y lo incorpora; devuelve las filas leídas."""
+        entry = entry or get_registry().get(model)
+        rows = 0
+        for frame in iter_chunks(path, entry.spec.inputs, chunksize, fmt, extra=EXTRA):
+            self.upsert(frame, score_matrix(entry, entry.spec.encode(frame)), entry.label)
+            rows += len(frame)
+        return rows
+
+    # -- consultas ---------------------------------------------------------
+
+    def _allowed(self, name, values):
+        """Códigos de ``name`` permitidos por el filtro (``None``: todos)."""
+        values = _as_list(values)
+        if values is None:
+            return None
+        vocab = self.vocab[name]
+        return [vocab.index(v) for v in values if v in vocab]
+
+    def _partition_list(self, risk_level, segments):
+        bands = _as_list(risk_level)
+        bands = None if bands is None else [RISK_LEVELS.index(b) for b in bands]
+        allowed = [bands] + [self._allowed(name, segments.get(name)) for name in SEGMENTS]
+        selected = []
+        for key, part in self._partitions.items():
+            codes = _split_key(key)
+            if all(a is None or c in a for a, c in zip(allowed, codes)):
+                selected.append(part)
+        return selected
+
+    def _range_mask(self, positions, ranges):
+        mask = np.ones(len(positions), dtype=bool)
+        for name, (low, high) in ranges.items():
+            values = self._columns[name][positions]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        return mask
+
+    def _range_count(self, name, low, high):
+        _, values = self._ranges[name]
+        lo = 0 if low is None else np.searchsorted(values, low, side="left")
+        hi = len(values) if high is None else np.searchsorted(values, high, side="right")
+        return lo, hi
+
+    def top(self, k=500, risk_level=None, balance=None, age=None, **segments):
+        """Los ``k`` clientes de mayor probabilidad que cumplen los filtros.
+
+        ``risk_level`` y los atributos de ``SEGMENTS`` aceptan un valor o una
+        lista; ``balance`` y ``age`` un par ``(mínimo, máximo)`` inclusivo
+        (``None`` en un extremo: sin límite). Devuelve ``(DataFrame, plan)``.
+        """
+        unknown = set(segments) - set(SEGMENTS)
+        if unknown:
+            raise ValueError("filtros desconocidos: %s" % ", ".join(sorted(unknown)))
+        ranges = {name: r for name, r in (("balance", balance), ("age", age))
+                  if r is not None and r != (None, None)}
+        started = time.perf_counter()
+        with self._lock:
+            parts = self._partition_list(risk_level, segments)
+            in_partitions = sum(len(p) for p, _ in parts)
+            best = None
+            for name, (low, high) in ranges.items():
+                lo, hi = self._range_count(name, low, high)
+                if best is None or hi - lo < best[1] - best[0]:
+                    best = (lo, hi, name)
+            if best is not None and best[1] - best[0] < RANGE_PLAN_FRACTION * in_partitions:
+                plan = "índice de %s" % best[2]
+                selected = self._top_from_range(k, best, risk_level, segments, ranges)
+                scanned = best[1] - best[0]
+            else:
+                plan = "particiones"
+                selected, scanned = self._top_from_partitions(k, parts, ranges)
+            result = self._frame(selected)
+        return result, {"plan": plan, "partitions": len(parts), "candidates": in_partitions,
+                        "scanned": int(scanned), "seconds": time.perf_counter() - started}
+
+    def _top_from_range(self, k, best, risk_level, segments, ranges):
+        lo, hi, name = best
+        positions = self._ranges[name][0][lo:hi]
+        mask = self._range_mask(positions, ranges)
+        bands = _as_list(risk_level)
+        if bands is not None:
+            mask &= np.isin(self._columns["risk_code"][positions], [RISK_LEVELS.index(b) for b in bands])
+        for segment in SEGMENTS:
+            allowed = self._allowed(segment, segments.get(segment))
+            if allowed is not None:
+                mask &= np.isin(self._columns[segment][positions], allowed)
+        positions = positions[mask]
+        return self._select(positions, k)
+
+    def _top_from_partitions(self, k, parts, ranges):
+        candidates, scanned = [], 0
+        for part, _ in parts:
+            found, start, block = [], 0, max(WALK_BLOCK, k)
+            count = 0
+            while start < len(part) and count < k:
+                chunk = part[start:start + block]
+                if ranges:
+                    chunk = chunk[self._range_mask(chunk, ranges)]
+                found.append(chunk[:k - count])
+                count += len(found[-1])
+                scanned += min(block, len(part) - start)
+                start += block
+                block *= 2
+            if found:
+                candidates.append(np.concatenate(found))
+        if not candidates:
+            return np.empty(0, dtype=np.int32), scanned
+        # Cada lista ya está en orden: alcanza con elegir los k mayores de la unión
+        return self._select(np.concatenate(candidates), k), scanned
+
+    def _select(self, positions, k):
+        probabilities = self._columns["churn_probability"][positions]
+        if len(positions) > k:
+            chosen = np.argpartition(-probabilities, k - 1)[:k]
+            positions, probabilities = positions[chosen], probabilities[chosen]
+        order = np.lexsort((self._columns[ID_COLUMN][positions], -probabilities))
+        return positions[order]
+
+    def _frame(self, positions):
+        data = {ID_COLUMN: self._columns[ID_COLUMN][positions],
+                "churn_probability": self._columns["churn_probability"][positions],
+                "risk_level": np.asarray(RISK_LEVELS, dtype=object)[self._columns["risk_code"][positions]]}
+        for name in SEGMENTS:
+            data[name] = np.asarray(self.vocab[name], dtype=object)[self._columns[name][positions]] \
+                if self.vocab[name] else np.empty(len(positions), dtype=object)
+        for name in RANGES:
+            data[name] = self._columns[name][positions]
+        return pd.DataFrame(data)
+
+    def segments(self, by="country"):
+        """Clientes por nivel de riesgo y ``by``, sumando los tamaños de las particiones."""
+        index = SEGMENTS.index(by)
+        counts = {}
+        with self._lock:
+            for key, (part, _) in self._partitions.items():
+                codes = _split_key(key)
+                cell = (self.vocab[by][codes[index + 1]], RISK_LEVELS[codes[0]])
+                counts[cell] = counts.get(cell, 0) + len(part)
+        table = pd.Series(counts, dtype=np.int64).unstack(fill_value=0) if counts else pd.DataFrame()
+        return table.reindex(columns=[c for c in RISK_LEVELS if c in table.columns]) if counts else table
+
+    def customer(self, customer_id):
+        """Fila del cliente, o ``None`` si no está."""
+        with self._lock:
+            at = np.searchsorted(self._sorted_ids, customer_id)
+            if at >= len(self._sorted_ids) or self._sorted_ids[at] != customer_id:
+                return None
+            return self._frame(self._id_order[at:at + 1]).iloc[0].to_dict()
+
+    # -- persistencia ------------------------------------------------------
+
+    def save(self, directory=STORE_DIR):
+        """Columnas .npy y ``meta.json`` (reemplazo atómico); los índices se rearman al cargar."""
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        try:
+            with self._lock:
+                for name in COLUMNS:
+                    np.save(os.path.join(tmp, name + ".npy"), self.column(name))
+                meta = {"rows": self._n, "vocab": self.vocab, "model": self.model,
+                        "updated_at": self.updated_at}
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as fh:
+                json.dump(meta, fh, indent=2)
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+            os.replace(tmp, directory)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return directory
+
+    @classmethod
+    def load(cls, directory=STORE_DIR):
+        store = cls()
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return store
+        with open(meta_path, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        store._columns = {name: np.load(os.path.join(directory, name + ".npy")) for name in COLUMNS}
+        store._n = meta["rows"]
+        store.vocab = meta["vocab"]
+        store.model = meta["model"]
+        store.updated_at = meta["updated_at"]
+        store._rebuild()
+        return store
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_portfolio():
+    """Cartera compartida por el proceso (la que usan los trabajos y la app)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PortfolioStore.load()
+    return _store
+
+
+def synthetic(rows, seed=0):
+    """Clientes sintéticos con la distribución aproximada del CSV."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        ID_COLUMN: np.arange(rows, dtype=np.int64) + 10_000_000,
+        "credit_score": rng.integers(350, 851, rows),
+        "country": rng.choice(["France", "Spain", "Germany"], rows, p=[0.5, 0.25, 0.25]),
+        "gender": rng.choice(["Female", "Male"], rows),
+        "age": rng.integers(18, 93, rows),
+        "tenure": rng.integers(0, 11, rows),
+        "balance": np.where(rng.random(rows) < 0.36, 0.0, rng.normal(120_000, 30_000, rows).clip(0)),
+        "products_number": rng.choice([1, 2, 3, 4], rows, p=[0.5, 0.46, 0.03, 0.01]),
+        "estimated_salary": rng.uniform(0, 200_000, rows),
+    })
+
+
+def _bench(rows, k=500):
+    entry = get_registry().get()
+    frame = synthetic(rows)
+    probabilities = score_matrix(entry, entry.spec.encode(frame))
+    store = PortfolioStore()
+    started = time.perf_counter()
+    store.upsert(frame, probabilities)
+    print("carga de %d clientes: %.2f s" % (rows, time.perf_counter() - started))
+
+    queries = {
+        "top %d" % k: {},
+        "España, saldo >= 100k": {"country": "Spain", "balance": (100_000, None)},
+        "alto, Alemania, mujeres, 3-4 productos": {"risk_level": "alto", "country": "Germany",
+                                                   "gender": "Female", "products_number": [3, 4]},
+        "edad 30-32, saldo 150k-151k": {"age": (30, 32), "balance": (150_000, 151_000)},
+    }
+    p = store.column("churn_probability")
+    for label, filters in queries.items():
+        store.top(k, **filters)
+        timings = []
+        for _ in range(5):
+            result, plan = store.top(k, **filters)
+            timings.append(plan["seconds"])
+        # Comparación con un recorrido completo
+        started = time.perf_counter()
+        mask = np.ones(len(store), dtype=bool)
+        for name in SEGMENTS:
+            if name in filters:
+                mask &= np.isin(store.column(name), store._allowed(name, filters[name]))
+        if "risk_level" in filters:
+            mask &= store.column("risk_code") == RISK_LEVELS.index(filters["risk_level"])
+        for name in RANGES:
+            if name in filters:
+                low, high = filters[name]
+                values = store.column(name)
+                mask &= (values >= (-np.inf if low is None else low)) & (
+                    values <= (np.inf if high is None else high))
+        full = np.sort(p[mask])[::-1][:k]
+        scan = time.perf_counter() - started
+        same = np.array_equal(full, result["churn_probability"].to_numpy())
+        print("%-40s %8.2f ms (%s, %d revisadas) | recorrido completo %7.1f ms | iguales: %s" % (
+            label, min(timings) * 1e3, plan["plan"], plan["scanned"], scan * 1e3, "sí" if same else "NO"))
+
+    batch = frame.sample(10_000, random_state=1)
+    started = time.perf_counter()
+    store.upsert(batch, np.random.default_rng(2).random(len(batch)))
+    print("repuntuar 10 000 clientes: %.1f ms" % ((time.perf_counter() - started) * 1e3))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cartera puntuada con índices de ranking")
+    parser.add_argument("--store", default=STORE_DIR, help="directorio de la cartera")
+    parser.add_argument("--bench", type=int, metavar="FILAS", help="medir con una cartera sintética")
+    sub = parser.add_subparsers(dest="command")
+    p_load = sub.add_parser("load", help="puntuar un archivo e incorporarlo")
+    p_load.add_argument("path")
+    p_load.add_argument("--model", default=PRODUCTION_MODEL)
+    p_top = sub.add_parser("top", help="clientes de mayor riesgo con filtros")
+    p_top.add_argument("--k", type=int, default=500)
+    p_top.add_argument("--risk-level", nargs="+", choices=RISK_LEVELS)
+    p_top.add_argument("--country", nargs="+")
+    p_top.add_argument("--gender", nargs="+")
+    p_top.add_argument("--products", nargs="+", type=int)
+    p_top.add_argument("--min-balance", type=float)
+    p_top.add_argument("--max-balance", type=float)
+    p_top.add_argument("--min-age", type=int)
+    p_top.add_argument("--max-age", type=int)
+    p_top.add_argument("--output", help="guardar el resultado en CSV")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        _bench(args.bench)
+        return 0
+    if args.command is None:
+        parser.error("indica un comando o --bench")
+    store = PortfolioStore.load(args.store)
+    if args.command == "load":
+        started = time.perf_counter()
+        rows = store.score_file(args.path, model=args.model)
+        store.save(args.store)
+        print("%d filas en %.1f s; la cartera tiene %d clientes" % (
+            rows, time.perf_counter() - started, len(store)))
+        return 0
+
+    result, plan = store.top(args.k, risk_level=args.risk_level, country=args.country,
+                             gender=args.gender, products_number=args.products,
+                             balance=(args.min_balance, args.max_balance),
+                             age=(args.min_age, args.max_age))
+    if args.output:
+        result.to_csv(args.output, index=False)
+    else:
+        print(result.to_string(index=False, max_rows=40))
+    print("%d clientes en %.2f ms (%s, %d de %d filas revisadas)" % (
+        len(result), plan["seconds"] * 1e3, plan["plan"], plan["scanned"], plan["candidates"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Registro versionado de modelos.
+
+Los artefactos viven en ``models/`` con el formato ``<nombre>.joblib``
+(versión 0, los archivos originales) o ``<nombre>-v<N>.joblib``. Si junto a
+un ``.joblib`` está su exportación plana ``.gbm`` (``churn.artifact``), se
+carga esa: no importa sklearn ni deserializa objetos. El registro
+carga cada modelo una sola vez por proceso, valida su esquema de variables
+(``churn.features``; el guardado en el artefacto o el conocido para su
+nombre) y
+cambia a una versión nueva en caliente cuando aparece o se modifica el
+artefacto, sin reiniciar la aplicación.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from churn import artifact, paths
+from churn.compiled import compile_model, sklearn_proba
+from churn.datastore import load_customers
+from churn.features import (  # noqa: F401  (SchemaError se reexporta)
+    LEGACY_SPEC, PRODUCTION_FEATURES, PRODUCTION_SPEC, FeatureSpec, SchemaError, model_spec,
+    spec_for,
+)
+from churn.instrument import timed, timer
+
+logger = logging.getLogger(__name__)
+
+PRODUCTION_MODEL = "gbm_model_production"
+# Modelo original de 12 columnas (gbm.py), con credit_score_group en one-hot
+LEGACY_MODEL = "gbm_model"
+
+# Esquemas de los artefactos anteriores a ``feature_spec_``
+KNOWN_SCHEMAS = {
+    PRODUCTION_MODEL: PRODUCTION_SPEC,
+    LEGACY_MODEL: LEGACY_SPEC,
+}
+
+# Configuración con la que app.py entrenaba el modelo en cada clic
+FALLBACK_PARAMS = {
+    "learning_rate": 0.1,
+    "max_depth": 3,
+    "min_samples_split": 2,
+    "n_estimators": 100,
+    "random_state": 42,
+}
+
+_ARTIFACT_RE = re.compile(r"^(?P<name>.+?)(?:-v(?P<version>\d+))?(?P<suffix>\.joblib|\.gbm)$")
+
+# Formatos de artefacto, del preferido al último recurso
+FORMATS = (artifact.SUFFIX, ".joblib")
+
+
+class ModelEntry:
+    """Un modelo cargado junto con su versión y esquema.
+
+    ``features`` es un ``FeatureSpec`` o la lista de columnas del modelo.
+    """
+
+    def __init__(self, name, version, model, features, path=None, stat=None, fingerprint=None):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.spec = features if isinstance(features, FeatureSpec) else spec_for(features)
+        # Columnas de la matriz del modelo; los campos de entrada son spec.inputs
+        self.features = self.spec.columns
+        self.path = path
+        self.stat = stat
+        self.fingerprint = fingerprint or "v%s" % version
+        self.loaded_at = time.time()
+        # Motor NumPy equivalente bit a bit; None si el modelo no es un GBM binario
+        self.compiled = compile_model(model)
+
+    @property
+    def label(self):
+        return "%s@v%s" % (self.name, self.version)
+
+    def predict_proba(self, X):
+        """Probabilidad de abandono para una matriz en el orden de ``features``."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        with timer("model.predict", model=self.name):
+            if self.compiled is not None:
+                return self.compiled.predict_proba(X)
+            # El esquema se validó al cargar: la matriz ya está en el orden del
+            # modelo, sin el costo de armar un DataFrame por llamada
+            return sklearn_proba(self.model, X)
+
+    def row(self, values):
+        """Construye una fila en el orden del modelo a partir de un diccionario."""
+        return self.spec.encode_row(values)
+
+    def feature_importances(self):
+        return dict(zip(self.features, self.model.feature_importances_))
+
+    def __repr__(self):
+        return "<ModelEntry %s %s>" % (self.label, self.fingerprint)
+
+
+def validate_schema(model, spec):
+    """Comprueba que el modelo espera exactamente las columnas de ``spec`` y es binario."""
+    spec.check_model(model)
+    classes = list(getattr(model, "classes_", []))
+    if classes != [0, 1]:
+        raise SchemaError("se esperaban las clases [0, 1], se encontró %s" % classes)
+
+
+def _stat_key(path):
+    """Identidad del archivo en disco; un ``.gbm`` incluye la de su ``.joblib``."""
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    if path.endswith(artifact.SUFFIX):
+        try:
+            source = os.stat(os.path.splitext(path)[0] + ".joblib")
+            key += (source.st_mtime_ns, source.st_size)
+        except FileNotFoundError:
+            pass
+    return key
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+@timed("model.fit")
+def train_fallback(spec, data_path=paths.DATA_PATH):
+    """Entrena el GBM con la configuración histórica de app.py."""
+    import pandas as pd
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    data = load_customers(data_path)
+    model = GradientBoostingClassifier(**FALLBACK_PARAMS)
+    model.fit(pd.DataFrame(spec.encode(data), columns=list(spec.columns)), data["churn"])
+    return spec.attach(model)
+
+
+class ModelRegistry:
+    """Caché de modelos por proceso con recarga en caliente."""
+
+    def __init__(self, models_dir=paths.MODELS_DIR, data_path=paths.DATA_PATH,
+                 check_interval=2.0, schemas=None, formats=FORMATS):
+        self.models_dir = models_dir
+        self.formats = tuple(formats)
+        self.data_path = data_path
+        self.check_interval = check_interval
+        self.schemas = {name: spec if isinstance(spec, FeatureSpec) else spec_for(spec)
+                        for name, spec in (KNOWN_SCHEMAS if schemas is None else schemas).items()}
+        self._entries = {}
+        self._checked_at = {}
+        self._rejected = set()
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def subscribe(self, callback):
+        """Registra ``callback(name, anterior, nueva)``, llamado en cada cambio de versión."""
+        self._listeners.append(callback)
+
+    def versions(self, name):
+        """Lista ``(versión, ruta)`` de los artefactos de ``name``, de menor a mayor.
+
+        Dentro de una versión, el formato preferido queda último.
+        """
+        found = []
+        try:
+            filenames = os.listdir(self.models_dir)
+        except FileNotFoundError:
+            return found
+        for filename in filenames:
+            match = _ARTIFACT_RE.match(filename)
+            if match and match.group("name") == name and match.group("suffix") in self.formats:
+                version = int(match.group("version") or 0)
+                rank = -self.formats.index(match.group("suffix"))
+                found.append((version, rank, os.path.join(self.models_dir, filename)))
+        return [(version, path) for version, _, path in sorted(found)]
+
+    def get(self, name=PRODUCTION_MODEL):
+        """Devuelve el modelo vigente, recargándolo si cambió el artefacto."""
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if entry is not None and now - self._checked_at.get(name, 0.0) < self.check_interval:
+            return entry
+        with self._lock:
+            entry = self._refresh(name)
+            self._checked_at[name] = time.monotonic()
+            return entry
+
+    def refresh(self, name=PRODUCTION_MODEL):
+        """Fuerza la comprobación del artefacto en disco."""
+        with self._lock:
+            entry = self._refresh(name)
+            self._checked_at[name] = time.monotonic()
+            return entry
+
+    def _refresh(self, name):
+        current = self._entries.get(name)
+        versions = self.versions(name)
+        # Se prueba desde la versión más reciente; una versión ilegible no
+        # tumba el servicio mientras exista otra válida.
+        for version, path in reversed(versions):
+            key = _stat_key(path)
+            if current is not None and current.path == path and current.stat == key:
+                return current
+            if (path, key) in self._rejected:
+                continue
+            try:
+                entry = self._load(name, version, path, key)
+            except Exception as exc:
+                logger.warning("no se pudo cargar %s: %s", path, exc)
+                self._rejected.add((path, key))
+                continue
+            if current is not None:
+                logger.info("modelo %s: %s -> %s", name, current.label, entry.label)
+            self._install(name, current, entry)
+            return entry
+        if current is not None:
+            return current
+        entry = self._train(name)
+        self._install(name, current, entry)
+        return entry
+
+    def _install(self, name, previous, entry):
+        self._entries[name] = entry
+        for callback in self._listeners:
+            try:
+                callback(name, previous, entry)
+            except Exception:
+                logger.exception("error en el aviso de cambio de modelo")
+
+    def _load(self, name, version, path, stat):
+        fingerprint = None
+        with timer("model.load", model=name):
+            model = artifact.load_model(path)
+        if isinstance(model, artifact.FlatGBM):
+            artifact.check_source(path, model.header)
+            # Misma huella que el .joblib exportado: las cachés por huella siguen valiendo
+            source = model.header.get("source")
+            fingerprint = source["fingerprint"] if source else None
+        known = self.schemas.get(name)
+        spec = model_spec(model)
+        if spec is None:
+            spec = known
+        elif known is not None and spec != known:
+            raise SchemaError("%s declara un esquema distinto del de %s: %s" % (
+                path, name, list(spec.columns)))
+        if spec is None:
+            names = getattr(model, "feature_names_in_", None)
+            if names is None:
+                raise SchemaError("%s no declara sus variables" % path)
+            spec = spec_for(names)
+        validate_schema(model, spec)
+        return ModelEntry(name, version, model, spec, path=path, stat=stat,
+                          fingerprint=fingerprint or file_fingerprint(path))
+
+    def _train(self, name):
+        spec = self.schemas.get(name)
+        if spec is None:
+            raise LookupError("no hay artefacto ni esquema para el modelo %r" % name)
+        logger.warning("sin artefacto utilizable para %s; entrenando con %s", name, self.data_path)
+        model = train_fallback(spec, self.data_path)
+        return ModelEntry(name, "fallback", model, spec, fingerprint="fallback")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Registro compartido por todo el proceso (sesiones y reruns de Streamlit)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,283 @@
+"""
+Servicio de los reportes HTML de Evidently.
+
+Cada reporte (3,4–3,7 MB) es una página envoltorio con un ``iframe`` cuyo
+``srcdoc`` trae, escapado, el documento real: una hoja de estilos de 127 KB y
+un bundle de JavaScript de 2,8 MB idénticos en los tres reportes, más un
+script de datos propio de cada uno.
+
+``ReportStore`` lee cada archivo una vez (se vuelve a leer solo si cambia su
+fecha o tamaño), desescapa el documento y separa los bloques ``<script>`` y
+``<style>`` grandes como recursos compartidos direccionados por contenido,
+de modo que el bundle vive una sola vez en memoria. Con eso ofrece:
+
+* ``Report.document()``: el documento completo sin la envoltura escapada.
+* ``Report.slim(url)``: el documento con los recursos grandes enlazados
+  (``<script src>``/``<link>``), para que el navegador los cachee.
+* ``ReportStore.encoded(...)``: variantes gzip (y brotli si está instalado)
+  precomprimidas al primer uso.
+
+Tamaños y memoria::
+
+    python -m churn.reports
+"""
+import argparse
+import gzip
+import hashlib
+import html
+import os
+import re
+import sys
+import threading
+
+from churn import paths
+from churn.instrument import timer
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+REPORTS = {
+    "class": "class_report.html",
+    "dataq": "data_quality_report.html",
+    "general": "report.html",
+}
+
+# Bloques en línea a partir de este tamaño se tratan como recursos aparte
+MIN_ASSET_BYTES = 64 << 10
+
+_SRCDOC_RE = re.compile(r'srcdoc="(.*?)"', re.S)
+_BLOCK_RE = re.compile(r"<(script|style)(\s[^>]*)?>(.*?)</\1>", re.S)
+_EXTENSIONS = {"script": ".js", "style": ".css"}
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+}
+
+
+class Asset:
+    """Bloque ``<script>``/``<style>`` compartido entre reportes."""
+
+    def __init__(self, kind, attrs, content):
+        self.kind = kind
+        self.attrs = attrs or ""
+        self.content = content
+        self.digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+        self.filename = "evidently-%s%s" % (self.digest, _EXTENSIONS[kind])
+
+    def inline(self):
+        return "<%s%s>%s</%s>" % (self.kind, self.attrs, self.content, self.kind)
+
+    def link(self, url):
+        if self.kind == "style":
+            return '<link rel="stylesheet" href="%s">' % url
+        return '<script%s src="%s"></script>' % (self.attrs, url)
+
+
+class Report:
+    """Documento de un reporte partido en texto propio y recursos compartidos."""
+
+    def __init__(self, name, path, signature, parts):
+        self.name = name
+        self.path = path
+        self.signature = signature
+        self.parts = parts
+        self.etag = hashlib.sha1("".join(
+            p.digest if isinstance(p, Asset) else p for p in parts).encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def assets(self):
+        return [p for p in self.parts if isinstance(p, Asset)]
+
+    def document(self):
+        """HTML completo, listo para ``st.components.v1.html``."""
+        return "".join(p.inline() if isinstance(p, Asset) else p for p in self.parts)
+
+    def slim(self, asset_url):
+        """HTML con los recursos enlazados en ``asset_url + filename``."""
+        return "".join(p.link(asset_url + p.filename) if isinstance(p, Asset) else p
+                       for p in self.parts)
+
+    def own_bytes(self):
+        return sum(len(p) for p in self.parts if not isinstance(p, Asset))
+
+
+def split_document(document, min_asset_bytes=MIN_ASSET_BYTES):
+    """Lista de textos y ``Asset`` cuya concatenación reproduce ``document``."""
+    parts, last = [], 0
+    for match in _BLOCK_RE.finditer(document):
+        kind, attrs, content = match.groups()
+        if len(content) < min_asset_bytes or (kind == "script" and attrs and "src=" in attrs):
+            continue
+        parts.append(document[last:match.start()])
+        parts.append(Asset(kind, attrs, content))
+        last = match.end()
+    parts.append(document[last:])
+    return [p for p in parts if not isinstance(p, str) or p]
+
+
+def extract_document(page):
+    """Documento interno del ``srcdoc`` de Evidently (o la página tal cual)."""
+    match = _SRCDOC_RE.search(page)
+    return html.unescape(match.group(1)) if match else page
+
+
+class ReportStore:
+    """Caché de reportes por proceso, con recursos deduplicados."""
+
+    def __init__(self, directory=paths.REPORTS_DIR, reports=None, min_asset_bytes=MIN_ASSET_BYTES):
+        self.directory = directory
+        self.reports = dict(reports or REPORTS)
+        self.min_asset_bytes = min_asset_bytes
+        self._loaded = {}
+        self._assets = {}
+        self._encoded = {}
+        self._exported = set()
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        if name not in self.reports:
+            raise KeyError(name)
+        return os.path.join(self.directory, self.reports[name])
+
+    def get(self, name):
+        """``Report`` vigente; relee el archivo solo si cambió."""
+        path = self.path(name)
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        report = self._loaded.get(name)
+        if report is not None and report.signature == signature:
+            return report
+        with self._lock:
+            report = self._loaded.get(name)
+            if report is None or report.signature != signature:
+                report = self._read(name, path, signature)
+                self._loaded[name] = report
+                self._prune()
+            return report
+
+    def _read(self, name, path, signature):
+        with timer("reports.read", report=name), \
+                open(path, "r", encoding="utf-8", errors="ignore") as fh:
+            document = extract_document(fh.read())
+        parts = []
+        for part in split_document(document, self.min_asset_bytes):
+            if isinstance(part, Asset):
+                # Un solo objeto por contenido: el bundle queda una vez en memoria
+                part = self._assets.setdefault(part.digest, part)
+            parts.append(part)
+        return Report(name, path, signature, parts)
+
+    def _prune(self):
+        used = {a.digest for r in self._loaded.values() for a in r.assets}
+        for digest in list(self._assets):
+            if digest not in used:
+                del self._assets[digest]
+        live = used | {r.etag for r in self._loaded.values()}
+        self._encoded = {k: v for k, v in self._encoded.items() if k[0].split(":")[0] in live}
+
+    def asset(self, filename):
+        """Recurso por nombre de archivo (``evidently-<hash>.js``), o ``None``."""
+        for asset in self._assets.values():
+            if asset.filename == filename:
+                return asset
+        return None
+
+    def encoded(self, key, text, encoding):
+        """``text`` codificado en UTF-8 y comprimido con ``encoding``, cacheado por ``key``."""
+        cache_key = (key, encoding)
+        data = self._encoded.get(cache_key)
+        if data is None:
+            data = text.encode("utf-8")
+            if encoding == "br":
+                data = brotli.compress(data, quality=11)
+            elif encoding == "gzip":
+                data = gzip.compress(data, compresslevel=9, mtime=0)
+            self._encoded[cache_key] = data
+        return data
+
+    def export_static(self, directory):
+        """Escribe los recursos en ``directory`` (una vez por archivo)."""
+        os.makedirs(directory, exist_ok=True)
+        for asset in list(self._assets.values()):
+            target = os.path.join(directory, asset.filename)
+            if target in self._exported:
+                continue
+            if not os.path.exists(target):
+                tmp = target + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    fh.write(asset.content)
+                os.replace(tmp, target)
+            self._exported.add(target)
+
+    def stats(self):
+        shared = sum(len(a.content) for a in self._assets.values())
+        own = sum(r.own_bytes() for r in self._loaded.values())
+        return {
+            "reports": sorted(self._loaded),
+            "assets": len(self._assets),
+            "asset_bytes": shared,
+            "report_bytes": own,
+            "resident_bytes": shared + own,
+            "encoded_bytes": sum(len(v) for v in self._encoded.values()),
+        }
+
+
+def accepted_encoding(header):
+    """Mejor codificación soportada según ``Accept-Encoding``."""
+    offered = {token.split(";")[0].strip().lower() for token in (header or "").split(",")}
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_report_store():
+    """Caché de reportes compartida por el proceso."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ReportStore()
+    return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tamaños de los reportes de Evidently")
+    parser.add_argument("--export", metavar="DIR", help="escribir los recursos compartidos en DIR")
+    args = parser.parse_args(argv)
+
+    store = get_report_store()
+    print("%-10s %10s %10s %10s %10s %10s" % ("reporte", "archivo", "documento", "ligero", "gzip", "br"))
+    raw_total = 0
+    for name in store.reports:
+        report = store.get(name)
+        raw = os.path.getsize(report.path)
+        raw_total += raw
+        slim = report.slim("static/")
+        sizes = [raw, len(report.document().encode("utf-8")), len(slim.encode("utf-8")),
+                 len(store.encoded(report.etag + ":slim", slim, "gzip"))]
+        sizes.append(len(store.encoded(report.etag + ":slim", slim, "br")) if brotli else None)
+        print("%-10s" % name + "".join(" %10s" % ("-" if s is None else "%.0f KB" % (s / 1024))
+                                       for s in sizes))
+    for asset in store._assets.values():
+        gz = len(store.encoded(asset.digest, asset.content, "gzip"))
+        print("%-27s %10.0f KB  gzip %6.0f KB" % (asset.filename, len(asset.content) / 1024, gz / 1024))
+    stats = store.stats()
+    print("en memoria: %.0f KB (antes %.0f KB leyendo cada archivo)" % (
+        stats["resident_bytes"] / 1024, raw_total / 1024))
+    if args.export:
+        store.export_static(args.export)
+        print("recursos escritos en %s" % args.export)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Niveles de riesgo a partir de la probabilidad de abandono."""
+import numpy as np
+
+# Límites inferiores de "medio" y "alto"
+RISK_THRESHOLDS = (0.3, 0.6)
+RISK_LEVELS = ("bajo", "medio", "alto")
+RISK_ICONS = ("🟢", "🟡", "🔴")
+
+
+def risk_codes(probabilities):
+    """Índice en ``RISK_LEVELS`` para cada probabilidad (vectorizado)."""
+    return np.searchsorted(RISK_THRESHOLDS, probabilities, side="right").astype(np.int8)
+
+
+def risk_levels(probabilities):
+    """Nivel de riesgo como texto para cada probabilidad."""
+    return np.asarray(RISK_LEVELS, dtype=object)[risk_codes(probabilities)]
+
+
+def calculate_risk_level(probability):
+    """Calcula el nivel de riesgo basado en la probabilidad"""
+    code = int(risk_codes(probability))
+    return RISK_LEVELS[code], RISK_ICONS[code]
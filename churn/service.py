@@ -0,0 +1,440 @@
+"""
+Servicio HTTP local de puntuación.
+
+Expone el modelo de producción (cargado una vez y mantenido en memoria por el
+registro) con la biblioteca estándar:
+
+* ``POST /predict`` con un cliente::
+
+      {"credit_score": 600, "tenure": 2, "age": 40, "balance": 0,
+       "estimated_salary": 50000, "products_number": 1}
+
+* ``POST /predict_batch`` con ``{"customers": [...]}``.
+* ``GET /health`` con el modelo vigente, estadísticas de los micro-lotes y,
+  con ``--shadow``/``--canary``, las comparaciones de ``churn.shadow``.
+* ``GET /drift`` con PSI/KS por variable contra los datos de entrenamiento
+  (ver ``churn.drift``); las alertas van al log y a un archivo JSONL.
+* ``GET /metrics``: histogramas de latencia en texto de Prometheus (con
+  ``--metrics``; ver ``churn.instrument``).
+* ``GET /reports/<class|dataq|general>``: reportes de Evidently en su versión
+  ligera; el bundle compartido se sirve aparte en ``/reports/assets/`` con
+  caché de larga duración. Todo sale precomprimido (gzip o brotli).
+
+Las peticiones individuales concurrentes se agrupan en micro-lotes: el primer
+pedido abre una ventana de espera (2 ms por defecto) y todo lo que llega en
+ella se puntúa con una sola llamada a ``predict_proba``.
+
+Uso::
+
+    python -m churn.service --port 8000 --max-wait-ms 2
+    python -m churn.service --metrics --profile sample   # perfil por petición en .cache/profiles/
+    python -m churn.service --shadow gbm_model --canary gbm_model --canary-percent 5
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from churn import instrument
+from churn.features import SchemaError
+from churn.cache import PredictionCache
+from churn.drift import ALERTS_PATH, DriftMonitor, Reference
+from churn.registry import PRODUCTION_MODEL, get_registry
+from churn.reports import CONTENT_TYPES, accepted_encoding, get_report_store
+from churn.risk import RISK_LEVELS, risk_codes
+from churn.shadow import DEFAULT_WORKERS, ShadowRouter
+
+logger = logging.getLogger(__name__)
+
+# Campos del formulario de app.py
+INPUT_FIELDS = ("credit_score", "tenure", "age", "balance", "estimated_salary", "products_number")
+
+MAX_BODY_BYTES = 8 << 20
+
+REPORT_ASSETS_URL = "/reports/assets/"
+
+
+class RequestError(ValueError):
+    """Petición mal formada; se responde con 400."""
+
+
+def check_finite(X, spec):
+    """Rechaza NaN e infinitos en los campos numéricos (``NaN`` es JSON válido para Python)."""
+    for feature in spec.features:
+        if feature.kind != "numeric":
+            continue
+        column = spec.columns.index(feature.name)
+        if X.ndim == 1:
+            finite = math.isfinite(X[column])
+        else:
+            finite = np.isfinite(X[:, column]).all()
+        if not finite:
+            raise RequestError("%s debe ser un número finito" % feature.source)
+    return X
+
+
+def parse_customer(payload, spec):
+    """Fila en el orden del modelo a partir del JSON de un cliente."""
+    if not isinstance(payload, dict):
+        raise RequestError("cada cliente debe ser un objeto JSON")
+    try:
+        row = spec.encode_row(payload)
+    except SchemaError as exc:
+        raise RequestError(str(exc))
+    return check_finite(row, spec)
+
+
+def parse_customers(customers, spec):
+    """Matriz del modelo para una lista de clientes, codificada por columnas."""
+    if not all(isinstance(c, dict) for c in customers):
+        raise RequestError("cada cliente debe ser un objeto JSON")
+    try:
+        columns = {f: [c[f] for c in customers] for f in spec.inputs}
+    except KeyError:
+        for customer in customers:
+            parse_customer(customer, spec)
+        raise
+    try:
+        X = spec.encode(columns)
+    except SchemaError as exc:
+        raise RequestError(str(exc))
+    return check_finite(X, spec)
+
+
+def prediction_payload(probability, model_label):
+    return {
+        "churn_probability": probability,
+        "prediction": int(probability > 0.5),
+        "risk_level": RISK_LEVELS[int(risk_codes(probability))],
+        "model": model_label,
+    }
+
+
+class MicroBatcher:
+    """Agrupa filas sueltas en lotes dentro de una ventana de espera."""
+
+    def __init__(self, model=PRODUCTION_MODEL, max_wait=0.002, max_batch=256, registry=None,
+                 router=None):
+        self.model = model
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.registry = registry or get_registry()
+        # Sombras y canario (churn.shadow); None: solo el primario
+        self.router = router
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Encola una fila; el futuro se resuelve con ``(probabilidad, entry)``."""
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._score(pending)
+
+    def _score(self, pending):
+        try:
+            entry = self.registry.get(self.model)
+            X = np.array([row for row, _ in pending])
+            served = None
+            if self.router is not None:
+                probabilities, served = self.router.score(X, entry)
+            else:
+                probabilities = entry.predict_proba(X)
+        except Exception as exc:
+            if len(pending) == 1:
+                pending[0][1].set_exception(exc)
+                return
+            # Una fila que hace fallar al modelo no arrastra al resto del lote
+            for item in pending:
+                self._score([item])
+            return
+        self.batches += 1
+        self.rows += len(pending)
+        for i, ((_, future), probability) in enumerate(zip(pending, probabilities.tolist())):
+            future.set_result((probability, entry if served is None else served[i]))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch": self.max_batch,
+        }
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "churn-service"
+    # Cabeceras y cuerpo salen en un solo envío; sin esto Nagle + ACK
+    # retardado agregan ~40 ms por respuesta en conexiones persistentes.
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_cached(self, key, text, content_type, etag, immutable=False):
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        encoding = accepted_encoding(self.headers.get("Accept-Encoding"))
+        data = self.server.reports.encoded(key, text, encoding)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable" if immutable else "no-cache")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_BYTES:
+            # El cuerpo queda sin leer: la conexión no se puede reutilizar
+            self.close_connection = True
+            raise RequestError("cuerpo demasiado grande" if length > 0 else "Content-Length inválido")
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError:
+            raise RequestError("JSON inválido")
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._metrics()
+            return
+        if self.path.startswith("/reports"):
+            self._report(self.path)
+            return
+        if self.path == "/drift":
+            if self.server.drift is None:
+                self._send(404, {"error": "monitor de deriva desactivado"})
+            else:
+                self._send(200, self.server.drift.evaluate())
+            return
+        if self.path != "/health":
+            self._send(404, {"error": "ruta desconocida"})
+            return
+        batcher = self.server.batcher
+        entry = batcher.registry.get(batcher.model)
+        body = {"status": "ok", "model": entry.label, "fingerprint": entry.fingerprint,
+                "batching": batcher.stats(), "cache": self.server.cache.stats()}
+        if batcher.router is not None:
+            body["shadow"] = batcher.router.stats()
+        self._send(200, body)
+
+    def _metrics(self):
+        if not instrument.enabled():
+            self._send(404, {"error": "métricas desactivadas"})
+            return
+        data = instrument.get_metrics().render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _report(self, path):
+        store = self.server.reports
+        if path in ("/reports", "/reports/"):
+            self._send(200, {"reports": sorted(store.reports)})
+            return
+        if path.startswith(REPORT_ASSETS_URL):
+            asset = store.asset(path[len(REPORT_ASSETS_URL):])
+            if asset is None:
+                self._send(404, {"error": "recurso desconocido"})
+                return
+            content_type = CONTENT_TYPES[os.path.splitext(asset.filename)[1]]
+            self._send_cached(asset.digest, asset.content, content_type, '"%s"' % asset.digest,
+                              immutable=True)
+            return
+        try:
+            report = store.get(path[len("/reports/"):])
+        except (KeyError, FileNotFoundError):
+            self._send(404, {"error": "reporte desconocido"})
+            return
+        self._send_cached(report.etag + ":slim", report.slim(REPORT_ASSETS_URL),
+                          CONTENT_TYPES[".html"], '"%s"' % report.etag)
+
+    def do_POST(self):
+        # Rutas desconocidas en una sola etiqueta: no crecen las series de /metrics
+        path = self.path if self.path in ("/predict", "/predict_batch") else "other"
+        with instrument.request("service.request", path=path):
+            self._dispatch_post()
+
+    def _dispatch_post(self):
+        try:
+            if self.path == "/predict":
+                self._send(200, self._predict(self._read_json()))
+            elif self.path == "/predict_batch":
+                self._send(200, self._predict_batch(self._read_json()))
+            else:
+                self._send(404, {"error": "ruta desconocida"})
+        except RequestError as exc:
+            self._send(400, {"error": str(exc)})
+        except Exception:
+            logger.exception("error al puntuar")
+            self._send(500, {"error": "error interno"})
+
+    def _predict(self, payload):
+        batcher, cache = self.server.batcher, self.server.cache
+        entry = batcher.registry.get(batcher.model)
+        row = parse_customer(payload, entry.spec)
+        if self.server.drift is not None:
+            self.server.drift.observe(row)
+        if batcher.router is not None:
+            # La caché va por huella: las filas del canario usan la suya
+            entry = batcher.router.route(entry, row)
+        probability = cache.lookup(entry, row)
+        if probability is None:
+            probability, entry = batcher.submit(row).result()
+            cache.store(entry, row, probability)
+        return prediction_payload(probability, entry.label)
+
+    def _predict_batch(self, payload):
+        customers = payload.get("customers") if isinstance(payload, dict) else payload
+        if not isinstance(customers, list):
+            raise RequestError('se esperaba {"customers": [...]}')
+        # Un lote explícito ya amortiza el costo: se puntúa directamente
+        batcher = self.server.batcher
+        entry = batcher.registry.get(batcher.model)
+        if not customers:
+            return {"model": entry.label, "predictions": []}
+        X = parse_customers(customers, entry.spec)
+        if self.server.drift is not None:
+            self.server.drift.observe_batch(X)
+        if batcher.router is None:
+            probabilities, served = entry.predict_proba(X), None
+        else:
+            probabilities, served = batcher.router.score(X, entry)
+        if served is None:
+            predictions = [prediction_payload(p, entry.label) for p in probabilities.tolist()]
+        else:
+            predictions = [prediction_payload(p, e.label) for p, e in zip(probabilities.tolist(), served)]
+        return {"model": entry.label, "predictions": predictions}
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Con la cola por defecto (5) las ráfagas de conexiones nuevas esperan
+    # el reintento de SYN de 1 s
+    request_queue_size = 128
+
+    def __init__(self, address, batcher, cache, reports=None, drift=None):
+        super().__init__(address, ScoringHandler)
+        self.batcher = batcher
+        self.cache = cache
+        self.reports = reports or get_report_store()
+        self.drift = drift
+
+
+def make_server(host="127.0.0.1", port=8000, max_wait=0.002, max_batch=256, model=PRODUCTION_MODEL,
+                cache_size=10_000, cache_ttl=None, drift_window=300, drift_alerts=ALERTS_PATH,
+                shadows=(), canary=None, canary_percent=0.0, shadow_workers=DEFAULT_WORKERS):
+    router = None
+    if shadows or (canary and canary_percent):
+        # Carga las sombras y el canario y valida sus esquemas antes de arrancar
+        router = ShadowRouter(model, shadows, canary, canary_percent, workers=shadow_workers).check()
+    batcher = MicroBatcher(model=model, max_wait=max_wait, max_batch=max_batch, router=router)
+    cache = PredictionCache(model=model, maxsize=cache_size, ttl=cache_ttl, registry=batcher.registry)
+    # Carga y compila el modelo antes de aceptar conexiones
+    entry = batcher.registry.get(model)
+    drift = None
+    if drift_window:
+        drift = DriftMonitor(Reference.from_training(entry.spec), window_seconds=drift_window,
+                             alerts_path=drift_alerts)
+        drift.start(interval=min(30.0, drift_window))
+    return ScoringServer((host, port), batcher, cache, drift=drift)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de puntuación de abandono")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="ventana para agrupar peticiones (default: %(default)s)")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--model", default=PRODUCTION_MODEL)
+    parser.add_argument("--cache-size", type=int, default=10_000,
+                        help="predicciones en la caché LRU (default: %(default)s)")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="vencimiento en segundos")
+    parser.add_argument("--drift-window", type=float, default=300,
+                        help="segundos por ventana del monitor de deriva; 0 lo desactiva (default: %(default)s)")
+    parser.add_argument("--drift-alerts", default=ALERTS_PATH, help="archivo JSONL de alertas de deriva")
+    parser.add_argument("--shadow", action="append", default=[],
+                        help="modelo que puntúa en sombra el mismo tráfico (repetible)")
+    parser.add_argument("--shadow-workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--canary", help="modelo que responde una parte del tráfico")
+    parser.add_argument("--canary-percent", type=float, default=0.0,
+                        help="porcentaje del tráfico para --canary (default: %(default)s)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="medir las operaciones y exponer GET /metrics")
+    parser.add_argument("--metrics-jsonl", help="además, escribir cada medición en este archivo JSONL")
+    parser.add_argument("--profile", choices=instrument.PROFILE_MODES,
+                        help="guardar un perfil por petición POST (cprofile o muestreo de pilas)")
+    parser.add_argument("--profile-dir", default=instrument.PROFILE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.metrics or args.metrics_jsonl or args.profile:
+        instrument.configure(True, args.metrics_jsonl, args.profile, args.profile_dir)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    server = make_server(args.host, args.port, args.max_wait_ms / 1000, args.max_batch, args.model,
+                         args.cache_size, args.cache_ttl, args.drift_window, args.drift_alerts,
+                         args.shadow, args.canary, args.canary_percent, args.shadow_workers)
+    logger.info("escuchando en http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if server.batcher.router is not None:
+            server.batcher.router.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""
+Modelos en sombra y canario en la ruta de puntuación.
+
+``ShadowRouter`` envuelve la llamada al modelo primario del servicio:
+
+* **sombra**: cada lote puntuado se vuelve a puntuar con uno o más modelos en
+  un ``ThreadPoolExecutor``, fuera del camino de la respuesta. La matriz de
+  la sombra se arma a partir de la del primario (``matrix_adapter``: las
+  columnas numéricas del primario son los campos de entrada de la sombra),
+  sin volver a leer el JSON. Los lotes que se acumulan mientras la sombra
+  trabaja se juntan en una sola llamada por modelo. Si la cola está llena el
+  lote se descarta y se cuenta, nunca se espera.
+* **canario**: un porcentaje del tráfico se responde con otro modelo. La
+  elección es un hash de los valores de la fila, así que un mismo cliente
+  cae siempre del mismo lado; para esas filas el primario se calcula en
+  segundo plano y se compara igual que una sombra.
+
+Las comparaciones se guardan en contadores agregados por modelo
+(``ComparisonStats``): filas, desacuerdos de predicción y de nivel de
+riesgo, media/desvío/máximo de la diferencia de probabilidad y su
+histograma. El servicio los publica en ``GET /health``. Las respuestas
+servidas desde la caché del servicio no se vuelven a comparar.
+
+Uso::
+
+    python -m churn.service --shadow gbm_model --canary gbm_model --canary-percent 5
+    python -m churn.shadow --bench      # p50/p99 del primario con y sin sombras
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from churn.features import SchemaError
+from churn.registry import PRODUCTION_MODEL, get_registry
+from churn.risk import risk_codes
+from churn.stats import Histogram, RunningMoments
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1
+# Lotes esperando a las sombras; con la cola llena se descartan
+MAX_PENDING = 64
+# Resolución del porcentaje de canario (centésimas de punto)
+CANARY_BUCKETS = 10_000
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def row_buckets(X):
+    """Cubeta estable (``0 <= b < CANARY_BUCKETS``) de cada fila, por sus valores."""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    hashes = np.full(len(X), _FNV_OFFSET, dtype=np.uint64)
+    for column in X.view(np.uint64).T:
+        hashes ^= column
+        hashes *= _FNV_PRIME
+    return ((hashes >> np.uint64(32)) % np.uint64(CANARY_BUCKETS)).astype(np.int64)
+
+
+def matrix_adapter(source, target):
+    """Función que arma la matriz de ``target`` a partir de una de ``source``.
+
+    Los campos de entrada de ``target`` tienen que ser columnas numéricas de
+    ``source``; si no, ``SchemaError``.
+    """
+    if source.columns == target.columns:
+        return lambda X: X
+    offsets = {}
+    offset = 0
+    for feature in source.features:
+        if feature.kind == "numeric":
+            offsets[feature.source] = offset
+        offset += len(feature.columns)
+    missing = [name for name in target.inputs if name not in offsets]
+    if missing:
+        raise SchemaError("el modelo primario no trae los campos %s" % ", ".join(missing))
+    return lambda X: target.encode({name: X[:, offsets[name]] for name in target.inputs})
+
+
+class ComparisonStats:
+    """Diferencias de un modelo contra el primario, agregadas."""
+
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.disagreements = 0
+        self.risk_changes = 0
+        self.delta = RunningMoments()
+        self.abs_delta = RunningMoments()
+        self.histogram = Histogram(-1.0, 1.0, bins=40)
+        self.errors = 0
+        self.seconds = 0.0
+
+    def update(self, reference, probabilities, seconds=0.0):
+        delta = probabilities - reference
+        self.rows += len(delta)
+        self.disagreements += int(((probabilities > 0.5) != (reference > 0.5)).sum())
+        self.risk_changes += int((risk_codes(probabilities) != risk_codes(reference)).sum())
+        self.delta.update(delta)
+        self.abs_delta.update(np.abs(delta))
+        self.histogram.update(delta)
+        self.seconds += seconds
+
+    def to_dict(self):
+        rows = self.rows or 1
+        return {
+            "model": self.label,
+            "rows": self.rows,
+            "disagreement_rate": self.disagreements / rows,
+            "risk_change_rate": self.risk_changes / rows,
+            "mean_delta": self.delta.mean,
+            "std_delta": self.delta.std,
+            "mean_abs_delta": self.abs_delta.mean,
+            "max_abs_delta": self.abs_delta.max if self.abs_delta.count else None,
+            "delta_quantiles": dict(zip(("p01", "p50", "p99"), self.histogram.quantiles(
+                (0.01, 0.5, 0.99)))) if self.rows else None,
+            "errors": self.errors,
+            "ms_per_1k_rows": 1000 * self.seconds / rows * 1000,
+        }
+
+
+class ShadowRouter:
+    """Puntúa con el primario (o el canario) y compara en segundo plano."""
+
+    def __init__(self, primary=PRODUCTION_MODEL, shadows=(), canary=None, canary_percent=0.0,
+                 workers=DEFAULT_WORKERS, max_pending=MAX_PENDING, registry=None):
+        if not 0 <= canary_percent <= 100:
+            raise ValueError("canary_percent debe estar entre 0 y 100")
+        self.primary = primary
+        self.shadows = tuple(shadows)
+        self.canary = canary if canary_percent else None
+        self.canary_percent = canary_percent
+        self.workers = workers
+        self.max_pending = max_pending
+        self.registry = registry or get_registry()
+        self.batches = 0
+        self.dropped = 0
+        self.dropped_rows = 0
+        self._cutoff = int(round(canary_percent * CANARY_BUCKETS / 100))
+        self._queue = []
+        self._draining = 0
+        self._stats = {}
+        self._adapters = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="shadow") \
+            if self.shadows or self.canary else None
+
+    @property
+    def active(self):
+        return self._executor is not None
+
+    def check(self):
+        """Carga los modelos y comprueba que sus matrices salen de la del primario."""
+        entry = self.registry.get(self.primary)
+        for name in self.shadows + ((self.canary,) if self.canary else ()):
+            self._adapter(entry, self.registry.get(name))
+        return self
+
+    def _adapter(self, entry, other):
+        key = (entry.fingerprint, other.fingerprint)
+        adapter = self._adapters.get(key)
+        if adapter is None:
+            adapter = self._adapters[key] = matrix_adapter(entry.spec, other.spec)
+        return adapter
+
+    def _comparison(self, role, label):
+        """Contadores de ``label`` en su papel (``shadow`` o ``canary``)."""
+        key = "%s:%s" % (role, label)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ComparisonStats(label)
+        return stats
+
+    def canary_mask(self, X):
+        """Filas que responde el canario."""
+        if self.canary is None:
+            return None
+        return row_buckets(X) < self._cutoff
+
+    def route(self, entry, row):
+        """Modelo que responde ``row``: el canario o ``entry``."""
+        if self.canary is not None and row_buckets(row.reshape(1, -1))[0] < self._cutoff:
+            return self.registry.get(self.canary)
+        return entry
+
+    def score(self, X, entry=None):
+        """``(probabilidades, modelos)``: lo servido y qué modelo respondió cada fila.
+
+        ``modelos`` es ``None`` si todo lo respondió el primario; si no, una
+        lista con el ``ModelEntry`` de cada fila.
+        """
+        entry = entry or self.registry.get(self.primary)
+        mask = self.canary_mask(X)
+        if mask is None or not mask.any():
+            probabilities = entry.predict_proba(X)
+            self._submit(entry, None, X, probabilities, None)
+            return probabilities, None
+        canary = self.registry.get(self.canary)
+        probabilities = np.empty(len(X))
+        if not mask.all():
+            probabilities[~mask] = entry.predict_proba(X[~mask])
+        probabilities[mask] = canary.predict_proba(self._adapter(entry, canary)(X[mask]))
+        self._submit(entry, canary, X, probabilities, mask)
+        return probabilities, [canary if m else entry for m in mask.tolist()]
+
+    def _submit(self, entry, canary, X, probabilities, mask):
+        if self._executor is None:
+            return
+        with self._lock:
+            self.batches += 1
+            if len(self._queue) >= self.max_pending:
+                self.dropped += 1
+                self.dropped_rows += len(X)
+                return
+            self._queue.append((entry, canary, X, probabilities, mask))
+            if self._draining >= self.workers:
+                return
+            self._draining += 1
+        self._executor.submit(self._drain)
+
+    def _drain(self):
+        """Compara lo encolado hasta vaciar la cola, un lote concatenado por modelo."""
+        while True:
+            with self._lock:
+                items, self._queue = self._queue, []
+                if not items:
+                    self._draining -= 1
+                    return
+            groups = {}
+            for item in items:
+                entry, canary = item[:2]
+                key = (entry.fingerprint, canary.fingerprint if canary is not None else None)
+                groups.setdefault(key, []).append(item)
+            for group in groups.values():
+                entry, canary = group[0][:2]
+                X = np.concatenate([item[2] for item in group])
+                served = np.concatenate([item[3] for item in group])
+                mask = None if canary is None else np.concatenate([item[4] for item in group])
+                try:
+                    self._compare(entry, canary, X, served, mask)
+                except Exception:
+                    logger.exception("error al comparar con el modelo primario")
+
+    def _compare(self, entry, canary, X, served, mask):
+        reference = served
+        if mask is not None and mask.any():
+            started = time.perf_counter()
+            reference = served.copy()
+            reference[mask] = entry.predict_proba(X[mask])
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._comparison("canary", canary.label).update(reference[mask], served[mask], elapsed)
+        for name in self.shadows:
+            shadow = None
+            try:
+                shadow = self.registry.get(name)
+                started = time.perf_counter()
+                probabilities = shadow.predict_proba(self._adapter(entry, shadow)(X))
+                elapsed = time.perf_counter() - started
+            except Exception:
+                with self._lock:
+                    stats = self._comparison("shadow", shadow.label if shadow is not None else name)
+                    stats.errors += 1
+                if stats.errors == 1:
+                    logger.exception("error en el modelo en sombra %s", name)
+                continue
+            with self._lock:
+                self._comparison("shadow", shadow.label).update(reference, probabilities, elapsed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "primary": self.primary,
+                "shadows": list(self.shadows),
+                "canary": self.canary,
+                "canary_percent": self.canary_percent,
+                "batches": self.batches,
+                "pending": len(self._queue),
+                "dropped_batches": self.dropped,
+                "dropped_rows": self.dropped_rows,
+                "comparisons": {label: s.to_dict() for label, s in self._stats.items()},
+            }
+
+    def close(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+        for key, comparison in self.stats()["comparisons"].items():
+            logger.info("%s: %d filas, desacuerdo %.2f%%, |Δ| medio %.4f", key,
+                        comparison["rows"], 100 * comparison["disagreement_rate"],
+                        comparison["mean_abs_delta"])
+
+
+def _bench(concurrency=16, requests=5000, batch_size=0, shadows=("gbm_model",), canary_percent=10.0):
+    """Latencia del servicio sin sombras, con sombras y con canario, cada uno en su proceso."""
+    import os
+    import socket
+    import subprocess
+    import urllib.request
+
+    from churn import paths
+    from churn.loadtest import run
+
+    configs = [
+        ("solo primario", []),
+        ("sombra %s" % ", ".join(shadows), [a for name in shadows for a in ("--shadow", name)]),
+        ("sombra + canario %g%%" % canary_percent,
+         [a for name in shadows for a in ("--shadow", name)]
+         + ["--canary", shadows[0], "--canary-percent", str(canary_percent)]),
+    ]
+    env = dict(os.environ, PYTHONPATH=paths.ROOT_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    results = []
+    for label, extra in configs:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        url = "http://127.0.0.1:%d" % port
+        server = subprocess.Popen(
+            [sys.executable, "-m", "churn.service", "--port", str(port), "--drift-window", "0"] + extra,
+            cwd=paths.ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(300):
+                try:
+                    urllib.request.urlopen(url + "/health", timeout=1).read()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            run(url, concurrency, min(requests, 500), batch_size)
+            report = run(url, concurrency, requests, batch_size)
+            # Se espera a que las sombras terminen la cola antes de leer los contadores
+            time.sleep(0.5)
+            health = json.loads(urllib.request.urlopen(url + "/health", timeout=5).read())
+        finally:
+            server.terminate()
+            server.wait()
+        results.append((label, report, health.get("shadow")))
+
+    base = results[0][1]
+    print("%d peticiones, concurrencia %d, %s" % (
+        requests, concurrency, "lotes de %d" % batch_size if batch_size else "/predict"))
+    print("%-32s %9s %9s %9s %10s" % ("", "p50 ms", "p99 ms", "Δ p99", "pet./s"))
+    for label, report, shadow in results:
+        print("%-32s %9.2f %9.2f %+8.1f%% %10.0f" % (
+            label, report["p50_ms"], report["p99_ms"], 100 * (report["p99_ms"] / base["p99_ms"] - 1),
+            report["requests_per_second"]))
+        if shadow:
+            for key, comparison in shadow["comparisons"].items():
+                print("    %-28s %d filas, desacuerdo %.2f%%, cambio de riesgo %.2f%%, |Δ| medio %.4f" % (
+                    key, comparison["rows"], 100 * comparison["disagreement_rate"],
+                    100 * comparison["risk_change_rate"], comparison["mean_abs_delta"]))
+            print("    lotes descartados: %d de %d" % (shadow["dropped_batches"], shadow["batches"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modelos en sombra y canario")
+    parser.add_argument("--bench", action="store_true",
+                        help="medir la latencia del servicio con y sin sombras")
+    parser.add_argument("--shadow", action="append", default=None, help="modelo en sombra (repetible)")
+    parser.add_argument("--canary-percent", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=0)
+    args = parser.parse_args(argv)
+    if not args.bench:
+        parser.error("indica --bench")
+    _bench(args.concurrency, args.requests, args.batch_size, tuple(args.shadow or ("gbm_model",)),
+           args.canary_percent)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
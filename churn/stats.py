@@ -0,0 +1,309 @@
+"""
+Agregados de una sola pasada.
+
+Cada agregado se actualiza por lotes con operaciones vectorizadas, se puede
+combinar con otro (``merge``) y se serializa a JSON (``to_dict`` /
+``from_dict``), de modo que un lote nuevo actualiza el estado guardado sin
+volver a recorrer el histórico.
+
+* ``RunningMoments``: conteo, faltantes, media, varianza (Welford/Chan), mín., máx.
+* ``Histogram``: bins uniformes fijos con desbordes; cuantiles interpolados.
+* ``CategoryCounts``: frecuencias de valores categóricos.
+* ``BinaryScoreStats``: matriz de confusión, log-loss, Brier, AUC y
+  calibración a partir de histogramas de probabilidades por clase.
+"""
+import math
+
+import numpy as np
+
+
+class RunningMoments:
+    """Media y varianza en streaming (fórmula de combinación de Chan)."""
+
+    def __init__(self, count=0, missing=0, mean=0.0, m2=0.0, minimum=math.inf, maximum=-math.inf):
+        self.count = count
+        self.missing = missing
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        finite = ~np.isnan(values)
+        self.missing += int(values.size - finite.sum())
+        values = values[finite]
+        if values.size:
+            mean = float(values.mean())
+            m2 = float(((values - mean) ** 2).sum())
+            self._combine(values.size, mean, m2, float(values.min()), float(values.max()))
+        return self
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def merge(self, other):
+        self.missing += other.missing
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {"count": self.count, "missing": self.missing, "mean": self.mean, "m2": self.m2,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["count"], data["missing"], data["mean"], data["m2"],
+                   math.inf if data["min"] is None else data["min"],
+                   -math.inf if data["max"] is None else data["max"])
+
+
+class Histogram:
+    """Histograma de bins uniformes en ``[low, high]`` con desbordes.
+
+    Con ``discrete=True`` los bins son de ancho 1 centrados en enteros y los
+    cuantiles son exactos.
+    """
+
+    def __init__(self, low, high, bins=None, discrete=False, counts=None, underflow=0, overflow=0):
+        if discrete:
+            low, high, bins = low - 0.5, high + 0.5, int(round(high - low)) + 1
+        self.low = float(low)
+        self.high = float(high)
+        self.bins = int(bins)
+        self.discrete = discrete
+        self.counts = np.zeros(self.bins, dtype=np.int64) if counts is None else np.asarray(counts, np.int64)
+        self.underflow = underflow
+        self.overflow = overflow
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, self.bins + 1)
+
+    @property
+    def total(self):
+        return int(self.counts.sum()) + self.underflow + self.overflow
+
+    def bin_index(self, values):
+        """Índice de bin de cada valor: -1 debajo del rango, ``bins`` encima."""
+        scaled = (values - self.low) * (self.bins / (self.high - self.low))
+        index = np.floor(scaled).astype(np.int64)
+        # El borde superior pertenece al último bin
+        index[values == self.high] = self.bins - 1
+        index[values < self.low] = -1
+        index[values > self.high] = self.bins
+        return index
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return self
+        index = self.bin_index(values)
+        counts = np.bincount(index + 1, minlength=self.bins + 2)
+        self.underflow += int(counts[0])
+        self.overflow += int(counts[-1])
+        self.counts += counts[1:-1]
+        return self
+
+    def merge(self, other):
+        if (other.low, other.high, other.bins) != (self.low, self.high, self.bins):
+            raise ValueError("histogramas con bins distintos")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def quantiles(self, qs, minimum=None, maximum=None):
+        """Cuantiles aproximados (error máximo: el ancho de un bin)."""
+        total = self.total
+        if not total:
+            return [None for _ in qs]
+        low = self.low if minimum is None else minimum
+        high = self.high if maximum is None else maximum
+        cumulative = self.underflow + np.cumsum(self.counts)
+        edges = self.edges
+        result = []
+        for q in qs:
+            target = q * total
+            if target <= self.underflow:
+                result.append(low)
+                continue
+            i = int(np.searchsorted(cumulative, target, side="left"))
+            if i >= self.bins:
+                result.append(high)
+                continue
+            if self.discrete:
+                value = (edges[i] + edges[i + 1]) / 2
+            else:
+                before = cumulative[i - 1] if i else self.underflow
+                inside = self.counts[i]
+                fraction = (target - before) / inside if inside else 0.0
+                value = edges[i] + fraction * (edges[i + 1] - edges[i])
+            result.append(float(min(max(value, low), high)))
+        return result
+
+    def to_dict(self):
+        return {"low": self.low, "high": self.high, "bins": self.bins, "discrete": self.discrete,
+                "counts": self.counts.tolist(), "underflow": self.underflow, "overflow": self.overflow}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["low"], data["high"], data["bins"], counts=data["counts"],
+                        underflow=data["underflow"], overflow=data["overflow"])
+        histogram.discrete = data["discrete"]
+        return histogram
+
+
+class CategoryCounts:
+    """Frecuencias de una variable categórica."""
+
+    def __init__(self, counts=None, missing=0):
+        self.counts = dict(counts or {})
+        self.missing = missing
+
+    def update(self, values):
+        series = np.asarray(values, dtype=object)
+        present = np.array([v is not None and v == v for v in series], dtype=bool)
+        self.missing += int(series.size - present.sum())
+        labels, counts = np.unique(series[present].astype(str), return_counts=True)
+        for label, count in zip(labels.tolist(), counts.tolist()):
+            self.counts[label] = self.counts.get(label, 0) + count
+        return self
+
+    def merge(self, other):
+        self.missing += other.missing
+        for label, count in other.counts.items():
+            self.counts[label] = self.counts.get(label, 0) + count
+        return self
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def to_dict(self):
+        return {"counts": self.counts, "missing": self.missing}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["counts"], data["missing"])
+
+
+class BinaryScoreStats:
+    """Métricas de clasificación acumuladas a partir de probabilidades."""
+
+    def __init__(self, bins=1000, threshold=0.5):
+        self.bins = bins
+        self.threshold = threshold
+        self.positives = np.zeros(bins, dtype=np.int64)
+        self.negatives = np.zeros(bins, dtype=np.int64)
+        self.score_sum = np.zeros(bins, dtype=np.float64)
+        self.confusion = {"tp": 0, "fp": 0, "tn": 0, "fn": 0}
+        self.log_loss_sum = 0.0
+        self.brier_sum = 0.0
+
+    def update(self, y_true, probability):
+        y = np.asarray(y_true).astype(bool)
+        p = np.asarray(probability, dtype=np.float64)
+        keep = ~np.isnan(p)
+        y, p = y[keep], p[keep]
+        index = np.minimum((p * self.bins).astype(np.int64), self.bins - 1)
+        self.positives += np.bincount(index[y], minlength=self.bins)
+        self.negatives += np.bincount(index[~y], minlength=self.bins)
+        self.score_sum += np.bincount(index, weights=p, minlength=self.bins)
+        predicted = p > self.threshold
+        self.confusion["tp"] += int((predicted & y).sum())
+        self.confusion["fp"] += int((predicted & ~y).sum())
+        self.confusion["tn"] += int((~predicted & ~y).sum())
+        self.confusion["fn"] += int((~predicted & y).sum())
+        clipped = np.clip(p, 1e-15, 1 - 1e-15)
+        self.log_loss_sum -= float(np.where(y, np.log(clipped), np.log1p(-clipped)).sum())
+        self.brier_sum += float(((p - y) ** 2).sum())
+        return self
+
+    def merge(self, other):
+        self.positives += other.positives
+        self.negatives += other.negatives
+        self.score_sum += other.score_sum
+        for key in self.confusion:
+            self.confusion[key] += other.confusion[key]
+        self.log_loss_sum += other.log_loss_sum
+        self.brier_sum += other.brier_sum
+        return self
+
+    @property
+    def count(self):
+        return int(self.positives.sum() + self.negatives.sum())
+
+    def auc(self):
+        """ROC AUC por bins (los empates dentro de un bin cuentan 1/2)."""
+        pos, neg = self.positives.sum(), self.negatives.sum()
+        if not pos or not neg:
+            return None
+        negatives_below = np.concatenate(([0], np.cumsum(self.negatives)[:-1]))
+        return float((self.positives * (negatives_below + 0.5 * self.negatives)).sum() / (pos * neg))
+
+    def calibration(self, groups=10):
+        """Probabilidad media predicha vs. tasa observada por tramo de probabilidad."""
+        rows = []
+        step = self.bins // groups
+        for start in range(0, self.bins, step):
+            pos = int(self.positives[start:start + step].sum())
+            n = pos + int(self.negatives[start:start + step].sum())
+            if n:
+                rows.append({"range": [start / self.bins, (start + step) / self.bins], "count": n,
+                             "predicted": float(self.score_sum[start:start + step].sum() / n),
+                             "observed": pos / n})
+        return rows
+
+    def metrics(self):
+        c = self.confusion
+        n = self.count
+        precision = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 0.0
+        recall = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 0.0
+        return {
+            "count": n,
+            "churn_rate": int(self.positives.sum()) / n if n else None,
+            "predicted_rate": (c["tp"] + c["fp"]) / n if n else None,
+            "accuracy": (c["tp"] + c["tn"]) / n if n else None,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "roc_auc": self.auc(),
+            "log_loss": self.log_loss_sum / n if n else None,
+            "brier": self.brier_sum / n if n else None,
+            "confusion": dict(c),
+            "threshold": self.threshold,
+        }
+
+    def to_dict(self):
+        return {"bins": self.bins, "threshold": self.threshold,
+                "positives": self.positives.tolist(), "negatives": self.negatives.tolist(),
+                "score_sum": self.score_sum.tolist(), "confusion": dict(self.confusion),
+                "log_loss_sum": self.log_loss_sum, "brier_sum": self.brier_sum}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["bins"], data["threshold"])
+        stats.positives = np.asarray(data["positives"], dtype=np.int64)
+        stats.negatives = np.asarray(data["negatives"], dtype=np.int64)
+        stats.score_sum = np.asarray(data["score_sum"], dtype=np.float64)
+        stats.confusion = dict(data["confusion"])
+        stats.log_loss_sum = data["log_loss_sum"]
+        stats.brier_sum = data["brier_sum"]
+        return stats
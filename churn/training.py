@@ -0,0 +1,368 @@
+"""
+Búsqueda de hiperparámetros y reentrenamiento del GBM.
+
+Evalúa con validación cruzada estratificada una grilla (o una muestra
+aleatoria) de hiperparámetros de un backend de ``churn.backends`` (``gbm``
+o ``hist``) en un pool de procesos. Cada tarea es un
+par (candidato, fold), así que el tiempo total baja con los núcleos
+disponibles. Dentro de una tarea ``n_estimators`` no se reentrena desde cero
+para cada valor (``max_iter`` en ``hist``): el mismo estimador crece con
+``warm_start`` de un punto de control al siguiente y se evalúa en cada uno.
+
+Las matrices y los índices de los folds se guardan en ``.cache/training/``
+(según el contenido de los datos y la configuración de la validación) y los
+procesos los mapean en memoria en lugar de recibir copias.
+
+El ganador se reentrena con todos los datos y se guarda como candidato,
+``models/<nombre>_candidate-v<N>.joblib``, junto a ``<nombre>_candidate-v<N>.json``
+con sus métricas y, para el GBM, su exportación plana ``.gbm``. El modelo
+vigente (``gbm_model_production`` o ``hgb_model``) no cambia: el candidato se
+puede servir en sombra o como canario (``churn.shadow``). Con ``--promote`` se
+guarda directamente como versión nueva del vigente, que el registro toma sin
+reiniciar la app, pero solo si en los mismos folds no empeora la pérdida ni el
+AUC de la configuración vigente (``churn.online.passes_check``).
+
+Uso::
+
+    python -m churn.training --workers 8
+    python -m churn.training --workers 8 --promote
+    python -m churn.training --search random --n-iter 20 --workers 8
+    python -m churn.training --learning-rate 0.05 0.1 --max-depth 3 --no-save
+    python -m churn.training --backend hist        # guarda models/hgb_model_candidate-v<N>
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+from churn import artifact, paths
+from churn.backends import BACKENDS, get_backend
+from churn.datastore import file_sha256, load_customers
+from churn.features import model_spec
+from churn.registry import ModelEntry, ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(paths.ROOT_DIR, ".cache", "training")
+
+TARGET = "churn"
+
+DEFAULT_N_ESTIMATORS = [50, 100, 150, 200, 300]
+CANDIDATE_SUFFIX = "_candidate"
+SCORING = ("roc_auc", "log_loss", "accuracy")
+
+
+def prepare_arrays(backend, data_path=paths.DATA_PATH, cv=5, seed=42, cache_dir=CACHE_DIR):
+    """Escribe (una vez) X, y y los folds; devuelve el directorio de la caché."""
+    from sklearn.model_selection import StratifiedKFold
+
+    key = hashlib.sha256(json.dumps(
+        [file_sha256(data_path), list(backend.features), cv, seed]).encode()).hexdigest()[:16]
+    directory = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(directory, "folds.npz")):
+        return directory
+
+    data = load_customers(data_path)
+    X = backend.matrix(data)
+    y = data[TARGET].to_numpy(dtype=np.int64)
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "X.npy"), X)
+    np.save(os.path.join(directory, "y.npy"), y)
+    splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed)
+    folds = {}
+    for i, (train, valid) in enumerate(splitter.split(X, y)):
+        folds["train_%d" % i] = train
+        folds["valid_%d" % i] = valid
+    # folds.npz se escribe al final: su presencia marca la caché como completa
+    target = os.path.join(directory, "folds.npz")
+    with open(target + ".tmp", "wb") as fh:
+        np.savez(fh, **folds)
+    os.replace(target + ".tmp", target)
+    return directory
+
+
+def load_arrays(directory):
+    X = np.load(os.path.join(directory, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(directory, "y.npy"), mmap_mode="r")
+    with np.load(os.path.join(directory, "folds.npz")) as archive:
+        folds = [(archive["train_%d" % i], archive["valid_%d" % i])
+                 for i in range(len(archive.files) // 2)]
+    return X, y, folds
+
+
+def candidates(grid, search="grid", n_iter=10, seed=42):
+    """Combinaciones de hiperparámetros (sin ``n_estimators``)."""
+    names = sorted(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if search == "random" and n_iter < len(combos):
+        rng = np.random.default_rng(seed)
+        combos = [combos[i] for i in sorted(rng.choice(len(combos), n_iter, replace=False))]
+    return combos
+
+
+def fold_metrics(y_true, probability):
+    from sklearn.metrics import accuracy_score, log_loss, roc_auc_score
+
+    return {
+        "roc_auc": roc_auc_score(y_true, probability),
+        "log_loss": log_loss(y_true, probability, labels=[0, 1]),
+        "accuracy": accuracy_score(y_true, probability > 0.5),
+    }
+
+
+_worker_data = None
+
+
+def _init_worker(directory, limit_threads=False):
+    global _worker_data
+    _worker_data = load_arrays(directory)
+    if limit_threads:
+        # hist usa OpenMP: un hilo por proceso evita sobresuscribir los núcleos
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+
+
+def _evaluate(task):
+    """Un candidato en un fold: el estimador crece por ``n_estimators``."""
+    backend_name, features, candidate_id, params, fold, n_estimators = task
+    backend = get_backend(backend_name, features)
+    X, y, folds = _worker_data
+    train, valid = folds[fold]
+    X_train, y_train = X[train], y[train]
+    X_valid, y_valid = X[valid], y[valid]
+    model = backend.estimator(**dict(backend.default_params, warm_start=True, **params))
+    started = time.perf_counter()
+    results = []
+    for n in n_estimators:
+        model.set_params(**{backend.size_param: n})
+        model.fit(X_train, y_train)
+        results.append((n, fold_metrics(y_valid, model.predict_proba(X_valid)[:, 1])))
+    return candidate_id, fold, results, time.perf_counter() - started
+
+
+def search(backend, directory, grid, n_estimators, search="grid", n_iter=10, workers=None, seed=42):
+    """Ejecuta la búsqueda; devuelve una fila por (candidato, n_estimators)."""
+    combos = candidates(grid, search, n_iter, seed)
+    n_folds = len(load_arrays(directory)[2])
+    checkpoints = sorted(set(n_estimators))
+    tasks = [(backend.name, backend.features, i, params, fold, checkpoints)
+             for i, params in enumerate(combos) for fold in range(n_folds)]
+    workers = workers or os.cpu_count() or 1
+
+    scores = {}
+    fit_seconds = 0.0
+    if workers == 1:
+        _init_worker(directory)
+        outcomes = map(_evaluate, tasks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(directory, True))
+        outcomes = pool.map(_evaluate, tasks)
+    try:
+        for candidate_id, fold, results, seconds in outcomes:
+            fit_seconds += seconds
+            for n, metrics in results:
+                scores.setdefault((candidate_id, n), []).append(metrics)
+    finally:
+        if workers != 1:
+            pool.shutdown()
+
+    rows = []
+    for (candidate_id, n), per_fold in sorted(scores.items()):
+        row = {"params": dict(combos[candidate_id], **{backend.size_param: n}), "folds": len(per_fold)}
+        for metric in SCORING:
+            values = [m[metric] for m in per_fold]
+            row[metric] = float(np.mean(values))
+            row[metric + "_std"] = float(np.std(values))
+        rows.append(row)
+    return rows, fit_seconds
+
+
+def best_row(rows, scoring="roc_auc"):
+    # log_loss: menor es mejor
+    sign = -1 if scoring == "log_loss" else 1
+    return max(rows, key=lambda r: sign * r[scoring])
+
+
+def next_version(name, models_dir=paths.MODELS_DIR):
+    versions = ModelRegistry(models_dir).versions(name)
+    return max([v for v, _ in versions] + [0]) + 1
+
+
+def fit_final(backend, directory, params):
+    """Entrena el ganador con todos los datos (con nombres de columnas)."""
+    X, y, _ = load_arrays(directory)
+    return backend.fit(X, y, **params)
+
+
+def save_model(model, metadata, name, models_dir=paths.MODELS_DIR):
+    """Guarda ``<nombre>-v<N>.joblib`` y sus métricas; devuelve la ruta.
+
+    Si el modelo es un GBM binario se exporta además el ``.gbm`` plano, que es
+    el que carga el registro.
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    version = next_version(name, models_dir)
+    base = os.path.join(models_dir, "%s-v%d" % (name, version))
+    metadata = dict(metadata, name=name, version=version)
+    with open(base + ".json", "w", encoding="utf-8") as fh:
+        json.dump(metadata, fh, indent=2)
+    # El registro solo ve el artefacto cuando está completo
+    joblib.dump(model, base + ".joblib.tmp")
+    os.replace(base + ".joblib.tmp", base + ".joblib")
+    entry = ModelEntry(name, version, model, model_spec(model) or metadata["features"], path=base + ".joblib")
+    if entry.compiled is not None:
+        artifact.export(entry)
+    return base + ".joblib"
+
+
+def current_cv(backend, directory, name, models_dir=paths.MODELS_DIR, workers=None, seed=42):
+    """Métricas de la configuración vigente de ``name`` en los mismos folds; None si no hay modelo."""
+    from churn.artifact import sklearn_model
+
+    registry = ModelRegistry(models_dir)
+    if not registry.versions(name):
+        return None
+    model = sklearn_model(registry.get(name))
+    valid = backend.estimator().get_params()
+    if type(model) is not type(backend.estimator()):
+        raise ValueError("%s no es un %s; no se puede comparar" % (name, type(backend.estimator()).__name__))
+    params = {k: [v] for k, v in model.get_params().items()
+              if k in valid and k != backend.size_param and k not in ("warm_start", "verbose")}
+    # El tamaño real: un GBM actualizado por churn.online creció más allá de n_estimators
+    size = int(getattr(model, "n_estimators_", None) or getattr(model, "n_iter_", None)
+               or model.get_params()[backend.size_param])
+    rows, _ = search(backend, directory, params, [size], "grid", workers=workers, seed=seed)
+    return rows[0]
+
+
+def run(backend="gbm", data_path=paths.DATA_PATH, grid=None, n_estimators=None, search_mode="grid",
+        n_iter=10, cv=5, workers=None, scoring="roc_auc", name=None, models_dir=paths.MODELS_DIR,
+        save=True, promote=False, seed=42):
+    """Búsqueda completa; devuelve ``(ganador, filas, ruta del artefacto o None, promoción)``.
+
+    Sin ``promote`` el ganador se guarda como ``<nombre>_candidate``. Con
+    ``promote`` se guarda como ``<nombre>`` solo si pasa ``passes_check``
+    contra la configuración vigente; si no, queda como candidato.
+    ``promoción`` es None sin ``promote``.
+    """
+    import sklearn
+
+    if isinstance(backend, str):
+        backend = get_backend(backend)
+    started = time.perf_counter()
+    directory = prepare_arrays(backend, data_path, cv, seed)
+    rows, fit_seconds = search(backend, directory, grid or backend.grid,
+                               n_estimators or DEFAULT_N_ESTIMATORS, search_mode, n_iter, workers, seed)
+    best = best_row(rows, scoring)
+    search_seconds = time.perf_counter() - started
+    logger.info("búsqueda: %d configuraciones en %.1fs (%.1fs de ajuste)",
+                len(rows), search_seconds, fit_seconds)
+
+    name = name or backend.model_name
+    promotion = None
+    if promote:
+        from churn.online import passes_check
+
+        current = current_cv(backend, directory, name, models_dir, workers, seed)
+        promotion = {"current": current,
+                     "accepted": current is None or bool(passes_check(current, best))}
+        if not promotion["accepted"]:
+            logger.warning("el ganador empeora la configuración vigente de %s; queda como candidato", name)
+
+    path = None
+    if save:
+        model = fit_final(backend, directory, best["params"])
+        ranked = sorted(rows, key=lambda r: -r[scoring] if scoring != "log_loss" else r[scoring])
+        metadata = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": backend.name,
+            "features": list(backend.features),
+            "feature_spec": backend.spec.to_dict(),
+            "params": dict(backend.default_params, **best["params"]),
+            "scoring": scoring,
+            "cv": {"folds": cv, "seed": seed, **{k: best[k] for k in best if k != "params"}},
+            "data": {"path": os.path.abspath(data_path), "sha256": file_sha256(data_path)},
+            "search": {"mode": search_mode, "configurations": len(rows),
+                       "seconds": search_seconds, "top": ranked[:10]},
+            "sklearn": sklearn.__version__,
+        }
+        if promotion is not None:
+            metadata["promotion"] = promotion
+        accepted = promotion is not None and promotion["accepted"]
+        path = save_model(model, metadata, name if accepted else name + CANDIDATE_SUFFIX, models_dir)
+    return best, rows, path, promotion
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros del GBM")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="gbm")
+    parser.add_argument("--search", choices=["grid", "random"], default="grid")
+    parser.add_argument("--n-iter", type=int, default=10, help="candidatos en modo random")
+    # Sin valor se usa la grilla por defecto del backend
+    parser.add_argument("--learning-rate", type=float, nargs="+")
+    parser.add_argument("--max-depth", type=int, nargs="+")
+    parser.add_argument("--subsample", type=float, nargs="+", help="solo gbm")
+    parser.add_argument("--max-leaf-nodes", type=int, nargs="+", help="solo hist")
+    parser.add_argument("--l2-regularization", type=float, nargs="+", help="solo hist")
+    parser.add_argument("--n-estimators", type=int, nargs="+", default=DEFAULT_N_ESTIMATORS,
+                        help="puntos de control que recorre warm_start")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--scoring", choices=SCORING, default="roc_auc")
+    parser.add_argument("--workers", type=int, default=None, help="procesos (default: núcleos)")
+    parser.add_argument("--name", default=None,
+                        help="modelo vigente en models/ (default: el del backend)")
+    parser.add_argument("--promote", action="store_true",
+                        help="guardar como versión nueva del vigente si no lo empeora "
+                             "(default: guardar como <nombre>%s)" % CANDIDATE_SUFFIX)
+    parser.add_argument("--data", default=paths.DATA_PATH)
+    parser.add_argument("--no-save", action="store_true", help="solo mostrar resultados")
+    args = parser.parse_args(argv)
+
+    backend = get_backend(args.backend)
+    grid = dict(backend.grid)
+    valid = backend.estimator().get_params()
+    for param in ("learning_rate", "max_depth", "subsample", "max_leaf_nodes", "l2_regularization"):
+        values = getattr(args, param)
+        if values is None:
+            continue
+        if param not in valid:
+            parser.error("--%s no aplica al backend %s" % (param.replace("_", "-"), backend.name))
+        grid[param] = values
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    started = time.perf_counter()
+    if args.promote and args.no_save:
+        parser.error("--promote y --no-save son incompatibles")
+    try:
+        best, rows, path, promotion = run(
+            backend, data_path=args.data, grid=grid, n_estimators=args.n_estimators,
+            search_mode=args.search, n_iter=args.n_iter, cv=args.cv, workers=args.workers,
+            scoring=args.scoring, name=args.name, save=not args.no_save, promote=args.promote)
+    except ValueError as exc:
+        print("error: %s" % exc, file=sys.stderr)
+        return 1
+    print("mejor configuración (%s): %s" % (args.scoring, best["params"]))
+    print("  roc_auc %.4f ± %.4f · log_loss %.4f · accuracy %.4f" % (
+        best["roc_auc"], best["roc_auc_std"], best["log_loss"], best["accuracy"]))
+    if promotion and promotion["current"]:
+        current = promotion["current"]
+        print("  vigente: roc_auc %.4f · log_loss %.4f -> %s" % (
+            current["roc_auc"], current["log_loss"],
+            "promovido" if promotion["accepted"] else "no promovido"))
+    if path:
+        print("modelo guardado en %s" % path)
+    print("tiempo total: %.1fs" % (time.perf_counter() - started))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Escenarios "qué pasaría si" para un cliente.
+
+Todas las funciones arman la grilla completa de contrafactuales como una sola
+matriz y la puntúan con una única llamada a ``predict_proba`` del modelo en
+memoria del registro (miles de escenarios en pocos milisegundos):
+
+* ``sweep``: la probabilidad del cliente sobre la grilla de una o dos
+  variables (p. ej. productos 0–4 × saldo en 1000 pasos); con una variable es
+  su curva ICE.
+* ``ice_curves`` / ``partial_dependence``: curvas ICE de varios clientes y su
+  promedio (dependencia parcial).
+* ``minimal_changes``: el cambio más chico en cada variable accionable que
+  deja al cliente por debajo del umbral de riesgo "alto" de ``churn.risk``.
+
+Uso::
+
+    python -m churn.whatif --x balance --y products_number --steps 1000
+    python -m churn.whatif --customer '{"credit_score": 600, "age": 45, ...}' --bench
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from churn.registry import PRODUCTION_MODEL, get_registry
+from churn.risk import RISK_THRESHOLDS
+
+# Rango de cada variable en los escenarios (el de los controles de la app) y
+# si toma solo valores enteros
+RANGES = {
+    "credit_score": (300, 850, True),
+    "age": (18, 92, True),
+    "tenure": (0, 20, True),
+    "balance": (0.0, 300_000.0, False),
+    "products_number": (0, 4, True),
+    "estimated_salary": (0.0, 300_000.0, False),
+}
+
+# Variables que un plan de retención puede mover (la edad no)
+ACTIONABLE = ("balance", "products_number", "tenure", "credit_score", "estimated_salary")
+
+# Probabilidad desde la que el riesgo es "alto"
+HIGH_RISK = RISK_THRESHOLDS[-1]
+
+DEFAULT_STEPS = 100
+
+EXAMPLE_CUSTOMER = {"credit_score": 600, "age": 50, "tenure": 2, "balance": 120_000.0,
+                    "estimated_salary": 50_000.0, "products_number": 3}
+
+
+def grid(feature, steps=DEFAULT_STEPS, low=None, high=None, include=None):
+    """Valores de ``feature`` en su rango: ``steps`` puntos, o cada entero si son menos.
+
+    ``include`` (el valor actual del cliente) se agrega a la grilla, para que
+    "no cambiar" sea uno de los escenarios.
+    """
+    default_low, default_high, integer = RANGES[feature]
+    low = default_low if low is None else low
+    high = default_high if high is None else high
+    if integer and high - low + 1 <= steps:
+        values = np.arange(low, high + 1, dtype=np.float64)
+    else:
+        values = np.linspace(low, high, steps)
+        if integer:
+            values = np.unique(np.round(values))
+    if include is not None:
+        values = np.union1d(values, [float(include)])
+    return values
+
+
+def _columns(spec, customer, overrides, n_rows):
+    """Columnas de entrada de ``n_rows`` escenarios: ``overrides`` sobre el cliente."""
+    return {name: overrides[name] if name in overrides else np.full(n_rows, customer[name])
+            for name in spec.inputs}
+
+
+def _score(entry, columns):
+    return entry.predict_proba(entry.spec.encode(columns))
+
+
+class Sweep:
+    """Probabilidades de un cliente sobre la grilla de ``features``."""
+
+    def __init__(self, customer, axes, probabilities, seconds):
+        self.customer = customer
+        self.features = tuple(axes)
+        self.axes = axes
+        self.probabilities = probabilities
+        self.seconds = seconds
+
+    @property
+    def size(self):
+        return self.probabilities.size
+
+    def below(self, threshold=HIGH_RISK):
+        return self.probabilities < threshold
+
+    def minimal_change(self, threshold=HIGH_RISK):
+        """Punto de la grilla bajo ``threshold`` más cercano al cliente, o ``None``.
+
+        La distancia suma los cambios de cada variable relativos a su rango.
+        """
+        distance = np.zeros(self.probabilities.shape)
+        for axis, (feature, values) in enumerate(self.axes.items()):
+            low, high, _ = RANGES[feature]
+            shape = [1] * distance.ndim
+            shape[axis] = -1
+            delta = np.abs(values - float(self.customer[feature])) / (high - low)
+            distance = distance + delta.reshape(shape)
+        distance[~self.below(threshold)] = np.inf
+        flat = int(np.argmin(distance))
+        if not np.isfinite(distance.flat[flat]):
+            return None
+        index = np.unravel_index(flat, distance.shape)
+        change = {f: float(values[i]) for (f, values), i in zip(self.axes.items(), index)}
+        return {"change": change, "probability": float(self.probabilities[index]),
+                "distance": float(distance[index])}
+
+    def frame(self):
+        """Tabla larga: una fila por escenario."""
+        import pandas as pd
+
+        mesh = np.meshgrid(*self.axes.values(), indexing="ij")
+        data = {f: m.ravel() for f, m in zip(self.features, mesh)}
+        data["churn_probability"] = self.probabilities.ravel()
+        return pd.DataFrame(data)
+
+
+def sweep(customer, axes, entry=None, model=PRODUCTION_MODEL):
+    """Puntúa el producto cartesiano de ``axes`` (``{variable: valores}``) para un cliente."""
+    entry = entry or get_registry().get(model)
+    axes = {f: np.asarray(v, dtype=np.float64) for f, v in axes.items()}
+    if not 1 <= len(axes) <= 2:
+        raise ValueError("se admiten una o dos variables")
+    missing = [f for f in axes if f not in entry.spec.inputs]
+    if missing:
+        raise ValueError("el modelo no usa: %s" % ", ".join(missing))
+    started = time.perf_counter()
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    shape = mesh[0].shape
+    overrides = {f: m.ravel() for f, m in zip(axes, mesh)}
+    probabilities = _score(entry, _columns(entry.spec, customer, overrides, mesh[0].size))
+    return Sweep(customer, axes, probabilities.reshape(shape), time.perf_counter() - started)
+
+
+def ice_curves(frame, feature, values, entry=None, model=PRODUCTION_MODEL):
+    """Matriz (clientes × valores) con la probabilidad de cada cliente en cada valor."""
+    entry = entry or get_registry().get(model)
+    values = np.asarray(values, dtype=np.float64)
+    n_customers, n_values = len(frame), len(values)
+    # Cada cliente se repite una vez por valor, en bloque: fila i*n_values + j
+    repeated = {name: np.repeat(np.asarray(frame[name]), n_values) for name in entry.spec.inputs}
+    repeated[feature] = np.tile(values, n_customers)
+    return _score(entry, repeated).reshape(n_customers, n_values)
+
+
+def partial_dependence(frame, feature, values, entry=None, model=PRODUCTION_MODEL):
+    """Promedio de las curvas ICE: la dependencia parcial de ``feature``."""
+    return ice_curves(frame, feature, values, entry, model).mean(axis=0)
+
+
+def minimal_changes(customer, features=ACTIONABLE, steps=DEFAULT_STEPS, threshold=HIGH_RISK,
+                    entry=None, model=PRODUCTION_MODEL):
+    """Cambio mínimo en cada variable que baja al cliente de ``threshold``.
+
+    Las grillas de todas las variables (y el cliente tal cual, en la primera
+    fila) se puntúan juntas en una sola llamada. Devuelve una fila por variable
+    con solución, ordenadas por distancia; vacío si el cliente ya está debajo.
+    """
+    entry = entry or get_registry().get(model)
+    features = [f for f in features if f in entry.spec.inputs]
+    grids = [grid(f, steps, include=customer[f]) for f in features]
+    sizes = [len(g) for g in grids]
+    columns = _columns(entry.spec, customer, {}, 1 + sum(sizes))
+    offset = 1
+    for feature, values in zip(features, grids):
+        columns[feature] = columns[feature].astype(np.float64)
+        columns[feature][offset:offset + len(values)] = values
+        offset += len(values)
+    scores = _score(entry, columns)
+    if scores[0] < threshold:
+        return []
+    probabilities = np.split(scores[1:], np.cumsum(sizes)[:-1])
+
+    changes = []
+    for feature, values, scores in zip(features, grids, probabilities):
+        low, high, _ = RANGES[feature]
+        current = float(customer[feature])
+        distance = np.where(scores < threshold, np.abs(values - current), np.inf)
+        best = int(np.argmin(distance))
+        if np.isfinite(distance[best]):
+            changes.append({"feature": feature, "current": current, "value": float(values[best]),
+                            "delta": float(values[best] - current), "probability": float(scores[best]),
+                            "distance": float(distance[best] / (high - low))})
+    return sorted(changes, key=lambda c: c["distance"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Escenarios qué pasaría si para un cliente")
+    parser.add_argument("--customer", type=json.loads, default=EXAMPLE_CUSTOMER,
+                        help="cliente en JSON (default: un ejemplo de riesgo alto)")
+    parser.add_argument("--x", default="balance", choices=sorted(RANGES))
+    parser.add_argument("--y", default="products_number", choices=sorted(RANGES))
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--model", default=PRODUCTION_MODEL)
+    parser.add_argument("--bench", action="store_true", help="medir grillas de distintos tamaños")
+    args = parser.parse_args(argv)
+
+    entry = get_registry().get(args.model)
+    customer = dict(EXAMPLE_CUSTOMER, **args.customer)
+    base = float(entry.predict_proba(entry.row(customer))[0])
+    print("probabilidad actual: %.3f" % base)
+
+    axes = {f: grid(f, args.steps, include=customer[f]) for f in (args.x, args.y)}
+    result = sweep(customer, axes, entry)
+    print("%s × %s: %d escenarios en %.1f ms" % (args.x, args.y, result.size, result.seconds * 1e3))
+    best = result.minimal_change()
+    if best is not None:
+        print("cambio conjunto mínimo: %s -> %.3f" % (
+            ", ".join("%s=%g" % item for item in best["change"].items()), best["probability"]))
+    changes = minimal_changes(customer, entry=entry)
+    if not changes and base < HIGH_RISK:
+        print("el cliente ya está debajo del riesgo alto (%.2f)" % HIGH_RISK)
+    for change in changes:
+        print("%-18s %12g -> %-12g probabilidad %.3f" % (
+            change["feature"], change["current"], change["value"], change["probability"]))
+
+    if args.bench:
+        for steps in (100, 1000, 10_000):
+            axes = {args.x: np.linspace(*RANGES[args.x][:2], steps), args.y: grid(args.y, 5)}
+            sweep(customer, axes, entry)
+            timings = []
+            for _ in range(5):
+                timings.append(sweep(customer, axes, entry).seconds)
+            size = steps * len(axes[args.y])
+            print("%8d escenarios: %.2f ms (%.0f escenarios/s)" % (
+                size, min(timings) * 1e3, size / min(timings)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,15 @@
 import joblib
 
+from churn.features import LEGACY_SPEC
+
 loaded_model = joblib.load('models/gbm_model.joblib')
 
-new_data=[600, 19, 1000.0, 1,10000,2,0,0,0,0,0,1]
+# El esquema arma las 12 columnas en orden, incluido el one-hot de credit_score_group
+new_data = {'credit_score': 600, 'age': 19, 'balance': 1000.0, 'products_number': 1,
+            'estimated_salary': 10000, 'tenure': 2}
 
-new_=np.array(new_data).reshape(1,-1)
+new_ = LEGACY_SPEC.encode_row(new_data).reshape(1, -1)
 
-prediction=loaded_model.predict(new_)
+prediction = loaded_model.predict(new_)
 
 prediction[0]
-
-
-
-
-
-
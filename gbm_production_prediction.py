@@ -1,11 +1,14 @@
 import joblib
 
-loaded_model = joblib.load('models/gbm_model.joblib')
+from churn.features import PRODUCTION_SPEC
 
-new_data=[600, 19, 1000.0, 1,10000,2]
+loaded_model = joblib.load('models/gbm_model_production.joblib')
 
-new_=np.array(new_data).reshape(1,-1)
+new_data = {'credit_score': 600, 'age': 19, 'balance': 1000.0, 'products_number': 1,
+            'estimated_salary': 10000, 'tenure': 2}
 
-prediction=loaded_model.predict(new_)
+new_ = PRODUCTION_SPEC.encode_row(new_data).reshape(1, -1)
 
-prediction[0]
\ No newline at end of file
+prediction = loaded_model.predict(new_)
+
+prediction[0]
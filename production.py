@@ -1,7 +1,11 @@
 import joblib
+
+from churn.features import PRODUCTION_SPEC
+
 loaded_model = joblib.load('gbm_model_production.joblib')
-new_data=[600, 19, 1000.0, 1,10000,2]
+new_data = {'credit_score': 600, 'age': 19, 'balance': 1000.0, 'products_number': 1,
+            'estimated_salary': 10000, 'tenure': 2}
 
-new_=np.array(new_data).reshape(1,-1)
-prediction_gbm_model=loaded_model.predict(new_)
-prediction_gbm_model[0]
\ No newline at end of file
+new_ = PRODUCTION_SPEC.encode_row(new_data).reshape(1, -1)
+prediction_gbm_model = loaded_model.predict(new_)
+prediction_gbm_model[0]
@@ -0,0 +1,55 @@
+"""Paridad bit a bit de ``CompiledGBM`` con ``predict_proba`` de sklearn."""
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from churn import paths
+from churn.artifact import load as load_flat
+from churn.compiled import CompiledGBM, parity_inputs, sklearn_proba
+from churn.datastore import load_customers
+from churn.registry import ModelRegistry
+
+MODELS = sorted(os.path.basename(p)[:-len(".joblib")]
+                for p in glob.glob(os.path.join(paths.MODELS_DIR, "*.joblib")))
+
+
+@pytest.fixture(scope="module")
+def customers():
+    return load_customers()
+
+
+@pytest.fixture(scope="module", params=MODELS)
+def case(request, customers):
+    entry = ModelRegistry(formats=(".joblib",)).get(request.param)
+    compiled = CompiledGBM.from_sklearn(entry.model)
+    X = parity_inputs(compiled, entry.spec.encode(customers), n_random=5000)
+    return entry, compiled, X, sklearn_proba(entry.model, X)
+
+
+def test_full_batch(case):
+    _, compiled, X, expected = case
+    assert np.array_equal(compiled.predict_proba(X), expected)
+
+
+@pytest.mark.parametrize("size", [2, 17, 32, 33])
+def test_small_blocks(case, size):
+    _, compiled, X, expected = case
+    got = np.concatenate([compiled.predict_proba(X[i:i + size]) for i in range(0, len(X), size)])
+    assert np.array_equal(got, expected)
+
+
+def test_single_rows(case):
+    _, compiled, X, expected = case
+    rows = np.random.default_rng(0).choice(len(X), 500, replace=False)
+    got = np.array([compiled.predict_proba(X[i])[0] for i in rows])
+    assert np.array_equal(got, expected[rows])
+
+
+def test_flat_artifact(case):
+    entry, _, X, expected = case
+    path = os.path.splitext(entry.path)[0] + ".gbm"
+    if not os.path.exists(path):
+        pytest.skip("sin exportación .gbm")
+    assert np.array_equal(load_flat(path).predict_proba(X)[:, 1], expected)
@@ -0,0 +1,66 @@
+"""Respuestas 400 del servicio ante peticiones mal formadas."""
+import http.client
+import json
+import threading
+
+import pytest
+
+from churn.service import MAX_BODY_BYTES, make_server
+
+CUSTOMER = {"credit_score": 600, "tenure": 2, "age": 40, "balance": 0,
+            "estimated_salary": 50000, "products_number": 1}
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = make_server(port=0, drift_window=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, path, body, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=5)
+    try:
+        conn.putrequest("POST", path)
+        for name, value in (headers or {"Content-Length": str(len(body))}).items():
+            conn.putheader(name, value)
+        conn.endheaders()
+        conn.send(body)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_predict(server):
+    status, body = post(server, "/predict", json.dumps(CUSTOMER).encode())
+    assert status == 200
+    assert 0 <= body["churn_probability"] <= 1
+
+
+@pytest.mark.parametrize("length", ["-1", "abc", "1.5", str(MAX_BODY_BYTES + 1)])
+def test_bad_content_length(server, length):
+    status, body = post(server, "/predict", json.dumps(CUSTOMER).encode(), {"Content-Length": length})
+    assert status == 400
+    assert "error" in body
+
+
+@pytest.mark.parametrize("path,payload", [
+    ("/predict", dict(CUSTOMER, age=float("nan"))),
+    ("/predict", dict(CUSTOMER, balance=float("inf"))),
+    ("/predict", dict(CUSTOMER, age=None)),
+    ("/predict", {"age": 40}),
+    ("/predict_batch", {"customers": [CUSTOMER, dict(CUSTOMER, age=float("nan"))]}),
+    ("/predict_batch", {"customers": "x"}),
+])
+def test_invalid_payload(server, path, payload):
+    status, _ = post(server, path, json.dumps(payload).encode())
+    assert status == 400
+
+
+def test_invalid_json(server):
+    status, _ = post(server, "/predict", b"{no es json")
+    assert status == 400